@@ -0,0 +1,155 @@
+"""
+Admission control of requests to an OPC UA server:
+    - Bounded number of concurrent service calls per server.
+    - Priority classes for waiting calls, fair sharing between clients.
+    - Fast rejection when the queue of a server is full.
+"""
+
+from contextvars import ContextVar
+from heapq import heappush, heappop
+import asyncio
+import itertools
+import time
+
+# Priority classes, smaller is served first
+WRITE = 0
+VALUE_READ = 1
+METADATA_READ = 2
+BROWSE = 3
+PRIORITY_NAMES = ["write", "valueRead", "metadataRead", "browse"]
+
+# Client of the request being handled, used for fair sharing
+currentClient = ContextVar("currentClient", default=None)
+
+
+def client_id(request):
+    """
+    Identifies the client of a HTTP request by X-Client-Id header
+    or by client address.
+    """
+
+    clientId = request.headers.get("X-Client-Id")
+    if clientId is None and request.client is not None:
+        clientId = request.client.host
+    return clientId
+
+
+class OverloadError(Exception):
+    """
+    Raised when a request is rejected because the queue is full.
+    """
+
+
+class AdmissionController(object):
+    """
+    Limits concurrent service calls to one OPC UA server.
+
+    Calls over maxConcurrency wait in a queue ordered by priority class.
+    Within a class, each client's calls get increasing virtual start
+    times, so a client with many waiting calls can't starve others.
+    When maxQueueDepth calls are waiting, new calls are rejected with
+    OverloadError instead of waiting.
+    """
+
+    def __init__(self, name, maxConcurrency=4, maxQueueDepth=100):
+        self.name = name
+        self.maxConcurrency = maxConcurrency
+        self.maxQueueDepth = maxQueueDepth
+        self.active = 0
+        self.queue = []
+        self.sequence = itertools.count()
+        self.virtualTime = [0] * len(PRIORITY_NAMES)
+        self.clientTimes = {}
+        # ---------- Statistics -----------
+        self.admitted = [0] * len(PRIORITY_NAMES)
+        self.rejected = [0] * len(PRIORITY_NAMES)
+        self.queueTime = [0] * len(PRIORITY_NAMES)
+        self.maxQueueTime = [0] * len(PRIORITY_NAMES)
+
+    @property
+    def queueLength(self):
+        return sum(1 for entry in self.queue if not entry[-1].done())
+
+    def start_time(self, priority, client):
+        """
+        Returns virtual start time of a call by client in priority class.
+        """
+
+        key = (priority, client)
+        start = max(self.clientTimes.get(key, 0), self.virtualTime[priority])
+        self.clientTimes[key] = start + 1
+        return start
+
+    async def acquire(self, priority, client=None):
+        """
+        Waits until a call in given priority class can be made.
+        Returns the time waited in the queue (ns).
+        Raises OverloadError if the queue is full.
+        """
+
+        if self.active < self.maxConcurrency and len(self.queue) == 0:
+            self.active += 1
+            self.admitted[priority] += 1
+            return 0
+
+        if self.queueLength >= self.maxQueueDepth:
+            self.rejected[priority] += 1
+            raise OverloadError(
+                self.name + " is overloaded, " +
+                PRIORITY_NAMES[priority] + " rejected"
+            )
+
+        start = time.time_ns()
+        future = asyncio.get_event_loop().create_future()
+        heappush(self.queue, (
+            priority,
+            self.start_time(priority, client),
+            next(self.sequence),
+            future
+        ))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        queueTime = time.time_ns() - start
+        self.admitted[priority] += 1
+        self.queueTime[priority] += queueTime
+        self.maxQueueTime[priority] = max(
+            self.maxQueueTime[priority], queueTime
+        )
+        return queueTime
+
+    def release(self):
+        """
+        Passes the slot of a finished call to the next waiting call.
+        """
+
+        while len(self.queue) > 0:
+            priority, start, sequence, future = heappop(self.queue)
+            if not future.done():
+                self.virtualTime[priority] = start
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def statistics(self):
+        """
+        Returns admission statistics of each priority class.
+        """
+
+        result = []
+        for i, name in enumerate(PRIORITY_NAMES):
+            admitted = self.admitted[i]
+            result.append({
+                "priority": name,
+                "admitted": admitted,
+                "rejected": self.rejected[i],
+                "averageQueueTime": (
+                    self.queueTime[i] // admitted if admitted else 0
+                ),
+                "maxQueueTime": self.maxQueueTime[i],
+            })
+        return result
@@ -0,0 +1,382 @@
+"""
+Benchmarks for the API internals.
+Run from this folder with: python benchmarks.py [benchmark name]
+Runs all benchmarks if no name given.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import multiprocessing
+import datetime
+import tracemalloc
+import logging
+import msgpack
+from opcua import ua, Server
+from encoding import encode_msgpack
+from opcuautils import OPCUAServer, getServers
+from sharedvalues import SharedValueTable
+from sharding import serve, ShardClient
+
+
+def timed(function, repeat=20):
+    """
+    Returns the best time of repeated calls in milliseconds
+    and the result of the last call.
+    """
+
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench_encoding(nodeCount=1000):
+    """
+    Compares JSON and MessagePack encoding of a response to a query
+    that reads the variable of nodeCount nodes.
+    """
+
+    now = datetime.datetime.utcnow()
+    data = {}
+    for i in range(nodeCount):
+        data["node" + str(i)] = {"variable": {
+            "value": i * 0.5,
+            "dataType": "Double",
+            "sourceTimestamp": now,
+            "statusCode": "Good",
+            "readTime": 1234567,
+        }}
+    response = {"data": data}
+
+    def to_json():
+        # Datetimes are serialized by the GraphQL scalar for JSON
+        for node in data.values():
+            variable = node["variable"]
+            variable["sourceTimestamp"] = now.isoformat()
+        content = json.dumps(
+            response, ensure_ascii=False, allow_nan=False,
+            indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        for node in data.values():
+            node["variable"]["sourceTimestamp"] = now
+        return content
+
+    def to_msgpack():
+        return encode_msgpack(response)
+
+    jsonTime, jsonContent = timed(to_json)
+    msgpackTime, msgpackContent = timed(to_msgpack)
+    jsonDecodeTime, _ = timed(lambda: json.loads(jsonContent))
+    msgpackDecodeTime, _ = timed(lambda: msgpack.unpackb(msgpackContent))
+
+    print(f"Response encoding, {nodeCount} nodes")
+    print(f"{'':12}{'encode ms':>12}{'decode ms':>12}{'bytes':>10}")
+    print(
+        f"{'JSON':12}{jsonTime:12.3f}{jsonDecodeTime:12.3f}"
+        f"{len(jsonContent):10}"
+    )
+    print(
+        f"{'MessagePack':12}{msgpackTime:12.3f}{msgpackDecodeTime:12.3f}"
+        f"{len(msgpackContent):10}"
+    )
+
+
+def bench_read_value_ids(nodeCount=1000):
+    """
+    Compares building ReadValueIds of nodeCount nodes from parsed
+    strings against the per server cache used for repeated reads.
+    """
+
+    server = OPCUAServer("Benchmark", "opc.tcp://localhost:4840/")
+    keys = [
+        ("ns=2;s=Machine.Tag" + str(i), "Value", None)
+        for i in range(nodeCount)
+    ]
+
+    def parsed():
+        result = []
+        for nodeId, attribute, indexRange in keys:
+            rv = ua.ReadValueId()
+            rv.NodeId = ua.NodeId.from_string(nodeId)
+            rv.AttributeId = ua.AttributeIds[attribute]
+            rv.IndexRange = indexRange
+            result.append(rv)
+        return result
+
+    def cached():
+        return [server.create_read_value(*key) for key in keys]
+
+    parsedTime, _ = timed(parsed)
+    cachedTime, _ = timed(cached)
+
+    print(f"ReadValueIds, {nodeCount} nodes")
+    print(f"{'':12}{'ms':>12}")
+    print(f"{'Parsed':12}{parsedTime:12.3f}")
+    print(f"{'Cached':12}{cachedTime:12.3f}")
+
+
+def measured(function):
+    """
+    Returns time in milliseconds, peak of memory allocated (bytes)
+    and the result of a call.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def bench_node_handles(childCount=10000):
+    """
+    Compares creating a graphene OPCUANode and a python-opcua Node for
+    each child of a folder against creating a NodeHandle, and measures
+    a subNodes query of a folder with childCount children on a local
+    OPC UA server.
+    """
+
+    from starlette.testclient import TestClient
+    from main import app
+    from graphene_schema.query import OPCUANode, NodeHandle
+
+    endPoint = "opc.tcp://localhost:4850/benchmark/"
+    logging.disable(logging.CRITICAL)
+    opcuaServer = Server()
+    opcuaServer.set_endpoint(endPoint)
+    folder = opcuaServer.get_objects_node().add_folder(
+        "ns=1;s=Folder", "1:Folder"
+    )
+    for i in range(childCount):
+        folder.add_variable("ns=1;s=Folder.Tag" + str(i), "1:Tag" + str(i), i)
+    opcuaServer.start()
+
+    server = OPCUAServer("Benchmark", endPoint)
+    getServers().append(server)
+    try:
+        nodeIds = [
+            "ns=1;s=Folder.Tag" + str(i) for i in range(childCount)
+        ]
+
+        def objects():
+            result = []
+            for nodeId in nodeIds:
+                node = OPCUANode(server=server.name, node_id=nodeId)
+                node.node = server.client.get_node(nodeId)
+                result.append(node)
+            return result
+
+        def handles():
+            return [NodeHandle(server, nodeId) for nodeId in nodeIds]
+
+        objectTime, objectMemory, _ = measured(objects)
+        handleTime, handleMemory, _ = measured(handles)
+
+        client = TestClient(app)
+        query = """{ node(server: "Benchmark", nodeId: "ns=1;s=Folder") {
+            subNodes { nodeId } } }"""
+        client.post("/graphql/", json={"query": query})
+        queryTime, queryMemory, response = measured(
+            lambda: client.post("/graphql/", json={"query": query})
+        )
+        assert len(response.json()["data"]["node"]["subNodes"]) == childCount
+    finally:
+        getServers().remove(server)
+        server.client.disconnect()
+        opcuaServer.stop()
+        logging.disable(logging.NOTSET)
+
+    print(f"Node objects, {childCount} children")
+    print(f"{'':18}{'ms':>10}{'peak KiB':>12}")
+    print(
+        f"{'OPCUANode + Node':18}{objectTime:10.1f}"
+        f"{objectMemory / 1024:12.0f}"
+    )
+    print(
+        f"{'NodeHandle':18}{handleTime:10.1f}"
+        f"{handleMemory / 1024:12.0f}"
+    )
+    print(
+        f"{'subNodes query':18}{queryTime:10.1f}"
+        f"{queryMemory / 1024:12.0f}"
+    )
+
+
+def sharedValueNodeIds(nodeCount):
+    return ["ns=2;s=Machine.Tag" + str(i) for i in range(nodeCount)]
+
+
+def sharedValue(i):
+    dataValue = ua.DataValue(ua.Variant(i * 0.5, ua.VariantType.Double))
+    dataValue.SourceTimestamp = datetime.datetime.utcnow()
+    return dataValue
+
+
+def write_shared_values(name, nodeCount, interval, stop):
+    # Updates all values every interval seconds, like the subscriptions
+    # of an owner
+    table = SharedValueTable(name)
+    nodeIds = sharedValueNodeIds(nodeCount)
+    i = 0
+    while not stop.wait(interval):
+        for nodeId in nodeIds:
+            table.put(nodeId, sharedValue(i))
+        i += 1
+    table.close()
+
+
+def poll_shared_values(name, nodeCount, batch, duration, results):
+    table = SharedValueTable(name)
+    nodeIds = sharedValueNodeIds(nodeCount)
+    polls = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = polls * batch % nodeCount
+        for nodeId in nodeIds[start:start + batch]:
+            table.get(nodeId)
+        polls += 1
+    results.put((polls, table.retries))
+    table.close()
+
+
+def serve_forwarded_values(directory, nodeCount, ready, stop):
+    # Owner answering forwarded reads from its subscriptions
+    values = {
+        nodeId: sharedValue(i)
+        for i, nodeId in enumerate(sharedValueNodeIds(nodeCount))
+    }
+
+    async def handler(message):
+        return [values.get(nodeId) for nodeId in message], None
+
+    async def run():
+        server = await serve(directory, 0, handler)
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        server.close()
+
+    asyncio.run(run())
+
+
+def poll_forwarded_values(directory, nodeCount, batch, duration, results):
+    nodeIds = sharedValueNodeIds(nodeCount)
+
+    async def run():
+        client = ShardClient(directory)
+        polls = 0
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            start = polls * batch % nodeCount
+            await client.call(0, nodeIds[start:start + batch])
+            polls += 1
+        client.close()
+        return polls
+
+    results.put((asyncio.run(run()), 0))
+
+
+def run_pollers(target, args, processes):
+    """
+    Runs target(*args, results) in processes concurrently.
+    Returns total polls and retries reported by the processes.
+    """
+
+    results = multiprocessing.Queue()
+    pollers = [
+        multiprocessing.Process(target=target, args=args + (results,))
+        for i in range(processes)
+    ]
+    for poller in pollers:
+        poller.start()
+    reported = [results.get() for poller in pollers]
+    for poller in pollers:
+        poller.join()
+    return sum(r[0] for r in reported), sum(r[1] for r in reported)
+
+
+def bench_shared_values(nodeCount=1000, batch=10, duration=2, interval=0.1):
+    """
+    Compares worker processes polling batch values of nodeCount
+    subscribed nodes from the shared value table, while another process
+    writes all values every interval seconds, against forwarding each
+    poll to the owner over its socket. Measured with 1, 2 and 4 polling
+    processes.
+    """
+
+    name = "opcua-graphql-benchmark-" + str(os.getpid())
+    directory = tempfile.mkdtemp()
+    table = SharedValueTable(name, nodeCount * 2, create=True)
+    stop = multiprocessing.Event()
+    ready = multiprocessing.Event()
+    writer = multiprocessing.Process(
+        target=write_shared_values, args=(name, nodeCount, interval, stop)
+    )
+    owner = multiprocessing.Process(
+        target=serve_forwarded_values,
+        args=(directory, nodeCount, ready, stop)
+    )
+    rows = []
+    try:
+        writer.start()
+        owner.start()
+        ready.wait(10)
+        while table.get(sharedValueNodeIds(nodeCount)[-1]) is None:
+            time.sleep(0.01)
+        for processes in (1, 2, 4):
+            shared, retries = run_pollers(
+                poll_shared_values, (name, nodeCount, batch, duration),
+                processes
+            )
+            forwarded, _ = run_pollers(
+                poll_forwarded_values,
+                (directory, nodeCount, batch, duration), processes
+            )
+            rows.append((processes, shared, retries, forwarded))
+    finally:
+        stop.set()
+        writer.join()
+        owner.join()
+        table.unlink()
+        table.close()
+        shutil.rmtree(directory)
+
+    print(
+        f"Polling {batch} of {nodeCount} values updated every "
+        f"{interval} s, polls per second"
+    )
+    print(
+        f"{'processes':>10}{'shared':>12}{'retries':>10}"
+        f"{'forwarded':>12}"
+    )
+    for processes, shared, retries, forwarded in rows:
+        print(
+            f"{processes:10}{shared / duration:12.0f}{retries:10}"
+            f"{forwarded / duration:12.0f}"
+        )
+
+
+benchmarks = {
+    "encoding": bench_encoding,
+    "readValueIds": bench_read_value_ids,
+    "nodeHandles": bench_node_handles,
+    "sharedValues": bench_shared_values,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(benchmarks.keys())
+    for name in names:
+        benchmarks[name]()
+        print()
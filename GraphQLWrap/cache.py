@@ -0,0 +1,117 @@
+"""
+Caches used by the OPC UA server objects:
+    - Least recently used cache with a maximum number of entries.
+    - Browse result cache bounded by number of references, with expiry.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Dict like cache that drops the least recently used entries
+    when it has more than maxSize entries.
+    """
+
+    def __init__(self, maxSize=10000):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        # ---------- Statistics -----------
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class BrowseCache(object):
+    """
+    Least recently used cache of browse results (ReferenceDescriptions)
+    by node id. Holds at most maxReferences references in total, and
+    entries expire ttl seconds after they were browsed (never if None).
+
+    The cache is valid for one model version of the server, like
+    pathindex.PathIndex.
+    """
+
+    def __init__(self, maxReferences=100000, ttl=None):
+        self.maxReferences = maxReferences
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.references = 0
+        self.version = None
+        # ---------- Statistics -----------
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def validate(self, version):
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def get(self, nodeId):
+        """
+        Returns cached references of a node, None if not cached or expired.
+        """
+
+        entry = self.entries.get(nodeId)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] is not None and entry[0] < time.monotonic():
+            self.pop(nodeId)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(nodeId)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, nodeId, references):
+        if len(references) > self.maxReferences:
+            return
+        self.pop(nodeId)
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        self.entries[nodeId] = (expires, references)
+        self.references += len(references)
+        while self.references > self.maxReferences:
+            expires, references = self.entries.popitem(last=False)[1]
+            self.references -= len(references)
+            self.evictions += 1
+
+    def pop(self, nodeId):
+        entry = self.entries.pop(nodeId, None)
+        if entry is not None:
+            self.references -= len(entry[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.references = 0
@@ -0,0 +1,142 @@
+"""
+Coalescing of value writes to an OPC UA server:
+    - Writes arriving within a short window are sent as one Write request.
+    - Repeated writes to the same node are merged, last write wins.
+"""
+
+import asyncio
+import contextvars
+import time
+from opcua import ua
+from deadline import requestDeadline, latest_deadline, within_deadline
+
+
+class WriteCoalescer(object):
+    """
+    Collects value writes to one OPC UA server for window seconds and
+    sends them in one Write request. Writes to the same node (and index
+    range) in the window are merged so only the latest value is sent.
+    Callers whose value was replaced get the status of the write that
+    replaced it. The Write request is cancelled at the latest deadline
+    of the callers, each caller stops waiting at its own deadline.
+
+    If nodeIds is given, only writes to those nodes are coalesced.
+    """
+
+    def __init__(self, server, window, nodeIds=None):
+        self.server = server
+        self.window = window
+        self.nodeIds = set(nodeIds) if nodeIds else None
+        self.pending = {}
+        # Deadlines of the callers of pending writes
+        self.deadlines = []
+        self.flushHandle = None
+        # Flushes are sent in order so a later value is never
+        # overwritten by an earlier one. Created in the event loop.
+        self.lock = None
+        # ---------- Statistics -----------
+        self.writes = 0
+        self.merged = 0
+
+    def applies(self, nodeId):
+        return self.nodeIds is None or nodeId in self.nodeIds
+
+    async def write(self, nodeId, value, dataType=None, indexRange=None):
+        """
+        Queues a value write and waits until it has been sent.
+
+        Arguments                               Example
+        nodeId:     Target nodeId               "ns=2;i=2"
+        value:      Value for the node          1234
+        dataType:   Data type of value          "Int32"
+        indexRange: Elements of array to write  "0:9"
+
+        Results
+        statusCode: Status of the sent write    ua.StatusCode()
+        writeTime:  Time taken for write (ns)   12345678
+        queueTime:  Time waited for coalescing
+                    and admission (ns)          123456
+        """
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        key = (nodeId, indexRange)
+        entry = self.pending.get(key)
+        if entry is None:
+            self.pending[key] = [value, dataType, [future]]
+        else:
+            entry[0] = value
+            entry[1] = dataType
+            entry[2].append(future)
+            self.merged += 1
+        self.deadlines.append(requestDeadline.get())
+
+        if self.flushHandle is None:
+            # Flushed in a context of its own, not in the context of
+            # the request that started the window
+            self.flushHandle = loop.call_later(
+                self.window, lambda: asyncio.ensure_future(self.flush()),
+                context=contextvars.Context()
+            )
+
+        start = time.time_ns()
+        statusCode, writeTime, queueTime, sendTime = await within_deadline(
+            asyncio.shield(future)
+        )
+        return statusCode, writeTime, queueTime + sendTime - start
+
+    async def flush(self):
+        """
+        Sends pending writes in one Write request and passes the results
+        to the waiting callers.
+        """
+
+        self.flushHandle = None
+        pending = self.pending
+        self.pending = {}
+        deadlines = self.deadlines
+        self.deadlines = []
+        if len(pending) == 0:
+            return
+        requestDeadline.set(latest_deadline(deadlines))
+
+        # A value that can't be converted fails only the callers of its
+        # node, the other writes are sent
+        params = ua.WriteParameters()
+        entries = []
+        for (nodeId, indexRange), entry in pending.items():
+            try:
+                params.NodesToWrite.append(self.server.create_write_value(
+                    nodeId, "Value", entry[0], entry[1], indexRange
+                ))
+            except Exception as e:
+                self.fail(entry, e)
+                continue
+            entries.append(entry)
+        if len(entries) == 0:
+            return
+
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            sendTime = time.time_ns()
+            try:
+                results, writeTime, queueTime = \
+                    await self.server.write(params)
+            except Exception as e:
+                for entry in entries:
+                    self.fail(entry, e)
+                return
+            self.writes += 1
+
+        for entry, statusCode in zip(entries, results):
+            for future in entry[2]:
+                if not future.done():
+                    future.set_result(
+                        (statusCode, writeTime, queueTime, sendTime)
+                    )
+
+    def fail(self, entry, error):
+        for future in entry[2]:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,74 @@
+"""
+Deadlines of API requests:
+    - A request sets its timeout with the X-Timeout-Ms header, or with
+      timeoutMs in the extensions of a GraphQL request.
+    - OPC UA calls made for the request are cancelled when the deadline
+      passes and raise DeadlineExceeded, so a GraphQL response has the
+      fields resolved in time and errors for the rest.
+"""
+
+from contextvars import ContextVar
+import asyncio
+import json
+import time
+
+# Deadline (time.monotonic()) of the request being handled,
+# None if it has no timeout
+requestDeadline = ContextVar("requestDeadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when an OPC UA call doesn't finish before the deadline
+    of the request.
+    """
+
+
+def request_deadline(request, data=None):
+    """
+    Returns deadline of a HTTP request from its X-Timeout-Ms header or
+    timeoutMs in the extensions of GraphQL request data, None if neither
+    is given. Raises ValueError if the timeout is not a number.
+    """
+
+    timeout = request.headers.get("X-Timeout-Ms")
+    extensions = data.get("extensions") if data is not None else None
+    if isinstance(extensions, str):
+        extensions = json.loads(extensions)
+    if isinstance(extensions, dict) and "timeoutMs" in extensions:
+        timeout = extensions["timeoutMs"]
+    if timeout is None:
+        return None
+    return time.monotonic() + float(timeout) / 1000
+
+
+def latest_deadline(deadlines):
+    """
+    Returns the latest of deadlines, None if any of them is None.
+    Used for calls made for several requests at once.
+    """
+
+    latest = None
+    for deadline in deadlines:
+        if deadline is None:
+            return None
+        latest = deadline if latest is None else max(latest, deadline)
+    return latest
+
+
+async def within_deadline(awaitable):
+    """
+    Awaits an awaitable until the deadline of the request being handled.
+    It's cancelled if the deadline passes first, and DeadlineExceeded
+    is raised.
+    """
+
+    deadline = requestDeadline.get()
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(
+            awaitable, max(deadline - time.monotonic(), 0)
+        )
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Deadline of the request exceeded") from None
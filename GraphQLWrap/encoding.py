@@ -0,0 +1,191 @@
+"""
+Encodings for values returned by the API:
+    - Packed base64 encoding of numeric arrays.
+    - Structured values (decoded ExtensionObjects) as dicts.
+    - Response content negotiation between JSON and MessagePack.
+"""
+
+from starlette.responses import JSONResponse, Response
+from contextvars import ContextVar
+from enum import Enum
+from opcua import ua
+import base64
+import datetime
+import uuid
+import msgpack
+import numpy
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Media type of the response for the request being handled.
+# Scalars leave datetimes and bytes native when it's not JSON.
+responseFormat = ContextVar("responseFormat", default=JSON)
+
+# Little-endian numpy types of packable OPC UA variant types
+PACKED_TYPES = {
+    "Boolean": "|b1",
+    "SByte": "|i1",
+    "Byte": "|u1",
+    "Int16": "<i2",
+    "UInt16": "<u2",
+    "Int32": "<i4",
+    "UInt32": "<u4",
+    "Int64": "<i8",
+    "UInt64": "<u8",
+    "Float": "<f4",
+    "Double": "<f8",
+}
+
+
+def pack_array(value, variantType):
+    """
+    Packs a numeric array (or matrix) value into base64 encoded
+    little-endian bytes in row-major order.
+
+    Arguments                               Example
+    value:      Value of a variant          [1.0, 2.0]
+    variantType:Variant type of the value   ua.VariantType.Double
+
+    Results
+    None if value is not a numeric array, otherwise a tuple of
+    packed:     Base64 encoded bytes        "AAAAAAAA8D8AAAAAAAAAQA=="
+    packedType: numpy style type string     "<f8"
+    dimensions: Length of each dimension    [2]
+    """
+
+    dtype = PACKED_TYPES.get(variantType.name)
+    if dtype is None or not isinstance(value, list):
+        return None
+
+    data = numpy.asarray(value, dtype=dtype)
+    packed = base64.b64encode(data.tobytes()).decode("ascii")
+    return packed, data.dtype.str, list(data.shape)
+
+
+def encode_structure(value, mediaType=JSON):
+    """
+    Converts a structured value into dicts of its fields, recursively.
+    Node ids and qualified names become strings, localized texts their
+    text and enumerations their names. Datetimes and bytes are converted
+    to ISO 8601 and base64 strings for JSON. ExtensionObjects that
+    couldn't be decoded are returned as their TypeId and Body.
+
+    Arguments                               Example
+    value:      Value read from a variable  ua.MachineStatus()
+    mediaType:  Media type of the response  JSON
+
+    Results
+    value:      Value with structures as
+                dicts                       {"Name": "Line 1", "Speed": 1.5}
+    """
+
+    if isinstance(value, list):
+        return [encode_structure(item, mediaType) for item in value]
+    if isinstance(value, ua.ExtensionObject):
+        return {
+            "TypeId": value.TypeId.to_string(),
+            "Body": encode_structure(value.Body, mediaType)
+        }
+    if isinstance(value, (ua.NodeId, ua.QualifiedName)):
+        return value.to_string()
+    if isinstance(value, ua.LocalizedText):
+        return value.Text
+    if isinstance(value, ua.Variant):
+        return encode_structure(value.Value, mediaType)
+    if isinstance(value, ua.StatusCode):
+        return value.name
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, "ua_types"):
+        return {
+            name: encode_structure(getattr(value, name), mediaType)
+            for name, uaType in value.ua_types
+        }
+    if mediaType == JSON:
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        if isinstance(value, bytes):
+            return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def encode_value(variant, mediaType=JSON):
+    """
+    Returns value of a ua.Variant, structured values as dicts
+    (see encode_structure).
+    """
+
+    if variant.VariantType == ua.VariantType.ExtensionObject:
+        return encode_structure(variant.Value, mediaType)
+    return variant.Value
+
+
+def negotiate(request):
+    """
+    Chooses response media type from the Accept header of a request.
+    MessagePack if the client accepts it, otherwise JSON.
+    """
+
+    accept = request.headers.get("Accept", "")
+    for mediaType in MSGPACK_TYPES:
+        if mediaType in accept:
+            return MSGPACK
+    return JSON
+
+
+def is_msgpack(request):
+    """
+    Checks if request body is MessagePack encoded.
+    """
+
+    contentType = request.headers.get("Content-Type", "")
+    return any(mediaType in contentType for mediaType in MSGPACK_TYPES)
+
+
+def epoch_microseconds(timestamp):
+    """
+    Converts datetime into integer microseconds since POSIX epoch.
+    Naive datetimes are UTC (as returned by python-opcua).
+    """
+
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc)
+        timestamp = timestamp.replace(tzinfo=None)
+    return (timestamp - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def msgpack_default(value):
+    if isinstance(value, datetime.datetime):
+        return epoch_microseconds(value)
+    if isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError("Can't encode " + type(value).__name__)
+
+
+def encode_msgpack(content):
+    """
+    Encodes content into MessagePack. Numbers and byte strings are kept
+    native, datetimes are encoded as epoch microseconds.
+    """
+
+    return msgpack.packb(content, default=msgpack_default, use_bin_type=True)
+
+
+def create_response(content, mediaType=JSON, status_code=200, **kwargs):
+    """
+    Creates response with content encoded in the given media type.
+    """
+
+    if mediaType == MSGPACK:
+        return Response(
+            encode_msgpack(content),
+            status_code=status_code,
+            media_type=MSGPACK,
+            **kwargs
+        )
+    return JSONResponse(content, status_code=status_code, **kwargs)
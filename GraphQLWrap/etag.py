@@ -0,0 +1,99 @@
+"""
+ETags for conditional responses:
+    - Request scoped collector of what a response was built from.
+    - Helpers used by resolvers and endpoints to add to the collector.
+    - If-None-Match matching.
+
+Values are identified by their source timestamp and status code, other
+node data by the model version of the server, so an ETag can be
+computed without serializing the response.
+"""
+
+from contextvars import ContextVar
+import hashlib
+
+# Collector of the request being handled, None if ETag isn't computed
+responseTag = ContextVar("responseTag", default=None)
+
+
+class ResponseTag(object):
+    """
+    Collects identifiers of the data a response is built from.
+    Order of additions doesn't affect the resulting ETag.
+    """
+
+    def __init__(self, *items):
+        self.items = set()
+        self.add(*items)
+
+    def add(self, *items):
+        self.items.add(tuple(str(item) for item in items))
+
+    def add_value(self, serverName, nodeId, dataValue):
+        """
+        Adds source timestamp and status code of a node value.
+        The value itself is used only if it has no source timestamp.
+        """
+
+        if dataValue.SourceTimestamp is None:
+            source = repr(dataValue.Value)
+        else:
+            source = dataValue.SourceTimestamp
+        self.add(
+            "value", serverName, nodeId, source, dataValue.StatusCode.value
+        )
+
+    def etag(self):
+        digest = hashlib.sha1(repr(sorted(self.items)).encode("utf-8"))
+        return '"' + digest.hexdigest() + '"'
+
+
+def tag_value(serverName, nodeId, dataValue):
+    """
+    Adds a node value to the ETag of the response being built.
+    """
+
+    tag = responseTag.get()
+    if tag is not None:
+        tag.add_value(serverName, nodeId, dataValue)
+
+
+def tag_model(server):
+    """
+    Adds model version of an OPCUAServer to the ETag of the response
+    being built. Used for node data other than values.
+    """
+
+    tag = responseTag.get()
+    if tag is not None:
+        tag.add("model", server.name, server.modelVersion)
+
+
+def tag_data(*items):
+    """
+    Adds data computed by the API (such as aggregates) to the ETag of
+    the response being built.
+    """
+
+    tag = responseTag.get()
+    if tag is not None:
+        tag.add("data", *items)
+
+
+def if_none_match(request, etag):
+    """
+    Checks if ETag matches If-None-Match header of the request.
+    """
+
+    header = request.headers.get("If-None-Match")
+    if header is None or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -1,8 +1,8 @@
 from aiodataloader import DataLoader
 import asyncio
 
-from opcua import ua
 from opcuautils import getServer
+from deadline import requestDeadline, latest_deadline
 from collections import defaultdict
 
 """
@@ -10,6 +10,7 @@ Usage:
 results = await AttributeLoader.load(attributeKey)
 attributeObject = results[0]
 readTime = results[1]
+queueTime = results[2]
 """
 
 
@@ -19,46 +20,98 @@ class AttributeLoader(DataLoader):
         """
         Iterates through the attributeKeys and retrieves data
         from OPC UA servers based on the attributeKey values.
+        Reads are cancelled at the latest deadline of the requests
+        in the batch.
 
         Arguments
-        attributeKeys:  List of strings with required infromation
+        attributeKeys:  List of tuples with required infromation
                         to retrieve the attributes from OPC UA servers.
-        Template:       "Server/NodeId/Attribute"
-        Example:        "TestServer/ns=2;i=2/Value"
+                        Index range is None for whole value, deadline
+                        is that of the request loading the attribute.
+        Template:       (Server, NodeId, Attribute, IndexRange, Deadline)
+        Example:        ("TestServer", "ns=2;i=2", "Value", "0:9", None)
 
         Results
         sortedResults:  List of values returned by the OPC UA server
                         for each attribute. Also includes OPC UA read
-                        time with each attribute.
+                        time and admission queue time with each attribute.
                         In same order as attributeKeys.
-        Example:        [<opcua_object>, readTime]
+        Example:        [<opcua_object>, readTime, queueTime]
+
+        Names, descriptions and node classes of nodes in the search
+        index of the server are not read, their times are None.
         """
 
+        requestDeadline.set(latest_deadline(
+            attributeKey[4] for attributeKey in attributeKeys
+        ))
         servers = defaultdict(list)
-        i = 0
-        for attribute in attributeKeys:
-            info = attribute.split("/")
-            servers[info[0]].append([i, info[1], info[2]])
-            i += 1
+        for i, attributeKey in enumerate(attributeKeys):
+            servers[attributeKey[0]].append(i)
 
         sortedResults = [None] * len(attributeKeys)
-        for serverName, attributes in servers.items():
-            params = ua.ReadParameters()
+        for serverName, keyIndexes in servers.items():
             server = getServer(serverName)
-            for info in attributes:
-                rv = ua.ReadValueId()
-                if info[1] == "":
-                    rv.NodeId = ua.NodeId.from_string(server.rootNodeId)
+            indexes = []
+            for i in keyIndexes:
+                (
+                    serverName, nodeId, attribute, indexRange, deadline
+                ) = attributeKeys[i]
+                dataValue = server.indexed_attribute(nodeId, attribute)
+                if dataValue is None:
+                    indexes.append(i)
                 else:
-                    rv.NodeId = ua.NodeId.from_string(info[1])
-                rv.AttributeId = ua.AttributeIds[info[2]]
-                params.NodesToRead.append(rv)
+                    sortedResults[i] = [dataValue, None, None]
+            if len(indexes) == 0:
+                continue
+
+            results, readTime, queueTime = await server.read_attributes(
+                [attributeKeys[i][1:4] for i in indexes]
+            )
+
+            for i, result in zip(indexes, results):
+                sortedResults[i] = [result, readTime, queueTime]
+
+        return sortedResults
+
+
+class PathLoader(DataLoader):
+
+    async def batch_load_fn(self, pathKeys):
+        """
+        Resolves browse paths to node ids with one request per server.
+
+        Arguments
+        pathKeys:       List of (server name, browse path, deadline of
+                        the request) tuples
+        Example:        ("TestServer", "0:Objects/2:Machine/2:Speed",
+                        None)
+
+        Results
+        nodeIds:        Node ids in the same order as pathKeys,
+                        ValueError for paths that were not found
+        """
 
-            results, readTime = await server.read(params)
+        requestDeadline.set(latest_deadline(
+            pathKey[2] for pathKey in pathKeys
+        ))
+        servers = defaultdict(list)
+        for i, (serverName, path, deadline) in enumerate(pathKeys):
+            servers[serverName].append(i)
 
-            i = 0
-            for info in attributes:
-                sortedResults[info[0]] = [results[i], readTime]
-                i += 1
+        sortedResults = [None] * len(pathKeys)
+        for serverName, indexes in servers.items():
+            server = getServer(serverName)
+            paths = [pathKeys[i][1] for i in indexes]
+            nodeIds, statusCodes = await server.resolve_paths(paths)
+            for i, path, nodeId, statusCode in zip(
+                indexes, paths, nodeIds, statusCodes
+            ):
+                if nodeId is None:
+                    nodeId = ValueError(
+                        "Browse path not found: " + path +
+                        " (" + statusCode.name + ")"
+                    )
+                sortedResults[i] = nodeId
 
         return sortedResults
@@ -6,7 +6,16 @@ node_class = "Node class"
 variable = "Variable that contains value related attribute fields"
 path = "Attempts to parse node id for a path to parent node"
 node_id = "Node id for of the node on OPC UA server"
-sub_nodes = "Returns nodes hierarchically below this node"
+sub_nodes = "Returns nodes hierarchically below this node. \
+    Arguments filter the nodes on the OPC UA server where possible"
+node_classes = "Only nodes of these node classes, \
+    for example [\"Object\", \"Variable\"]"
+reference_type = "Follow only references of this type and its subtypes, \
+    name such as \"HasComponent\" or node id. Hierarchical references \
+    if not given"
+browse_direction = "Forward (default), Inverse or Both"
+browse_name = "Only nodes whose browse name matches this pattern, \
+    * and ? are wildcards, for example \"Temp*\""
 variable_sub_nodes = " Recursively find all variable sub nodes. \
     Returns specified fields of found variable nodes. \
     Takes a while to fetch, request this field only if necessary!"
@@ -28,3 +37,151 @@ read_time = "Time it took to read the value from the OPC UA server by the \
     GraphQL API server in nanoseconds"
 write_time = "Time it took to write the value to the OPC UAserver from the \
     GraphQL API server in nanoseconds"
+queue_time = "Time the request waited for admission to the OPC UA server \
+    in nanoseconds"
+
+window = "Time window in seconds counted back from now. \
+    Whole buffer is returned if not given"
+timestamps = "Source timestamps of buffered values"
+values = "Buffered values"
+buffered_nodes = "Number of nodes with a value buffer"
+buffer_memory = "Memory reserved by value buffers in bytes"
+buffer_memory_limit = "Maximum memory for value buffers in bytes"
+
+node_ids = "Node ids of the nodes on OPC UA server"
+function = "Aggregate function: min, max, mean, sum or count"
+aggregate_window = "Time window in seconds for buffered values. \
+    Current values are read from the OPC UA server if not given"
+aggregate_value = "Aggregate of all values"
+count = "Number of values included in the aggregate"
+aggregate_nodes = "Aggregate of each node"
+
+index_range = "Index range of array elements, for example \"0:9\" or \
+    \"0:1,2:3\" for matrices. Whole value if not given"
+packed = "Return numeric arrays as base64 encoded little-endian bytes"
+packed_type = "Type of packed array elements as numpy type string, \
+    for example \"<f8\". Null if value is not packed"
+dimensions = "Length of each dimension of packed array"
+
+active_requests = "Number of service calls in progress to the OPC UA server"
+queued_requests = "Number of service calls waiting for admission"
+admission = "Admission control statistics of each priority class"
+priority = "Priority class: write, valueRead, metadataRead or browse"
+admitted = "Number of admitted service calls"
+rejected = "Number of service calls rejected because the queue was full"
+average_queue_time = "Average time admitted calls waited in nanoseconds"
+max_queue_time = "Longest time an admitted call waited in nanoseconds"
+
+chunking = "Statistics of service calls split into chunks by the operation \
+    limits of the OPC UA server"
+service = "OPC UA service, for example Read or Browse"
+operation_limit = "Maximum number of operations in one request, \
+    null if no limit"
+requests = "Number of service calls"
+chunked_requests = "Number of service calls that were split into chunks"
+chunks = "Number of requests sent to the OPC UA server"
+
+import_parent_id = "Node id of the node the nodes are added under. \
+    For JSON nodes the root node of the server if not given, for NodeSet2 \
+    replaces parents that are not in the file"
+import_nodes = "Tree of nodes as JSON list. Each node has name and optional \
+    nodeId, description, value, dataType, writable and children. \
+    Nodes with value are variables, other nodes folders"
+node_set = "Content of an OPC UA NodeSet2 XML file. Objects and variables \
+    are imported"
+added = "Number of added nodes"
+deleted = "Number of deleted nodes"
+failed = "Number of failed nodes"
+node_results = "Result of each node"
+provisioning = "Progress of the latest importNodes or deleteNodes"
+operation = "Operation: import or delete"
+total = "Number of nodes in the operation"
+done = "Number of nodes done successfully"
+finished = "True when the operation has finished"
+
+fleet = "Node at the same browse path on many servers. \
+    Servers are read concurrently, one server failing doesn't affect others"
+browse_path = "Browse names separated by \"/\" from the root node of the \
+    server, for example \"0:Objects/2:Machine/2:Speed\". Names without \
+    namespace index are in the namespace set for the server"
+fleet_servers = "Names of the servers. All servers if not given"
+fleet_timeout = "Time limit for each server in seconds, 5 by default"
+fleet_node = "Node for querying other fields"
+fleet_error = "Error if the node couldn't be read from the server"
+
+node_by_path = "Node at a browse path. \
+    Resolved paths are cached so later queries cost the same as by node id"
+paths = "Browse paths of the nodes, instead of nodeIds"
+
+search = "Nodes whose names, description or browse path contain all words \
+    of text. Answered from an index of the address space built by crawling \
+    the server, without reading from it"
+search_text = "Words to search for. By default words of nodes must start \
+    with them"
+search_limit = "Maximum number of nodes, 50 by default"
+substring = "Match words anywhere, not only at their start"
+browse_name_field = "Browse name"
+search_path = "Browse path of the node from the root node of the server"
+search_index = "Status of the search index of the server"
+index_nodes = "Number of nodes in the index"
+index_words = "Number of distinct words in the index"
+crawling = "True while the server is being crawled"
+index_updated = "Time the index was built"
+crawl_time = "Time the latest crawl took in nanoseconds"
+
+browse_cache = "Statistics of cached browse results of the server, \
+    null if the cache is disabled"
+browse_cache_nodes = "Number of nodes with cached references"
+browse_cache_references = "Number of cached references"
+browse_cache_max_references = "Maximum number of cached references"
+browse_cache_ttl = "Seconds until cached references expire, \
+    null if they don't"
+cache_hits = "Number of lookups answered from the cache"
+cache_misses = "Number of lookups not in the cache"
+cache_evictions = "Number of entries dropped to stay within the limit"
+model_change_events = "True if the server sends model change events that \
+    clear the cache"
+
+shared_values = "Statistics of the table of latest values shared between \
+    workers, null if it is disabled or not available in this worker"
+shared_value_slots = "Number of nodes that fit in the table"
+shared_value_nodes = "Number of nodes in the table"
+shared_value_retries = "Number of slot reads repeated because the slot was \
+    being written"
+shared_value_overflows = "Number of lookups of values too large for a slot"
+io_worker = "Dedicated I/O threads of the server and statistics of their \
+    calls, null if the server uses the threads shared by all servers"
+io_worker_name = "Name of the I/O worker, shared by servers in its group"
+io_worker_threads = "Number of threads of the worker"
+io_worker_active = "Number of calls running in the threads"
+io_worker_queued = "Number of calls waiting for a thread"
+io_worker_calls = "Number of finished calls"
+io_worker_failures = "Number of calls that raised an error"
+io_worker_latency = "Moving average of call duration (ms)"
+io_worker_queue_latency = "Moving average of time waited for a thread (ms)"
+io_worker_max_latency = "Longest call duration (ms)"
+io_worker_longest_call = "Seconds the longest running call has run"
+io_worker_healthy = "False if the latest calls failed or a call has been \
+    running for too long"
+io_worker_last_error = "Error of the latest failed call"
+io_worker_last_success = "Time the latest successful call finished"
+redundancy = "Backup servers reads fail over to and statistics of reads \
+    sent to them, null if the server has no backups"
+backups = "Backup servers configured or discovered from the ServerUriArray \
+    of the server"
+backup_connected = "True if the session to the backup is connected"
+backup_last_error = "Error of the latest failed connect to the backup"
+hedge_reads = "True if slow reads are also sent to a backup"
+hedge_delay = "Time (ms) a read waits for the primary server before it is \
+    also sent to a backup"
+hedged_reads = "Number of reads also sent to a backup"
+hedge_wins = "Number of hedged reads answered first by the backup"
+failovers = "Number of reads answered by a backup after the primary failed"
+backup_reads = "Number of reads sent only to a backup while the primary \
+    was down"
+last_failover_time = "Time (ms) from the start of the latest failed over \
+    read until the backup answered"
+max_failover_time = "Longest failover time (ms)"
+primary_down = "True while reads go to a backup after the primary failed"
+owner = "Worker slot that has the session to the server and serves calls \
+    forwarded from this worker. Null if this worker has the session"
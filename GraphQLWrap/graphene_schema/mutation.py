@@ -1,6 +1,9 @@
 from graphql import GraphQLError
-from graphene import ObjectType, Mutation, Boolean, Int, String, Field
+from graphene import ObjectType, Mutation, Boolean, Int, String, Field, \
+    List, JSONString
+from opcua import ua
 from opcuautils import getServer, getServers, setupServers
+from provisioning import nodes_from_tree, nodes_from_nodeset
 from graphene_schema.query import OPCUAVariable
 from graphene_schema.scalars import OPCUADataVariable
 import graphene_schema.descriptions as d
@@ -19,20 +22,24 @@ class SetNodeValue(Mutation):
 
     ok = Boolean(description=d.ok)
     writeTime = Int(description=d.write_time)
+    queueTime = Int(description=d.queue_time)
 
     class Arguments:
         server = String(required=True, description=d.server)
         node_id = String(required=True, description=d.node_id)
         value = OPCUADataVariable(required=True, description=d.value)
         dataType = String(description=d.data_type)
+        index_range = String(description=d.index_range)
 
-    async def mutate(self, info, server, node_id, value, dataType=None):
+    async def mutate(
+        self, info, server, node_id, value, dataType=None, index_range=None
+    ):
 
         server = getServer(server)
-        ok, writeTime = await server.set_node_attribute(
-            node_id, "Value", value, dataType
+        ok, writeTime, queueTime = await server.set_node_attribute(
+            node_id, "Value", value, dataType, index_range
         )
-        return SetNodeValue(ok=ok, writeTime=writeTime)
+        return SetNodeValue(ok=ok, writeTime=writeTime, queueTime=queueTime)
 
 
 class SetNodeDescription(Mutation):
@@ -87,13 +94,15 @@ class AddNode(Mutation):
     writable = Boolean(description=d.writable)
     ok = Boolean(description=d.ok)
 
-    def mutate(
+    async def mutate(
         self, info, server, name, node_id, parent_id,
         value=None, writable=True
     ):
 
         server = getServer(server)
-        result = server.add_node(name, node_id, parent_id, value, writable)
+        result = await server.call_owner(
+            "add_node", name, node_id, parent_id, value, writable
+        )
 
         if result.get("value") is not None:
             variable = OPCUAVariable(
@@ -132,13 +141,128 @@ class DeleteNode(Mutation):
 
     ok = Boolean(description=d.ok)
 
-    def mutate(self, info, server, node_id, recursive=True):
+    async def mutate(self, info, server, node_id, recursive=True):
 
         server = getServer(server)
-        ok = server.delete_node(node_id, recursive)
+        ok = await server.call_owner("delete_node", node_id, recursive)
         return DeleteNode(ok=ok)
 
 
+class OPCUANodeResult(ObjectType):
+    """
+    Result of adding or deleting a single node.
+    """
+
+    node_id = String(description=d.node_id)
+    ok = Boolean(description=d.ok)
+    status_code = String(description=d.status_code)
+
+
+def create_node_results(results):
+    return [
+        OPCUANodeResult(
+            node_id=nodeId.to_string(),
+            ok=statusCode.is_good(),
+            status_code=statusCode.name
+        )
+        for nodeId, statusCode in results
+    ]
+
+
+class ImportNodes(Mutation):
+    """
+    Adds a tree of nodes to OPC UA server address space
+    with batched requests. Requires admin access.
+
+    Nodes are given either as JSON in nodes or as NodeSet2 XML
+    in nodeSet. Returns result of each node.
+    Progress can be followed from servers query during the import.
+    """
+
+    class Arguments:
+        server = String(required=True, description=d.server)
+        parent_id = String(description=d.import_parent_id)
+        nodes = JSONString(description=d.import_nodes)
+        node_set = String(description=d.node_set)
+
+    ok = Boolean(description=d.ok)
+    added = Int(description=d.added)
+    failed = Int(description=d.failed)
+    results = List(OPCUANodeResult, description=d.node_results)
+
+    async def mutate(
+        self, info, server, parent_id=None, nodes=None, node_set=None
+    ):
+
+        server = getServer(server)
+        skipped = []
+        if node_set is not None:
+            parentNodeId = None
+            if parent_id is not None:
+                parentNodeId = await server.get_node_id(parent_id)
+            specs, skipped = nodes_from_nodeset(
+                node_set, await server.get_namespace_array(), parentNodeId
+            )
+        elif nodes is not None:
+            parentNodeId = await server.get_node_id(parent_id or "")
+            namespaceIndex = server.nameSpaceIndex
+            if namespaceIndex is None:
+                namespaceIndex = parentNodeId.NamespaceIndex
+            specs = nodes_from_tree(nodes, parentNodeId, namespaceIndex)
+        else:
+            raise GraphQLError("Either nodes or nodeSet is required")
+
+        results = await server.import_nodes(specs)
+        results += [
+            (
+                ua.NodeId.from_string(nodeId),
+                ua.StatusCode(ua.StatusCodes.BadNodeClassInvalid)
+            )
+            for nodeId in skipped
+        ]
+        nodeResults = create_node_results(results)
+        added = sum(1 for result in nodeResults if result.ok)
+        return ImportNodes(
+            ok=added == len(nodeResults),
+            added=added,
+            failed=len(nodeResults) - added,
+            results=nodeResults
+        )
+
+
+class DeleteNodes(Mutation):
+    """
+    Deletes nodes from OPC UA address space with batched requests.
+    Requires admin access.
+
+    If recursive is true (default), sub nodes are deleted too.
+    Returns result of each deleted node.
+    """
+
+    class Arguments:
+        server = String(required=True, description=d.server)
+        node_ids = List(String, required=True, description=d.node_ids)
+        recursive = Boolean(required=False, description=d.recursive)
+
+    ok = Boolean(description=d.ok)
+    deleted = Int(description=d.deleted)
+    failed = Int(description=d.failed)
+    results = List(OPCUANodeResult, description=d.node_results)
+
+    async def mutate(self, info, server, node_ids, recursive=True):
+
+        server = getServer(server)
+        results = await server.delete_nodes(node_ids, recursive)
+        nodeResults = create_node_results(results)
+        deleted = sum(1 for result in nodeResults if result.ok)
+        return DeleteNodes(
+            ok=deleted == len(nodeResults),
+            deleted=deleted,
+            failed=len(nodeResults) - deleted,
+            results=nodeResults
+        )
+
+
 class AddServer(Mutation):
     """
     Configure a new server to be accessed by the GraphQL API.
@@ -237,6 +361,9 @@ class ClearServerSubscriptions(Mutation):
             pass
         server.sub = None
         server.subscriptions.clear()
+        server.monitoredItems.clear()
+        if server.timeSeries is not None:
+            server.timeSeries.clear()
         ok = True
 
         return ClearServerSubscriptions(ok=ok)
@@ -251,6 +378,8 @@ class Mutation(ObjectType):
     )
     add_node = AddNode.Field(description=AddNode.__doc__)
     delete_node = DeleteNode.Field(description=DeleteNode.__doc__)
+    import_nodes = ImportNodes.Field(description=ImportNodes.__doc__)
+    delete_nodes = DeleteNodes.Field(description=DeleteNodes.__doc__)
     add_server = AddServer.Field(description=AddServer.__doc__)
     delete_server = DeleteServer.Field(description=DeleteServer.__doc__)
     clear_server_subcriptions = ClearServerSubscriptions.Field(
@@ -1,14 +1,124 @@
-from graphene import ObjectType, String, Field, List, Int
-from graphene.types.datetime import DateTime
-from opcuautils import getServer, getServers
-from graphene_schema.scalars import OPCUADataVariable
+from graphene import ObjectType, String, Field, List, Int, Float, Boolean
+from timeseries import from_epoch
+from encoding import pack_array, encode_value, responseFormat
+from etag import tag_value, tag_model, tag_data
+from deadline import requestDeadline, within_deadline
+from opcua import ua
+from opcuautils import getServer, getServers, createBrowseFilter, \
+    CHUNKED_SERVICES
+from graphene_schema.scalars import OPCUADataVariable, OPCUADateTime
 import graphene_schema.descriptions as d
 import asyncio
-from graphene_schema.dataloader import AttributeLoader
+from collections import defaultdict
+from graphene_schema.dataloader import AttributeLoader, PathLoader
 
-attribute_loader = AttributeLoader(cache=False)
+# Loaders of each server, so results of a server are returned as soon
+# as it responds without waiting for slower servers
+attribute_loaders = defaultdict(lambda: AttributeLoader(cache=False))
+path_loaders = defaultdict(lambda: PathLoader(cache=False))
 subscribeVariables = False
 
+# Fields of browse results that are used by subNodes
+SUB_NODE_RESULT_MASK = (
+    ua.BrowseResultMask.NodeClass
+    | ua.BrowseResultMask.BrowseName
+    | ua.BrowseResultMask.DisplayName
+)
+
+
+def statistics_data(statistics):
+    """
+    Returns field values of statistics objects, and lists of them,
+    as nested tuples.
+    """
+
+    if isinstance(statistics, ObjectType):
+        return tuple(
+            (name, statistics_data(getattr(statistics, name)))
+            for name in type(statistics)._meta.fields
+        )
+    if isinstance(statistics, (list, tuple)):
+        return tuple(statistics_data(item) for item in statistics)
+    return statistics
+
+
+def tag_statistics(serverName, field, statistics):
+    """
+    Adds statistics of a server to the ETag of the response being built,
+    as they change without the model version of the server changing.
+    Returns statistics.
+    """
+
+    tag_data(serverName, field, statistics_data(statistics))
+    return statistics
+
+
+def create_sub_node(server, nodeId, displayName, nodeClass):
+    """
+    Creates NodeHandle with name and node class known from browsing.
+    """
+
+    return NodeHandle(server, nodeId, {
+        "DisplayName": [
+            ua.DataValue(ua.Variant(displayName)), None, None
+        ],
+        "NodeClass": [
+            ua.DataValue(ua.Variant(nodeClass, ua.VariantType.Int32)),
+            None, None
+        ],
+    })
+
+
+class NodeHandle(object):
+    """
+    Compact reference to a node on an OPC UA server.
+
+    Resolvers return handles instead of OPCUANode instances and
+    OPCUANode resolvers take them as root, so results with many nodes
+    don't create graphene objects or python-opcua nodes for each node.
+    Attributes loaded for the node are cached in the handle.
+    """
+
+    __slots__ = ("server_object", "node_id", "attributes")
+
+    def __init__(self, server_object, node_id, attributes=None):
+        self.server_object = server_object
+        self.node_id = node_id
+        self.attributes = attributes
+
+    @property
+    def server(self):
+        return self.server_object.name
+
+    async def load_attribute(self, attribute, indexRange=None):
+        """
+        Loads attribute of this node with the attribute loader.
+        Values are added to the ETag of the response, other
+        attributes by the model version of the server.
+        """
+
+        if self.attributes is not None and indexRange is None:
+            x = self.attributes.get(attribute)
+            if x is not None:
+                return x
+
+        # Batches are shared with other requests, so they're not
+        # cancelled when only this request's deadline passes
+        x = await within_deadline(asyncio.shield(attribute_loaders[
+            self.server_object.name
+        ].load((
+            self.server_object.name, self.node_id, attribute, indexRange,
+            requestDeadline.get()
+        ))))
+        if attribute == "Value":
+            tag_value(self.server_object.name, self.node_id, x[0])
+        else:
+            tag_model(self.server_object)
+            if self.attributes is None:
+                self.attributes = {}
+            self.attributes[attribute] = x
+        return x
+
 
 class OPCUANode(ObjectType):
     """
@@ -21,103 +131,120 @@ class OPCUANode(ObjectType):
     name = String(description=d.name)
     description = String(description=d.description)
     node_class = String(description=d.node_class)
-    variable = Field(lambda: OPCUAVariable, description=d.variable)
+    variable = Field(
+        lambda: OPCUAVariable,
+        index_range=String(description=d.index_range),
+        packed=Boolean(description=d.packed),
+        description=d.variable
+    )
     path = String(description=d.path)
     node_id = String(description=d.node_id)
-    sub_nodes = List(lambda: OPCUANode, description=d.sub_nodes)
+    sub_nodes = List(
+        lambda: OPCUANode,
+        node_class=List(String, description=d.node_classes),
+        reference_type=String(description=d.reference_type),
+        browse_direction=String(description=d.browse_direction),
+        browse_name=String(description=d.browse_name),
+        description=d.sub_nodes
+    )
     variable_sub_nodes = List(
         lambda: OPCUANode, description=d.variable_sub_nodes
     )
     server = String(description=d.server)
 
-    node = None
-    server_object = None
-    node_key = None
-
-    def set_node(self):
-        if self.node is None:
-            if self.server_object is None:
-                self.server_object = getServer(self.server)
-            self.node = self.server_object.get_node(self.node_id)
-            self.node_key = self.server + "/" + self.node_id
-        return
-
     """
     Resolvers for the fields above so that only requested
-    fields are fetched from the OPC UA server
+    fields are fetched from the OPC UA server.
+    Root of the resolvers (self) is a NodeHandle.
     """
 
     async def resolve_name(self, info):
-        self.set_node()
-        attributeKey = self.node_key + "/DisplayName"
-        x = await attribute_loader.load(attributeKey)
+        x = await self.load_attribute("DisplayName")
         return x[0].Value.Value.Text
 
     async def resolve_description(self, info):
-        self.set_node()
-        attributeKey = self.node_key + "/Description"
-        x = await attribute_loader.load(attributeKey)
+        x = await self.load_attribute("Description")
         return x[0].Value.Value.Text
 
     async def resolve_node_class(self, info):
-        self.set_node()
-        attributeKey = self.node_key + "/NodeClass"
-        x = await attribute_loader.load(attributeKey)
+        x = await self.load_attribute("NodeClass")
         return x[0].Value.Value.name
 
-    async def resolve_variable(self, info):
-        self.set_node()
+    async def resolve_variable(self, info, index_range=None, packed=False):
+        server = self.server_object
 
-        if subscribeVariables is True:
-            variable = self.server_object.subscriptions.get(self.node_id)
+        if subscribeVariables is True and index_range is None:
+            variable = server.subscribed_value(self.node_id)
             if variable is not None:
-                return OPCUAVariable(
-                    value=variable.Value.Value,
-                    data_type=variable.Value.VariantType.name,
-                    source_timestamp=variable.SourceTimestamp,
-                    status_code=variable.StatusCode.name
-                )
+                tag_value(server.name, self.node_id, variable)
+                return create_variable(variable, packed=packed)
+            elif server.owner is None:
+                server.subscribe_variable(self.node_id)
             else:
-                self.server_object.subscribe_variable(self.node_id)
+                # Owner reads and subscribes the node
+                results, readTime, queueTime = await server.read_values(
+                    [self.node_id], True
+                )
+                tag_value(server.name, self.node_id, results[0])
+                return create_variable(
+                    results[0], readTime, packed, queueTime
+                )
         else:
-            attributeKey = self.node_key + "/Value"
-            x = await attribute_loader.load(attributeKey)
-            return OPCUAVariable(
-                value=x[0].Value.Value,
-                data_type=x[0].Value.VariantType.name,
-                source_timestamp=x[0].SourceTimestamp,
-                status_code=x[0].StatusCode.name,
-                read_time=x[1]
-            )
+            x = await self.load_attribute("Value", index_range)
+            return create_variable(x[0], x[1], packed, x[2])
 
-    def resolve_path(self, info):
-        self.set_node()
+    async def resolve_path(self, info):
+        await self.server_object.ensure_connection()
+        tag_model(self.server_object)
         return self.server_object.get_node_path(self.node_id)
 
     def resolve_node_id(self, info):
         return self.node_id
 
-    def resolve_sub_nodes(self, info):
-        self.set_node()
-        subNodes = []
-        for subNode in self.node.get_children():
-            subNodes.append(OPCUANode(
-                    server=self.server,
-                    node_id=subNode.nodeid.to_string()
-                ))
-        return subNodes
+    async def resolve_sub_nodes(
+        self, info, node_class=None, reference_type=None,
+        browse_direction=None, browse_name=None
+    ):
+        server = self.server_object
+        browseFilter = createBrowseFilter(
+            node_class, reference_type, browse_direction
+        )
+        nodeId = await server.get_node_id(self.node_id)
+        tag_model(server)
+        if len(browseFilter) == 0 and browse_name is None:
+            entries = server.indexed_children(nodeId.to_string())
+            if entries is not None:
+                return [
+                    create_sub_node(
+                        server, entry.nodeId,
+                        ua.LocalizedText(entry.displayName),
+                        ua.NodeClass(entry.nodeClass)
+                    )
+                    for entry in entries
+                ]
+
+        references = await server.get_children(
+            nodeId, browseName=browse_name, resultMask=SUB_NODE_RESULT_MASK,
+            **browseFilter
+        )
+        # Name and node class come with the browse results
+        return [
+            create_sub_node(
+                server, reference.NodeId.to_string(),
+                reference.DisplayName, reference.NodeClass
+            )
+            for reference in references
+        ]
 
     async def resolve_variable_sub_nodes(self, info):
-        self.set_node()
-        variableNodes = await self.server_object.get_variable_nodes(self.node)
-        nodes = []
-        for variable in variableNodes:
-            node_id = variable.nodeid.to_string()
-            nodes.append(OPCUANode(
-                server=self.server,
-                node_id=node_id
-            ))
-        return nodes
+        server = self.server_object
+        nodeId = await server.get_node_id(self.node_id)
+        variableNodes = await server.get_variable_nodes(nodeId)
+        tag_model(server)
+        return [
+            NodeHandle(server, variable.to_string())
+            for variable in variableNodes
+        ]
 
     def resolve_server(self, info):
         return self.server
@@ -130,11 +257,282 @@ class OPCUAVariable(ObjectType):
 
     value = OPCUADataVariable(description=d.value)
     data_type = String(description=d.data_type)
-    source_timestamp = DateTime(
+    source_timestamp = OPCUADateTime(
         description=d.source_timestamp
     )
     status_code = String(description=d.status_code)
     read_time = Int(description=d.read_time)
+    queue_time = Int(description=d.queue_time)
+    packed_type = String(description=d.packed_type)
+    dimensions = List(Int, description=d.dimensions)
+
+
+def create_variable(dataValue, readTime=None, packed=False, queueTime=None):
+    """
+    Creates OPCUAVariable from an OPC UA DataValue.
+    If packed is True, numeric array values are packed into base64.
+    Structured values are returned as dicts of their fields.
+    """
+
+    value = encode_value(dataValue.Value, responseFormat.get())
+    variantType = dataValue.Value.VariantType
+    packedType = None
+    dimensions = None
+    if packed is True:
+        packedArray = pack_array(value, variantType)
+        if packedArray is not None:
+            value, packedType, dimensions = packedArray
+
+    return OPCUAVariable(
+        value=value,
+        data_type=variantType.name,
+        source_timestamp=dataValue.SourceTimestamp,
+        status_code=dataValue.StatusCode.name,
+        read_time=readTime,
+        queue_time=queueTime,
+        packed_type=packedType,
+        dimensions=dimensions
+    )
+
+
+class OPCUATimeSeries(ObjectType):
+    """
+    Values of a variable node buffered by the API from its subscription.
+    """
+
+    server = String(description=d.server)
+    node_id = String(description=d.node_id)
+    timestamps = List(OPCUADateTime, description=d.timestamps)
+    values = List(Float, description=d.values)
+
+    samples = None
+
+    def resolve_timestamps(self, info):
+        return [from_epoch(timestamp) for timestamp in self.samples[0]]
+
+    def resolve_values(self, info):
+        return self.samples[1].tolist()
+
+
+class OPCUANodeAggregate(ObjectType):
+    """
+    Aggregate of the values of a single node.
+    """
+
+    node_id = String(description=d.node_id)
+    value = Float(description=d.aggregate_value)
+    count = Int(description=d.count)
+
+
+class OPCUAAggregate(ObjectType):
+    """
+    Aggregate computed by the API over values of multiple nodes.
+    """
+
+    server = String(description=d.server)
+    function = String(description=d.function)
+    value = Float(description=d.aggregate_value)
+    count = Int(description=d.count)
+    nodes = List(OPCUANodeAggregate, description=d.aggregate_nodes)
+
+    node_ids = None
+    node_values = None
+    node_counts = None
+
+    def resolve_nodes(self, info):
+        nodes = []
+        for node_id, value, count in zip(
+            self.node_ids, self.node_values, self.node_counts
+        ):
+            nodes.append(OPCUANodeAggregate(
+                node_id=node_id,
+                value=value,
+                count=count
+            ))
+        return nodes
+
+
+class OPCUAAdmissionStatistics(ObjectType):
+    """
+    Admission control statistics of a priority class.
+    """
+
+    priority = String(description=d.priority)
+    admitted = Int(description=d.admitted)
+    rejected = Int(description=d.rejected)
+    average_queue_time = Int(description=d.average_queue_time)
+    max_queue_time = Int(description=d.max_queue_time)
+
+
+class OPCUAChunkStatistics(ObjectType):
+    """
+    Chunking statistics of an OPC UA service.
+    """
+
+    service = String(description=d.service)
+    operation_limit = Int(description=d.operation_limit)
+    requests = Int(description=d.requests)
+    chunked_requests = Int(description=d.chunked_requests)
+    chunks = Int(description=d.chunks)
+
+
+class OPCUAFleetNode(ObjectType):
+    """
+    Node found at a browse path on one server of the fleet.
+    """
+
+    server = String(description=d.server)
+    node_id = String(description=d.node_id)
+    variable = Field(OPCUAVariable, description=d.variable)
+    node = Field(OPCUANode, description=d.fleet_node)
+    error = String(description=d.fleet_error)
+
+    def resolve_node(self, info):
+        if self.node_id is None:
+            return None
+        return NodeHandle(getServer(self.server), self.node_id)
+
+
+async def read_fleet_path(server, path, timeout):
+    """
+    Reads node at path from a server for fleet query.
+    Errors and timeouts are returned in the result.
+    """
+
+    try:
+        nodeId, dataValue, readTime, queueTime = await asyncio.wait_for(
+            server.read_path(path), timeout
+        )
+    except asyncio.TimeoutError:
+        tag_data(server.name, path, "timeout")
+        return OPCUAFleetNode(server=server.name, error="Timed out")
+    except Exception as e:
+        tag_data(server.name, path, str(e))
+        return OPCUAFleetNode(server=server.name, error=str(e))
+
+    tag_value(server.name, nodeId, dataValue)
+    return OPCUAFleetNode(
+        server=server.name,
+        node_id=nodeId,
+        variable=create_variable(dataValue, readTime, queueTime=queueTime)
+    )
+
+
+class OPCUAProvisioning(ObjectType):
+    """
+    Progress of the latest importNodes or deleteNodes of a server.
+    """
+
+    operation = String(description=d.operation)
+    total = Int(description=d.total)
+    done = Int(description=d.done)
+    failed = Int(description=d.failed)
+    finished = Boolean(description=d.finished)
+
+
+class OPCUASearchResult(ObjectType):
+    """
+    Node found in the search index of a server.
+    """
+
+    server = String(description=d.server)
+    node_id = String(description=d.node_id)
+    name = String(description=d.name)
+    browse_name = String(description=d.browse_name_field)
+    description = String(description=d.description)
+    node_class = String(description=d.node_class)
+    path = String(description=d.search_path)
+    node = Field(OPCUANode, description=d.fleet_node)
+
+    def resolve_node(self, info):
+        return NodeHandle(getServer(self.server), self.node_id)
+
+
+class OPCUASearchIndex(ObjectType):
+    """
+    Status of the search index of a server.
+    """
+
+    nodes = Int(description=d.index_nodes)
+    words = Int(description=d.index_words)
+    crawling = Boolean(description=d.crawling)
+    updated = OPCUADateTime(description=d.index_updated)
+    crawl_time = Int(description=d.crawl_time)
+
+
+class OPCUABrowseCache(ObjectType):
+    """
+    Statistics of the browse result cache of a server.
+    """
+
+    nodes = Int(description=d.browse_cache_nodes)
+    references = Int(description=d.browse_cache_references)
+    max_references = Int(description=d.browse_cache_max_references)
+    ttl = Float(description=d.browse_cache_ttl)
+    hits = Int(description=d.cache_hits)
+    misses = Int(description=d.cache_misses)
+    evictions = Int(description=d.cache_evictions)
+    model_change_events = Boolean(description=d.model_change_events)
+
+
+class OPCUASharedValues(ObjectType):
+    """
+    Statistics of the shared value table of a server in this worker.
+    """
+
+    slots = Int(description=d.shared_value_slots)
+    nodes = Int(description=d.shared_value_nodes)
+    hits = Int(description=d.cache_hits)
+    misses = Int(description=d.cache_misses)
+    retries = Int(description=d.shared_value_retries)
+    overflows = Int(description=d.shared_value_overflows)
+
+
+class OPCUAIOWorker(ObjectType):
+    """
+    Dedicated I/O threads of a server or a group of servers.
+    """
+
+    name = String(description=d.io_worker_name)
+    threads = Int(description=d.io_worker_threads)
+    active = Int(description=d.io_worker_active)
+    queued = Int(description=d.io_worker_queued)
+    calls = Int(description=d.io_worker_calls)
+    failures = Int(description=d.io_worker_failures)
+    latency = Float(description=d.io_worker_latency)
+    queue_latency = Float(description=d.io_worker_queue_latency)
+    max_latency = Float(description=d.io_worker_max_latency)
+    longest_call = Float(description=d.io_worker_longest_call)
+    healthy = Boolean(description=d.io_worker_healthy)
+    last_error = String(description=d.io_worker_last_error)
+    last_success = OPCUADateTime(description=d.io_worker_last_success)
+
+
+class OPCUABackupServer(ObjectType):
+    """
+    Backup server of a redundant OPC UA server.
+    """
+
+    end_point_address = String(description=d.end_point_address)
+    connected = Boolean(description=d.backup_connected)
+    last_error = String(description=d.backup_last_error)
+
+
+class OPCUARedundancy(ObjectType):
+    """
+    Backup servers of a server and statistics of reads sent to them.
+    """
+
+    backups = List(OPCUABackupServer, description=d.backups)
+    hedge_reads = Boolean(description=d.hedge_reads)
+    hedge_delay = Float(description=d.hedge_delay)
+    hedged_reads = Int(description=d.hedged_reads)
+    hedge_wins = Int(description=d.hedge_wins)
+    failovers = Int(description=d.failovers)
+    backup_reads = Int(description=d.backup_reads)
+    last_failover_time = Float(description=d.last_failover_time)
+    max_failover_time = Float(description=d.max_failover_time)
+    primary_down = Boolean(description=d.primary_down)
 
 
 class OPCUAServer(ObjectType):
@@ -145,10 +543,194 @@ class OPCUAServer(ObjectType):
     name = String(description=d.server)
     end_point_address = String(description=d.end_point_address)
     subscriptions = List(String)
+    buffered_nodes = Int(description=d.buffered_nodes)
+    buffer_memory = Int(description=d.buffer_memory)
+    buffer_memory_limit = Int(description=d.buffer_memory_limit)
+    active_requests = Int(description=d.active_requests)
+    queued_requests = Int(description=d.queued_requests)
+    admission = List(OPCUAAdmissionStatistics, description=d.admission)
+    chunking = List(OPCUAChunkStatistics, description=d.chunking)
+    search_index = Field(OPCUASearchIndex, description=d.search_index)
+    browse_cache = Field(OPCUABrowseCache, description=d.browse_cache)
+    shared_values = Field(OPCUASharedValues, description=d.shared_values)
+    io_worker = Field(OPCUAIOWorker, description=d.io_worker)
+    redundancy = Field(OPCUARedundancy, description=d.redundancy)
+    owner = Int(description=d.owner)
+    provisioning = Field(OPCUAProvisioning, description=d.provisioning)
 
     def resolve_subscriptions(self, info):
         server = getServer(self.name)
-        return server.subscriptions.keys()
+        return tag_statistics(
+            self.name, "subscriptions", sorted(server.subscriptions.keys())
+        )
+
+    def resolve_buffered_nodes(self, info):
+        server = getServer(self.name)
+        if server.timeSeries is None:
+            return 0
+        return len(server.timeSeries.buffers)
+
+    def resolve_buffer_memory(self, info):
+        server = getServer(self.name)
+        if server.timeSeries is None:
+            return 0
+        return tag_statistics(
+            self.name, "bufferMemory", server.timeSeries.memoryUsed
+        )
+
+    def resolve_buffer_memory_limit(self, info):
+        server = getServer(self.name)
+        if server.timeSeries is None:
+            return 0
+        return tag_statistics(
+            self.name, "bufferMemoryLimit", server.timeSeries.memoryLimit
+        )
+
+    def resolve_active_requests(self, info):
+        return tag_statistics(
+            self.name, "activeRequests", getServer(self.name).admission.active
+        )
+
+    def resolve_queued_requests(self, info):
+        return tag_statistics(
+            self.name, "queuedRequests",
+            getServer(self.name).admission.queueLength
+        )
+
+    def resolve_admission(self, info):
+        server = getServer(self.name)
+        return tag_statistics(self.name, "admission", [
+            OPCUAAdmissionStatistics(
+                priority=statistics["priority"],
+                admitted=statistics["admitted"],
+                rejected=statistics["rejected"],
+                average_queue_time=statistics["averageQueueTime"],
+                max_queue_time=statistics["maxQueueTime"]
+            )
+            for statistics in server.admission.statistics()
+        ])
+
+    def resolve_chunking(self, info):
+        server = getServer(self.name)
+        return tag_statistics(self.name, "chunking", [
+            OPCUAChunkStatistics(
+                service=service,
+                operation_limit=server.operation_limit(limitName),
+                requests=server.chunking[service][0],
+                chunked_requests=server.chunking[service][1],
+                chunks=server.chunking[service][2]
+            )
+            for service, (limitName, field) in CHUNKED_SERVICES.items()
+        ])
+
+    def resolve_search_index(self, info):
+        server = getServer(self.name)
+        index = server.searchIndex
+        crawling = server.crawlTask is not None and not server.crawlTask.done()
+        if index is None:
+            return tag_statistics(self.name, "searchIndex", OPCUASearchIndex(
+                nodes=0, words=0, crawling=crawling
+            ))
+        return tag_statistics(self.name, "searchIndex", OPCUASearchIndex(
+            nodes=len(index),
+            words=len(index.words),
+            crawling=crawling,
+            updated=index.createdAt,
+            crawl_time=index.crawlTime
+        ))
+
+    def resolve_owner(self, info):
+        return tag_statistics(self.name, "owner", getServer(self.name).owner)
+
+    def resolve_browse_cache(self, info):
+        server = getServer(self.name)
+        cache = server.browseCache
+        if cache is None:
+            return tag_statistics(self.name, "browseCache", None)
+        return tag_statistics(self.name, "browseCache", OPCUABrowseCache(
+            nodes=len(cache),
+            references=cache.references,
+            max_references=cache.maxReferences,
+            ttl=cache.ttl,
+            hits=cache.hits,
+            misses=cache.misses,
+            evictions=cache.evictions,
+            model_change_events=server.modelChangeEvents
+        ))
+
+    def resolve_shared_values(self, info):
+        server = getServer(self.name)
+        table = server.sharedValues
+        if server.owner is not None:
+            table = server.shared_values()
+        if table is None:
+            return tag_statistics(self.name, "sharedValues", None)
+        return tag_statistics(self.name, "sharedValues", OPCUASharedValues(
+            slots=table.slots,
+            nodes=len(table),
+            hits=table.hits,
+            misses=table.misses,
+            retries=table.retries,
+            overflows=table.overflows
+        ))
+
+    def resolve_io_worker(self, info):
+        worker = getServer(self.name).ioWorker
+        if worker is None:
+            return tag_statistics(self.name, "ioWorker", None)
+        return tag_statistics(self.name, "ioWorker", OPCUAIOWorker(
+            name=worker.name,
+            threads=worker.threads,
+            active=worker.active,
+            queued=worker.queued,
+            calls=worker.calls,
+            failures=worker.failures,
+            latency=worker.latency,
+            queue_latency=worker.queueLatency,
+            max_latency=worker.maxLatency,
+            longest_call=worker.longestCall,
+            healthy=worker.healthy,
+            last_error=worker.lastError,
+            last_success=worker.lastSuccess
+        ))
+
+    def resolve_redundancy(self, info):
+        redundancy = getServer(self.name).redundancy
+        if redundancy is None:
+            return tag_statistics(self.name, "redundancy", None)
+        return tag_statistics(self.name, "redundancy", OPCUARedundancy(
+            backups=[
+                OPCUABackupServer(
+                    end_point_address=backup.endPointAddress,
+                    connected=backup.is_connected(),
+                    last_error=backup.lastError
+                )
+                for backup in redundancy.backups
+            ],
+            hedge_reads=redundancy.hedgeReads,
+            hedge_delay=redundancy.hedge_delay() * 1000,
+            hedged_reads=redundancy.hedgedReads,
+            hedge_wins=redundancy.hedgeWins,
+            failovers=redundancy.failovers,
+            backup_reads=redundancy.backupReads,
+            last_failover_time=None if redundancy.lastFailoverTime is None
+            else redundancy.lastFailoverTime / 1e6,
+            max_failover_time=None if redundancy.maxFailoverTime is None
+            else redundancy.maxFailoverTime / 1e6,
+            primary_down=redundancy.primary_down()
+        ))
+
+    def resolve_provisioning(self, info):
+        progress = getServer(self.name).provisioning
+        if progress is None:
+            return tag_statistics(self.name, "provisioning", None)
+        return tag_statistics(self.name, "provisioning", OPCUAProvisioning(
+            operation=progress.operation,
+            total=progress.total,
+            done=progress.done,
+            failed=progress.failed,
+            finished=progress.finished
+        ))
 
 
 class Query(ObjectType):
@@ -163,20 +745,67 @@ class Query(ObjectType):
         node_id=String(required=True, description=d.node_id),
         description=OPCUANode.__doc__
     )
+    node_by_path = Field(
+        OPCUANode,
+        server=String(required=True, description=d.server),
+        path=String(required=True, description=d.browse_path),
+        description=d.node_by_path
+    )
     servers = List(
         OPCUAServer,
         description=OPCUAServer.__doc__
     )
+    recent = Field(
+        OPCUATimeSeries,
+        server=String(required=True, description=d.server),
+        node_id=String(required=True, description=d.node_id),
+        window=Float(description=d.window),
+        description=OPCUATimeSeries.__doc__
+    )
+    fleet = List(
+        OPCUAFleetNode,
+        path=String(required=True, description=d.browse_path),
+        servers=List(String, description=d.fleet_servers),
+        timeout=Float(description=d.fleet_timeout),
+        description=d.fleet
+    )
+    aggregate = Field(
+        OPCUAAggregate,
+        server=String(required=True, description=d.server),
+        node_ids=List(String, description=d.node_ids),
+        paths=List(String, description=d.paths),
+        function=String(required=True, description=d.function),
+        window=Float(description=d.aggregate_window),
+        description=OPCUAAggregate.__doc__
+    )
+    search = List(
+        OPCUASearchResult,
+        server=String(required=True, description=d.server),
+        text=String(required=True, description=d.search_text),
+        node_class=List(String, description=d.node_classes),
+        limit=Int(description=d.search_limit),
+        substring=Boolean(description=d.substring),
+        description=d.search
+    )
 
     def resolve_node(self, info, server, node_id):
         """
         Get specified attributes of an OPC UA node.
         """
+        return NodeHandle(getServer(server), node_id)
+
+    async def resolve_node_by_path(self, info, server, path):
+        """
+        Get specified attributes of an OPC UA node at a browse path.
+        """
+
         server = getServer(server)
-        return OPCUANode(
-            server=server.name,
-            node_id=node_id
-        )
+        nodeId = await within_deadline(asyncio.shield(
+            path_loaders[server.name].load(
+                (server.name, path, requestDeadline.get())
+            )
+        ))
+        return NodeHandle(server, nodeId)
 
     def resolve_servers(self, info):
         """
@@ -186,9 +815,101 @@ class Query(ObjectType):
         servers = getServers()
         result = []
         for server in servers:
+            tag_data(
+                server.name, server.endPointAddress,
+                len(server.subscriptions),
+                0 if server.timeSeries is None
+                else len(server.timeSeries.buffers)
+            )
             result.append(OPCUAServer(
                 name=server.name,
                 end_point_address=server.endPointAddress
             ))
 
         return result
+
+    async def resolve_recent(self, info, server, node_id, window=None):
+        """
+        Get buffered values of a variable node without reading
+        from the OPC UA server.
+        """
+
+        server = getServer(server)
+        result = OPCUATimeSeries(server=server.name, node_id=node_id)
+        result.samples = await server.call_owner(
+            "recent_values", node_id, window
+        )
+        timestamps = result.samples[0]
+        if len(timestamps) > 0:
+            tag_data(
+                server.name, node_id, len(timestamps),
+                timestamps[0], timestamps[-1]
+            )
+        return result
+
+    async def resolve_fleet(self, info, path, servers=None, timeout=5.0):
+        """
+        Read node at the same browse path on many servers concurrently.
+        """
+
+        if servers is None:
+            servers = getServers()
+        else:
+            servers = [getServer(server) for server in servers]
+        return await asyncio.gather(*[
+            read_fleet_path(server, path, timeout) for server in servers
+        ])
+
+    async def resolve_aggregate(
+        self, info, server, function, node_ids=None, paths=None, window=None
+    ):
+        """
+        Get an aggregate over current or buffered values of nodes.
+        """
+
+        server = getServer(server)
+        if paths is not None:
+            node_ids = await server.get_node_ids(paths)
+        elif node_ids is None:
+            raise ValueError("Either nodeIds or paths is required")
+        value, count, nodeValues, nodeCounts = await server.call_owner(
+            "aggregate_values", node_ids, function, window
+        )
+        result = OPCUAAggregate(
+            server=server.name,
+            function=function,
+            value=value,
+            count=count
+        )
+        result.node_ids = node_ids
+        result.node_values = nodeValues
+        result.node_counts = nodeCounts
+        tag_data(server.name, node_ids, function, nodeValues, nodeCounts)
+        return result
+
+    async def resolve_search(
+        self, info, server, text, node_class=None, limit=50, substring=False
+    ):
+        """
+        Find nodes by name, description or path from the search index.
+        """
+
+        server = getServer(server)
+        browseFilter = createBrowseFilter(node_class)
+        index = await server.get_search_index()
+        entries = index.search(
+            text, browseFilter.get("nodeClassMask", 0), limit, substring
+        )
+        tag_data(server.name, "search", index.version, index.createdAt)
+        return [
+            OPCUASearchResult(
+                server=server.name,
+                node_id=entry.nodeId,
+                name=entry.displayName,
+                browse_name=entry.browseName,
+                description=entry.description,
+                node_class=ua.NodeClass(entry.nodeClass).name,
+                path=entry.path
+            )
+            for entry in entries
+        ]
@@ -1,6 +1,8 @@
 from graphene.types import Scalar
+from graphene.types.datetime import DateTime
+from encoding import responseFormat, JSON
 from graphql.language.ast import StringValue, IntValue, FloatValue, \
-    BooleanValue, EnumValue
+    BooleanValue, EnumValue, ListValue
 
 import datetime
 
@@ -9,9 +11,10 @@ class OPCUADataVariable(Scalar):
     """
     Custom scalar type that accepts all common data types.
 
-    Formats datetime objects into JSONifiable format.
+    Formats datetime objects into JSONifiable format
+    unless the response is encoded in a binary format.
     Supports multiple different value types
-    (int, float, datetime, string, boolean).
+    (int, float, datetime, string, boolean) and lists of them.
     """
 
     class Meta():
@@ -20,6 +23,8 @@ class OPCUADataVariable(Scalar):
     # Serialization for returned values
     @staticmethod
     def serialize(value):
+        if responseFormat.get() != JSON:
+            return value
         if isinstance(value, (datetime.date, datetime.datetime)):
             return value.isoformat()
         return value
@@ -27,6 +32,10 @@ class OPCUADataVariable(Scalar):
     # Parsing for inputted value
     @staticmethod
     def parse_literal(node):
+        if isinstance(node, ListValue):
+            return [
+                OPCUADataVariable.parse_literal(value) for value in node.values
+            ]
         value = node.value
         if isinstance(node, IntValue):
             num = int(value)
@@ -55,3 +64,20 @@ class OPCUADataVariable(Scalar):
     @staticmethod
     def parse_value(value):
         return value
+
+
+class OPCUADateTime(DateTime):
+    """
+    DateTime scalar that is serialized as an ISO 8601 string in JSON
+    responses and kept native in binary response formats.
+    """
+
+    class Meta():
+        name = "DateTime"
+        description = __doc__
+
+    @staticmethod
+    def serialize(dt):
+        if responseFormat.get() != JSON:
+            return dt
+        return DateTime.serialize(dt)
@@ -0,0 +1,152 @@
+"""
+GraphQL endpoint of the API.
+Extends Starlette's GraphQLApp with response content negotiation,
+conditional responses and request deadlines.
+"""
+
+from starlette import status
+from starlette.background import BackgroundTasks
+from starlette.graphql import GraphQLApp
+from starlette.responses import PlainTextResponse, Response
+from graphql.error import format_error as format_graphql_error
+from graphql.error import GraphQLError
+from graphql.language.ast import OperationDefinition
+from graphql.language.parser import parse
+from encoding import negotiate, is_msgpack, create_response, responseFormat
+from etag import ResponseTag, responseTag, if_none_match
+from admission import currentClient, client_id
+from deadline import requestDeadline, request_deadline, DeadlineExceeded
+import msgpack
+
+
+class OPCUAGraphQLApp(GraphQLApp):
+    """
+    GraphQL endpoint that returns JSON or MessagePack depending on the
+    Accept header of the request. MessagePack request bodies
+    (Content-Type: application/msgpack) are accepted as well.
+
+    Responses to queries have an ETag computed from the values and model
+    versions they are built from. If it matches If-None-Match of the
+    request, 304 Not Modified is returned without serializing the data.
+
+    Requests with a deadline (see deadline.py) get the fields resolved
+    before it, with errors for the rest. Such partial responses are
+    200 OK if the deadline caused all their errors.
+    """
+
+    async def handle_graphql(self, request):
+        if request.method in ("GET", "HEAD"):
+            if "text/html" in request.headers.get("Accept", ""):
+                if not self.graphiql:
+                    return PlainTextResponse(
+                        "Not Found", status_code=status.HTTP_404_NOT_FOUND
+                    )
+                return await self.handle_graphiql(request)
+
+            data = request.query_params
+
+        elif request.method == "POST":
+            content_type = request.headers.get("Content-Type", "")
+
+            if "application/json" in content_type:
+                data = await request.json()
+            elif is_msgpack(request):
+                data = msgpack.unpackb(await request.body(), raw=False)
+            elif "application/graphql" in content_type:
+                body = await request.body()
+                text = body.decode()
+                data = {"query": text}
+            elif "query" in request.query_params:
+                data = request.query_params
+            else:
+                return PlainTextResponse(
+                    "Unsupported Media Type",
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                )
+
+        else:
+            return PlainTextResponse(
+                "Method Not Allowed",
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+
+        try:
+            query = data["query"]
+            variables = data.get("variables")
+            operation_name = data.get("operationName")
+        except KeyError:
+            return PlainTextResponse(
+                "No GraphQL query found in the request",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            deadline = request_deadline(request, data)
+        except ValueError:
+            return PlainTextResponse(
+                "Timeout must be a number of milliseconds",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Parsed here to only compute ETags for queries
+        tag = None
+        try:
+            query = parse(query)
+            if not any(
+                isinstance(definition, OperationDefinition) and
+                definition.operation == "mutation"
+                for definition in query.definitions
+            ):
+                tag = ResponseTag(query.loc.source.body, variables)
+        except GraphQLError:
+            pass
+
+        mediaType = negotiate(request)
+        formatToken = responseFormat.set(mediaType)
+        tagToken = responseTag.set(tag)
+        clientToken = currentClient.set(client_id(request))
+        deadlineToken = requestDeadline.set(deadline)
+        try:
+            background = BackgroundTasks()
+            context = {"request": request, "background": background}
+
+            result = await self.execute(
+                query, variables=variables, context=context,
+                operation_name=operation_name
+            )
+        finally:
+            responseFormat.reset(formatToken)
+            responseTag.reset(tagToken)
+            currentClient.reset(clientToken)
+            requestDeadline.reset(deadlineToken)
+
+        headers = {}
+        if tag is not None and not result.errors:
+            tag.add(mediaType, operation_name)
+            etag = tag.etag()
+            headers = {"ETag": etag, "Vary": "Accept"}
+            if if_none_match(request, etag):
+                return Response(status_code=304, headers=headers)
+
+        error_data = (
+            [format_graphql_error(err) for err in result.errors]
+            if result.errors
+            else None
+        )
+        response_data = {"data": result.data}
+        if error_data:
+            response_data["errors"] = error_data
+        status_code = (
+            status.HTTP_400_BAD_REQUEST if result.errors
+            and not all(
+                isinstance(
+                    getattr(error, "original_error", None), DeadlineExceeded
+                )
+                for error in result.errors
+            )
+            else status.HTTP_200_OK
+        )
+
+        return create_response(
+            response_data, mediaType, status_code,
+            headers=headers, background=background
+        )
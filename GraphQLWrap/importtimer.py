@@ -0,0 +1,8 @@
+"""
+Start time of importing the app. Imported first by main.py, so the time
+the other imports take can be logged at startup.
+"""
+
+import time
+
+importStart = time.perf_counter()
@@ -0,0 +1,139 @@
+"""
+Dedicated I/O threads for OPC UA servers:
+    - Blocking python-opcua calls of a server, or of a group of servers,
+      run in a thread pool of their own with its own queue. A slow server
+      only uses up its own threads, not the default executor of the event
+      loop shared by all servers.
+    - Each worker keeps health and latency statistics of its calls.
+"""
+
+import time
+import asyncio
+import datetime
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads of a worker if not set in servers.json
+IO_THREADS = 4
+# Consecutive failed calls after which a worker is unhealthy
+UNHEALTHY_FAILURES = 3
+# Seconds a call may run before the worker is unhealthy
+STALL_TIMEOUT = 10
+# Weight of the latest call in the moving averages of latency
+LATENCY_WEIGHT = 0.1
+
+
+class IOWorker(object):
+    """
+    Runs blocking calls for OPC UA servers in a dedicated thread pool.
+    Calls over the number of threads wait in the queue of the pool.
+
+    Arguments                                   Example
+    name:       Name of the worker, servers
+                with the same name share it     "Line1"
+    threads:    Number of threads               4
+    """
+
+    def __init__(self, name, threads=IO_THREADS):
+        self.name = name
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(
+            threads, thread_name_prefix="io-" + name
+        )
+        # Calls submitted and not finished, and start times of the
+        # calls running in the threads by call id
+        self.pending = 0
+        self.running = {}
+        self.callIds = itertools.count()
+        # ---------- Statistics -----------
+        self.calls = 0
+        self.failures = 0
+        self.consecutiveFailures = 0
+        # Moving averages and maximum (ms)
+        self.latency = None
+        self.queueLatency = None
+        self.maxLatency = 0
+        self.lastError = None
+        self.lastSuccess = None
+
+    @property
+    def active(self):
+        return len(self.running)
+
+    @property
+    def queued(self):
+        return max(self.pending - len(self.running), 0)
+
+    @property
+    def longestCall(self):
+        """
+        Seconds the longest running call has run, 0 if none is running.
+        """
+
+        starts = list(self.running.values())
+        if len(starts) == 0:
+            return 0
+        return time.monotonic() - min(starts)
+
+    @property
+    def healthy(self):
+        """
+        False if the latest calls failed or a call has been running for
+        longer than STALL_TIMEOUT seconds.
+        """
+
+        return (
+            self.consecutiveFailures < UNHEALTHY_FAILURES
+            and self.longestCall < STALL_TIMEOUT
+        )
+
+    def average(self, average, value):
+        if average is None:
+            return value
+        return average + LATENCY_WEIGHT * (value - average)
+
+    async def run(self, function, *arguments):
+        """
+        Calls function(*arguments) in a thread of the worker.
+        Returns its result or raises its error.
+        """
+
+        callId = next(self.callIds)
+        submitted = time.monotonic()
+        times = [submitted, submitted]
+
+        def call():
+            times[0] = time.monotonic()
+            self.running[callId] = times[0]
+            try:
+                return function(*arguments)
+            finally:
+                times[1] = time.monotonic()
+                del self.running[callId]
+
+        self.pending += 1
+        try:
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.executor, call
+            )
+        except Exception as e:
+            self.failures += 1
+            self.consecutiveFailures += 1
+            self.lastError = str(e) or type(e).__name__
+            raise
+        else:
+            self.consecutiveFailures = 0
+            self.lastSuccess = datetime.datetime.now(datetime.timezone.utc)
+        finally:
+            self.pending -= 1
+            self.calls += 1
+            latency = (times[1] - times[0]) * 1000
+            self.latency = self.average(self.latency, latency)
+            self.queueLatency = self.average(
+                self.queueLatency, (times[0] - submitted) * 1000
+            )
+            self.maxLatency = max(self.maxLatency, latency)
+        return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
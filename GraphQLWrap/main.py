@@ -1,13 +1,30 @@
+from importtimer import importStart
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
 
-from starlette.graphql import GraphQLApp
+from graphqlapp import OPCUAGraphQLApp
 from graphql.execution.executors.asyncio import AsyncioExecutor
 from schema import schema
 
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
-from opcuautils import getServers
+import opcuautils
+from opcuautils import getServer, getServers, warmUpServers, \
+    startIndexing, startSharding
+from encoding import negotiate, is_msgpack, create_response, JSON, \
+    encode_value
+from etag import ResponseTag, if_none_match
+from admission import currentClient, client_id, OverloadError
+from deadline import requestDeadline, request_deadline
+from starlette.responses import Response
+from graphene_schema import query
+from opcua import ua
+import asyncio
+import msgpack
+import time
+import logging
+
+logger = logging.getLogger("main")
 
 templates = Jinja2Templates(directory="templates")
 
@@ -28,10 +45,54 @@ app.mount(
 )
 app.mount(
     "/graphql",
-    GraphQLApp(schema=schema, executor_class=AsyncioExecutor)
+    OPCUAGraphQLApp(schema=schema, executor_class=AsyncioExecutor)
 )
 
 
+# Startup warm-up state reported by /ready
+readiness = {"ready": False, "servers": {}}
+
+
+async def warm_up():
+    start = time.perf_counter()
+    readiness["servers"] = await warmUpServers(opcuautils.warmUpTimeout)
+    readiness["ready"] = True
+    logger.info(
+        "Warmed up %d servers in %.0f ms, %d failed.",
+        len(readiness["servers"]),
+        (time.perf_counter() - start) * 1000,
+        sum(error is not None for error in readiness["servers"].values())
+    )
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    Starts connecting to all servers in the background if warmUpTimeout
+    is set in servers.json. Otherwise servers connect on first use.
+    Starts crawling servers that have searchIndexInterval set.
+    With shardWorkers set, first claims the servers this worker owns.
+    """
+
+    logger.info("Imported app in %.0f ms.", importTime)
+    await startSharding()
+    startIndexing()
+    if opcuautils.warmUpTimeout is None:
+        readiness["ready"] = True
+    else:
+        asyncio.ensure_future(warm_up())
+
+
+@app.route("/ready")
+async def ready(request):
+    """
+    Readiness probe. Responds 503 until startup warm-up is done, then 200.
+    servers has warm-up errors by server name, null if warmed up.
+    """
+
+    return create_response(readiness, JSON, 200 if readiness["ready"] else 503)
+
+
 @app.route("/")
 async def index(request):
     servers = []
@@ -43,3 +104,116 @@ async def index(request):
             "servers": servers
         }
     )
+
+
+@app.route("/values", methods=["GET", "POST"])
+async def values(request):
+    """
+    Fast path for reading and writing values of many nodes of one server
+    without GraphQL schema execution. Response is JSON or MessagePack
+    depending on the Accept header.
+
+    GET /values?server=TestServer&nodeId=ns=2;i=2&nodeId=ns=2;i=3
+    Returns values, dataTypes, statusCodes and sourceTimestamps
+    in the order of the nodeIds, readTime and queueTime. Supports
+    conditional requests with If-None-Match.
+
+    POST /values
+    Body: {"server": "TestServer", "nodeIds": ["ns=2;i=2"],
+           "values": [1234], "dataTypes": ["Int32"]}
+    dataTypes and indexRanges are optional.
+    Returns statusCodes in the order of the nodeIds, writeTime
+    and queueTime.
+
+    Nodes can be given by browse paths instead of node ids, with path
+    query parameters in GET and paths in POST.
+
+    Responds 400 if the request or a node id is malformed, 503 if the
+    OPC UA server's admission queue is full, and 504 if the server can't
+    be reached or didn't respond in time or before the deadline set with
+    the X-Timeout-Ms header.
+    """
+
+    mediaType = negotiate(request)
+    headers = {}
+    currentClient.set(client_id(request))
+    try:
+        requestDeadline.set(request_deadline(request))
+        if request.method == "GET":
+            server = getServer(request.query_params.get("server"))
+            nodeIds = request.query_params.getlist("nodeId")
+            paths = request.query_params.getlist("path")
+            if len(paths) > 0:
+                nodeIds = await server.get_node_ids(paths)
+            results, readTime, queueTime = await server.read_values(
+                nodeIds, query.subscribeVariables
+            )
+
+            tag = ResponseTag(mediaType, server.name, nodeIds)
+            for nodeId, result in zip(nodeIds, results):
+                tag.add_value(server.name, nodeId, result)
+            headers = {"ETag": tag.etag(), "Vary": "Accept"}
+            if if_none_match(request, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+
+            timestamps = [result.SourceTimestamp for result in results]
+            if mediaType == JSON:
+                timestamps = [
+                    timestamp.isoformat() if timestamp is not None else None
+                    for timestamp in timestamps
+                ]
+            content = {
+                "server": server.name,
+                "nodeIds": nodeIds,
+                "values": [
+                    encode_value(result.Value, mediaType) for result in results
+                ],
+                "dataTypes": [
+                    result.Value.VariantType.name for result in results
+                ],
+                "statusCodes": [result.StatusCode.name for result in results],
+                "sourceTimestamps": timestamps,
+                "readTime": readTime,
+                "queueTime": queueTime,
+            }
+        else:
+            if is_msgpack(request):
+                data = msgpack.unpackb(await request.body(), raw=False)
+            else:
+                data = await request.json()
+            server = getServer(data.get("server"))
+            if "paths" in data:
+                nodeIds = await server.get_node_ids(data["paths"])
+            else:
+                nodeIds = data["nodeIds"]
+            values = data["values"]
+            if len(values) != len(nodeIds):
+                raise ValueError("nodeIds and values differ in length")
+            dataTypes = data.get("dataTypes") or [None] * len(nodeIds)
+            indexRanges = data.get("indexRanges") or [None] * len(nodeIds)
+            results, writeTime, queueTime = await server.write_attributes([
+                (nodeId, "Value", value, dataType, indexRange)
+                for nodeId, value, dataType, indexRange
+                in zip(nodeIds, values, dataTypes, indexRanges)
+            ])
+            content = {
+                "server": server.name,
+                "nodeIds": nodeIds,
+                "statusCodes": [result.name for result in results],
+                "writeTime": writeTime,
+                "queueTime": queueTime,
+            }
+    except (ValueError, KeyError, ua.UaStringParsingError) as e:
+        return create_response({"error": str(e)}, mediaType, 400)
+    except OverloadError as e:
+        return create_response({"error": str(e)}, mediaType, 503)
+    except (OSError, asyncio.TimeoutError) as e:
+        # Includes TimeoutError and refused or reset connections
+        return create_response(
+            {"error": str(e) or type(e).__name__}, mediaType, 504
+        )
+
+    return create_response(content, mediaType, headers=headers)
+
+
+importTime = (time.perf_counter() - importStart) * 1000
@@ -12,10 +12,128 @@ import logging
 import socket
 import time
 import asyncio
+import concurrent.futures
+from timeseries import TimeSeriesStore, aggregate
+from admission import AdmissionController, OverloadError, currentClient, \
+    WRITE, VALUE_READ, METADATA_READ, BROWSE
+from coalescing import WriteCoalescer
+from provisioning import ProvisioningProgress, \
+    create_add_nodes_item, create_add_references_item
+from pathindex import PathIndex, parse_path, parse_crawled_path
+from cache import LRUCache, BrowseCache
+from searchindex import SearchIndex, SearchEntry
+from snapshot import save_snapshot, load_snapshot, read_snapshot_meta
+from structures import create_structures, save_type_dictionaries, \
+    load_type_dictionaries
+from sharding import ownerOf, claimSlot, serve, ShardClient, \
+    defaultSocketDirectory
+from sharedvalues import SharedValueTable
+from ioworkers import IOWorker, IO_THREADS
+from deadline import requestDeadline, within_deadline, DeadlineExceeded
+from redundancy import Redundancy, BACKUP_RETRY
+from collections import defaultdict
+from array import array
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+import copy
+import hashlib
 
 # List that will contain all OPCUAServer objects
 serverList = []
 
+# Maximum number of nodes in one AddNodes, AddReferences, DeleteNodes
+# or Browse request when provisioning
+PROVISIONING_BATCH_SIZE = 1000
+
+# Maximum number of parsed node ids and ReadValueIds cached per server
+NODE_CACHE_SIZE = 10000
+
+# Number of nodes browsed or read in one request when crawling
+CRAWL_BATCH_SIZE = 1000
+
+# Maximum number of nodes in the search index of a server
+SEARCH_INDEX_MAX_NODES = 200000
+
+# Default maximum number of references in the browse cache of a server,
+# and seconds until cached browse results expire
+BROWSE_CACHE_SIZE = 100000
+BROWSE_CACHE_TTL = 60
+
+HIERARCHICAL_REFERENCES = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+
+# Errors of the primary server after which a read is sent to a backup.
+# The primary is not considered down when it's only overloaded.
+FAILOVER_ERRORS = (
+    OSError, TimeoutError, concurrent.futures.TimeoutError, OverloadError
+)
+
+# Events that tell the address space of a server has changed
+MODEL_CHANGE_EVENTS = [
+    ua.ObjectIds.GeneralModelChangeEventType,
+    ua.ObjectIds.SemanticChangeEventType,
+]
+
+# Server_ServerCapabilities_OperationLimits variables read on connect
+OPERATION_LIMITS = [
+    "MaxNodesPerRead",
+    "MaxNodesPerWrite",
+    "MaxNodesPerBrowse",
+    "MaxNodesPerTranslateBrowsePathsToNodeIds",
+    "MaxNodesPerNodeManagement",
+    "MaxMonitoredItemsPerCall",
+]
+
+# Services split into chunks by operation limits:
+# (operation limit, field of request parameters that has the operations,
+# None if parameters are a list of operations)
+CHUNKED_SERVICES = {
+    "Read": ("MaxNodesPerRead", "NodesToRead"),
+    "Write": ("MaxNodesPerWrite", "NodesToWrite"),
+    "Browse": ("MaxNodesPerBrowse", "NodesToBrowse"),
+    "TranslateBrowsePaths": ("MaxNodesPerTranslateBrowsePathsToNodeIds", None),
+    "AddNodes": ("MaxNodesPerNodeManagement", None),
+    "AddReferences": ("MaxNodesPerNodeManagement", None),
+    "DeleteNodes": ("MaxNodesPerNodeManagement", "NodesToDelete"),
+}
+
+# Seconds to wait for servers to warm up at startup,
+# set from servers.json. None disables warm-up.
+warmUpTimeout = None
+
+# Directory of address space snapshots of servers,
+# set from servers.json. None disables snapshots.
+snapshotDirectory = None
+
+# Number of worker processes sharing the servers and directory of their
+# sockets, set from servers.json. None runs every worker unsharded.
+shardWorkers = None
+shardSocketDirectory = defaultSocketDirectory()
+
+# Slot of this worker, its lock file and the client forwarding calls
+# to other workers, set by startSharding
+workerSlot = None
+workerLock = None
+shardClient = None
+
+# Dedicated I/O workers by name and their number of threads,
+# set from servers.json
+ioWorkers = {}
+ioThreads = IO_THREADS
+
+# Seconds between attempts to attach to the shared value table of
+# a server owned by another worker
+SHARED_VALUES_RETRY = 5
+
+# Services that change the address space when forwarded to the owner
+MODEL_SERVICES = ["AddNodes", "AddReferences", "DeleteNodes"]
+
+# Methods other workers may call on servers owned by this worker
+FORWARDED_METHODS = [
+    "call_named", "session_state", "add_node", "delete_node",
+    "read_values", "recent_values", "aggregate_values",
+    "write_attributes", "set_node_attribute",
+]
+
 
 def getServer(serverName):
     """
@@ -37,28 +155,269 @@ def getServers():
     return serverList
 
 
+async def warmUpServers(timeout, servers=None):
+    """
+    Connects to servers (all by default) concurrently and prefetches
+    their session metadata. Servers not warmed up in timeout seconds
+    keep connecting in the background.
+
+    Returns dict of server name: None if warmed up, else error message.
+    """
+
+    if servers is None:
+        servers = list(serverList)
+    tasks = [asyncio.ensure_future(server.warm_up()) for server in servers]
+    if len(tasks) > 0:
+        await asyncio.wait(tasks, timeout=timeout)
+
+    results = {}
+    for server, task in zip(servers, tasks):
+        if not task.done():
+            results[server.name] = "Warm-up timed out"
+            # Avoids warnings of never retrieved exceptions
+            task.add_done_callback(
+                lambda task: task.cancelled() or task.exception()
+            )
+        elif task.exception() is not None:
+            results[server.name] = str(task.exception()) or \
+                type(task.exception()).__name__
+        else:
+            results[server.name] = None
+    return results
+
+
+def startIndexing():
+    """
+    Starts keeping search indexes of servers that have
+    searchIndexInterval set in servers.json, and loading snapshots
+    of servers if snapshots are enabled.
+    Servers owned by other workers are indexed on first search only.
+    """
+
+    for server in serverList:
+        if server.owner is not None:
+            continue
+        if server.indexingTask is None and (
+            server.searchIndexInterval or server.snapshotPath is not None
+        ):
+            server.indexingTask = asyncio.ensure_future(
+                server.keep_search_index()
+            )
+
+
+async def startSharding():
+    """
+    Claims a worker slot when shardWorkers is set in servers.json,
+    and assigns each server to the worker slot that owns it. Calls for
+    servers owned by other workers are forwarded to them. Starts serving
+    calls forwarded to this worker.
+    If all slots are taken, all servers are forwarded.
+    """
+
+    global workerSlot, workerLock, shardClient
+
+    if not shardWorkers:
+        return
+    workerSlot, workerLock = claimSlot(shardSocketDirectory, shardWorkers)
+    shardClient = ShardClient(shardSocketDirectory)
+    for server in serverList:
+        owner = ownerOf(server.name, shardWorkers)
+        server.owner = None if owner == workerSlot else owner
+        if server.owner is None and server.sharedValueSlots:
+            try:
+                server.sharedValues = SharedValueTable(
+                    sharedValuesName(server.name), server.sharedValueSlots,
+                    create=True
+                )
+            except OSError as e:
+                logging.getLogger("sharding").warning(
+                    "Shared values of %s not available: %s", server.name, e
+                )
+    if workerSlot is None:
+        logging.getLogger("sharding").warning(
+            "All %d worker slots are taken, forwarding all servers.",
+            shardWorkers
+        )
+        return
+    await serve(shardSocketDirectory, workerSlot, handleForwarded)
+    logging.getLogger("sharding").info(
+        "Worker slot %d owns %s.", workerSlot, ", ".join(
+            server.name for server in serverList if server.owner is None
+        )
+    )
+
+
+async def handleForwarded(message):
+    """
+    Calls a method of a server owned by this worker for another worker.
+    Returns result of the method and model version of the server.
+
+    Arguments                                   Example
+    message:    (server name, method name,
+                arguments, client id,
+                deadline of the request)        ("Test", "read_values",
+                                                (["ns=2;i=2"],), "1.2.3.4",
+                                                None)
+    """
+
+    serverName, method, arguments, clientId, deadline = message
+    if method not in FORWARDED_METHODS:
+        raise ValueError("Method " + method + " can't be forwarded")
+    server = getServer(serverName)
+    if server.owner is not None:
+        raise ValueError(serverName + " is not owned by this worker")
+    currentClient.set(clientId)
+    # Monotonic time is the same for all processes of the machine
+    requestDeadline.set(deadline)
+    result = getattr(server, method)(*arguments)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result, server.modelVersion
+
+
+def getIOWorker(name):
+    """
+    Returns I/O worker of a server or a group of servers,
+    created with ioThreads threads on first use.
+    """
+
+    worker = ioWorkers.get(name)
+    if worker is None:
+        worker = ioWorkers[name] = IOWorker(name, ioThreads)
+    return worker
+
+
+def sharedValuesName(serverName):
+    """
+    Returns name of the shared memory holding the latest values of
+    a server, the same for all workers using the same socket directory.
+    """
+
+    return "opcua-graphql-" + hashlib.sha1(
+        (shardSocketDirectory + "/" + serverName).encode("utf-8")
+    ).hexdigest()[:16]
+
+
 def setupServers():
     """
     Finds servers based on what's configured in servers.json.
     Creates OPCUAServer instances and adds them to serverList.
     """
 
+    global warmUpTimeout, snapshotDirectory, shardWorkers, \
+        shardSocketDirectory, ioThreads
+
     serverList.clear()
     with open(os.path.join(
         os.getcwd(),
         os.path.dirname(__file__),
         "servers.json")
     ) as serversFile:
-        servers = json.load(serversFile)["servers"]
+        config = json.load(serversFile)
+        warmUpTimeout = config.get("warmUpTimeout")
+        snapshotDirectory = config.get("snapshotDirectory")
+        shardWorkers = config.get("shardWorkers")
+        shardSocketDirectory = config.get(
+            "shardSocketDirectory", shardSocketDirectory
+        )
+        ioThreads = config.get("ioThreads", ioThreads)
+        servers = config["servers"]
         for server in servers:
+            # Several endpoints are a redundancy set, the first is primary
+            endPointAddresses = server.get("endPointAddress")
+            if not isinstance(endPointAddresses, list):
+                endPointAddresses = [endPointAddresses]
             serverList.append(OPCUAServer(
                 name=server.get("name"),
-                endPointAddress=server.get("endPointAddress"),
+                endPointAddress=endPointAddresses[0],
+                backupEndPointAddresses=endPointAddresses[1:],
+                discoverRedundantServers=server.get(
+                    "discoverRedundantServers", False
+                ),
+                hedgeReads=server.get("hedgeReads", False),
+                hedgeDelay=None if server.get("hedgeDelay") is None
+                else server.get("hedgeDelay") / 1000,
                 nameSpaceUri=server.get("nameSpaceUri"),
-                browseRootNodeIdentifier=server.get("browseRootNodeIdentifier")
+                browseRootNodeIdentifier=server.get(
+                    "browseRootNodeIdentifier"
+                ),
+                bufferCapacity=server.get("bufferCapacity"),
+                bufferMemoryLimit=server.get("bufferMemoryLimit"),
+                bufferNodeIds=server.get("bufferNodeIds"),
+                maxConcurrentRequests=server.get("maxConcurrentRequests"),
+                maxQueueDepth=server.get("maxQueueDepth"),
+                writeCoalescingWindow=server.get("writeCoalescingWindow"),
+                writeCoalescingNodeIds=server.get("writeCoalescingNodeIds"),
+                operationLimits=server.get("operationLimits"),
+                searchIndexInterval=server.get("searchIndexInterval"),
+                browseCacheSize=server.get("browseCacheSize"),
+                browseCacheTtl=server.get("browseCacheTtl"),
+                sharedValueSlots=server.get("sharedValueSlots"),
+                ioWorker=None if not server.get("ioWorker")
+                else getIOWorker(
+                    server.get("name") if server.get("ioWorker") is True
+                    else server.get("ioWorker")
+                ),
+                snapshotPath=None if snapshotDirectory is None
+                else os.path.join(
+                    os.path.dirname(serversFile.name), snapshotDirectory,
+                    server.get("name") + ".sqlite"
+                ),
+                typeDictionaryPath=None if snapshotDirectory is None
+                else os.path.join(
+                    os.path.dirname(serversFile.name), snapshotDirectory,
+                    server.get("name") + ".types.json"
+                )
             ))
 
 
+def serverAddress(endPointAddress):
+    """
+    Returns host, port and path of an endpoint address, which are the same
+    for all endpoint addresses of one OPC UA server regardless of user.
+    """
+
+    parts = urlsplit(endPointAddress)
+    return (parts.hostname, parts.port, parts.path.rstrip("/"))
+
+
+def createBrowseFilter(
+    nodeClasses=None, referenceType=None, browseDirection=None
+):
+    """
+    Creates OPCUAServer.get_children arguments from names used in queries.
+    Raises ValueError for unknown names.
+
+    Arguments                               Example
+    nodeClasses:    Names of node classes   ["Object", "Variable"]
+    referenceType:  Name or node id of
+                    reference type          "HasComponent" or "i=47"
+    browseDirection:Forward, Inverse or Both "Both"
+    """
+
+    browseFilter = {}
+    if nodeClasses:
+        mask = 0
+        for name in nodeClasses:
+            if name not in ua.NodeClass.__members__:
+                raise ValueError("Unknown node class " + name)
+            mask |= ua.NodeClass[name]
+        browseFilter["nodeClassMask"] = mask
+    if referenceType is not None:
+        referenceTypeId = getattr(ua.ObjectIds, referenceType, None)
+        if referenceTypeId is None:
+            try:
+                referenceTypeId = ua.NodeId.from_string(referenceType)
+            except Exception:
+                raise ValueError("Unknown reference type " + referenceType)
+        browseFilter["referenceTypeId"] = referenceTypeId
+    if browseDirection is not None:
+        if browseDirection not in ("Forward", "Inverse", "Both"):
+            raise ValueError("Unknown browse direction " + browseDirection)
+        browseFilter["browseDirection"] = ua.BrowseDirection[browseDirection]
+    return browseFilter
+
+
 class OPCUAServer(object):
     """
     Each instance of this class manages a connection to its own OPC UA server.
@@ -67,7 +426,14 @@ class OPCUAServer(object):
 
     def __init__(
         self, name, endPointAddress,
-        nameSpaceUri=None, browseRootNodeIdentifier=None
+        nameSpaceUri=None, browseRootNodeIdentifier=None,
+        bufferCapacity=None, bufferMemoryLimit=None, bufferNodeIds=None,
+        maxConcurrentRequests=None, maxQueueDepth=None,
+        writeCoalescingWindow=None, writeCoalescingNodeIds=None,
+        operationLimits=None, searchIndexInterval=None, snapshotPath=None,
+        browseCacheSize=None, browseCacheTtl=None, typeDictionaryPath=None,
+        sharedValueSlots=None, ioWorker=None, backupEndPointAddresses=None,
+        discoverRedundantServers=False, hedgeReads=False, hedgeDelay=None
     ):
         # ---------- Setup -----------
         self.name = name
@@ -77,9 +443,109 @@ class OPCUAServer(object):
         self.nameSpaceIndex = None
         self.browseRootNodeIdentifier = browseRootNodeIdentifier
         self.rootNodeId = None
+        # Changed whenever node data other than values may have changed
+        self.modelVersion = time.time_ns()
         self.client = Client(self.endPointAddress, timeout=2)
         self.sub = None
         self.subscriptions = {}
+        self.monitoredItems = {}
+        # Ring buffers for subscribed values, disabled if no capacity set
+        self.timeSeries = None
+        if bufferCapacity:
+            self.timeSeries = TimeSeriesStore(bufferCapacity)
+            if bufferMemoryLimit:
+                self.timeSeries.memoryLimit = bufferMemoryLimit
+        self.bufferNodeIds = bufferNodeIds or []
+        # Limits concurrent service calls to the server
+        self.admission = AdmissionController(
+            self.name, maxConcurrentRequests or 4, maxQueueDepth or 100
+        )
+        # Merges value writes within the window, disabled if no window set
+        self.writeCoalescer = None
+        if writeCoalescingWindow:
+            self.writeCoalescer = WriteCoalescer(
+                self, writeCoalescingWindow, writeCoalescingNodeIds
+            )
+        # Progress of the latest importNodes or deleteNodes
+        self.provisioning = None
+        # Created in the event loop by ensure_connection
+        self.connectLock = None
+        self.connecting = None
+        # Browse paths resolved to node ids
+        self.pathIndex = PathIndex()
+        # Parsed ua.NodeIds and ReadValueIds of recently used nodes
+        self.nodeIdCache = LRUCache(NODE_CACHE_SIZE)
+        self.readValueCache = LRUCache(NODE_CACHE_SIZE)
+        # Session metadata, read on first use or at warm-up
+        self.namespaceArray = None
+        self.operationLimits = None
+        self.dataTypes = None
+        # Operation limits from servers.json used instead of the server's
+        self.operationLimitOverrides = operationLimits or {}
+        # Requests, chunked requests and chunks sent of each service
+        self.chunking = {
+            service: [0, 0, 0] for service in CHUNKED_SERVICES
+        }
+        # Search index of the address space, crawled on first search or
+        # in the background every searchIndexInterval seconds if set
+        self.searchIndex = None
+        self.searchIndexInterval = searchIndexInterval
+        # Node data is served from the index while it is younger than
+        # indexTtl seconds, or the server has sent model change events
+        self.indexTtl = searchIndexInterval or (
+            BROWSE_CACHE_TTL if browseCacheTtl is None else browseCacheTtl
+        )
+        self.crawlTask = None
+        self.indexingTask = None
+        # Search index is saved to and loaded from snapshotPath if set
+        self.snapshotPath = snapshotPath
+        self.snapshotChecked = False
+        # Hierarchical forward references of recently browsed nodes,
+        # disabled if browseCacheSize is 0
+        self.browseCache = None
+        if browseCacheSize != 0:
+            self.browseCache = BrowseCache(
+                browseCacheSize or BROWSE_CACHE_SIZE,
+                BROWSE_CACHE_TTL if browseCacheTtl is None
+                else browseCacheTtl
+            )
+        # True if the server sends model change events to the wrapper,
+        # and if it has sent any since the wrapper subscribed to them
+        self.modelChangeEvents = False
+        self.modelChangeEventsSeen = False
+        # Node ids affected by model change events since the last crawl
+        # and the number of the events, None if an event didn't tell
+        self.changedNodeIds = set()
+        self.changeEvents = 0
+        # Data type dictionaries of the server and the structure classes
+        # generated from them, loaded on connect. Dictionaries are saved to
+        # typeDictionaryPath if set.
+        self.typeDictionaries = None
+        self.structures = {}
+        self.typeDictionaryPath = typeDictionaryPath
+        # Slot of the worker owning the session to the server when it is
+        # owned by another worker (see startSharding), and its model
+        # version in the latest forwarded call
+        self.owner = None
+        self.ownerVersion = None
+        # Latest values of subscribed nodes shared between workers when
+        # sharded, written by the owner and read by the other workers
+        # without forwarding. Disabled if no sharedValueSlots set.
+        self.sharedValueSlots = sharedValueSlots
+        self.sharedValues = None
+        self.sharedValuesAttached = None
+        # Dedicated threads for blocking calls to the server,
+        # None uses the default executor shared by all servers
+        self.ioWorker = ioWorker
+        # Sessions to backup servers reads fail over to, and are hedged
+        # to if hedgeReads is set. Backups are given in servers.json or
+        # discovered from the server's ServerUriArray on connect.
+        self.redundancy = None
+        self.discoverRedundantServers = discoverRedundantServers
+        if backupEndPointAddresses or discoverRedundantServers:
+            self.redundancy = Redundancy(
+                backupEndPointAddresses or [], hedgeReads, hedgeDelay
+            )
         # ----------------------------
 
     def check_connection(self):
@@ -90,13 +556,49 @@ class OPCUAServer(object):
         If either fails, try to (re)connect.
         """
 
-        if self.client.uaclient._uasocket is None:
-            self.connect()
-        elif self.client.uaclient._uasocket._thread is None:
-            self.connect()
-        elif not self.client.uaclient._uasocket._thread.is_alive():
+        if self.owner is not None:
+            raise RuntimeError(
+                self.name + " is connected by worker " + str(self.owner)
+            )
+        if not self.is_connected():
             self.connect()
 
+    def is_connected(self):
+        """
+        Checks if connection thread to the OPC UA server is running.
+        """
+
+        uasocket = self.client.uaclient._uasocket
+        return (
+            uasocket is not None and uasocket._thread is not None
+            and uasocket._thread.is_alive()
+        )
+
+    async def ensure_connection(self):
+        """
+        Same as check_connection, but (re)connects in a worker thread
+        so an unreachable server doesn't block the event loop.
+        Servers owned by other workers get session data from the owner.
+        """
+
+        if self.owner is not None:
+            if self.rootNodeId is None:
+                await self.attach()
+            return
+        if self.is_connected():
+            return
+        if self.connectLock is None:
+            self.connectLock = asyncio.Lock()
+        async with self.connectLock:
+            if not self.is_connected():
+                if self.connecting is None or self.connecting.done():
+                    self.connecting = asyncio.ensure_future(
+                        self.run_io(self.connect)
+                    )
+                # Connecting continues if the request waiting for it
+                # is cancelled, and is waited for by the next request
+                await asyncio.shield(self.connecting)
+
     def connect(self):
         """
         Connect to OPC UA server.
@@ -106,7 +608,26 @@ class OPCUAServer(object):
         try:
             self.logger.info("Connecting to " + self.name + ".")
             self.client.connect()
+            self.namespaceArray = None
+            self.operationLimits = None
+            self.dataTypes = None
             self.update_namespace_and_root_node_id()
+            self.modelVersion += 1
+            self.nodeIdCache.clear()
+            self.readValueCache.clear()
+            self.read_operation_limits()
+            self.load_structures()
+            if self.discoverRedundantServers:
+                self.discover_backups()
+            self.sub = None
+            self.monitoredItems.clear()
+            for nodeId in self.bufferNodeIds:
+                self.subscribe_variable(nodeId)
+            if (
+                self.browseCache is not None or self.searchIndexInterval
+                or self.snapshotPath is not None
+            ):
+                self.subscribe_model_changes()
         except socket.timeout:
             self.logger.info(self.name + " socket timed out.")
             try:
@@ -117,6 +638,35 @@ class OPCUAServer(object):
             self.logger.info("Socket and session cleaned up.")
             raise TimeoutError(self.name + " timed out.")
 
+    def discover_backups(self):
+        """
+        Adds the other servers in ServerRedundancy.ServerUriArray of the
+        server as backups, at the discovery URLs FindServers returns
+        for them. Servers not supporting redundancy have no backups.
+        """
+
+        try:
+            uris = self.client.get_node(ua.NodeId(
+                ua.ObjectIds.Server_ServerRedundancy_ServerUriArray
+            )).get_value() or []
+            ownUris = self.client.get_node(ua.NodeId(
+                ua.ObjectIds.Server_ServerArray
+            )).get_value() or []
+        except ua.UaStatusCodeError:
+            return
+        uris = [uri for uri in uris if uri not in ownUris[:1]]
+        if len(uris) == 0:
+            return
+        for description in self.client.find_servers(uris):
+            if (
+                description.ApplicationUri in uris
+                and description.DiscoveryUrls
+            ):
+                if self.redundancy.add_backup(description.DiscoveryUrls[0]):
+                    self.logger.info(
+                        "Discovered backup " + description.DiscoveryUrls[0]
+                    )
+
     def update_namespace_and_root_node_id(self):
         """
         Update rootNodeId and nameSpaceIndex.
@@ -125,6 +675,7 @@ class OPCUAServer(object):
 
         if self.nameSpaceUri and self.browseRootNodeIdentifier:
             nsArray = self.client.get_namespace_array()
+            self.namespaceArray = nsArray
             index = nsArray.index(self.nameSpaceUri)
             if index > 0:
                 nodeId = "ns={};".format(index) + self.browseRootNodeIdentifier
@@ -158,15 +709,23 @@ class OPCUAServer(object):
 
     def get_node(self, nodeId=""):
         """
-        Returns node from nodeId or identifier.
+        Returns python-opcua node from nodeId or identifier, see map_node_id.
+        Only needed for the synchronous python-opcua node API,
+        get_node_id is enough for service calls of this class.
+        """
+
+        self.check_connection()
+        return self.client.get_node(self.map_node_id(nodeId))
+
+    def map_node_id(self, nodeId=""):
+        """
+        Returns node id string from nodeId or identifier.
         If no namespace given in nodeId,
         assumes the namespace to namespace given for the server in settings.py.
         Only the ns set for the server in servers.json is accessible via
         browsing.
         """
 
-        self.check_connection()
-
         if nodeId == "":
             nodeId = self.rootNodeId
         elif self.nameSpaceIndex is None:
@@ -179,17 +738,384 @@ class OPCUAServer(object):
                 nodeId = f"ns={self.nameSpaceIndex};{identifier}"
         else:
             nodeId = f"ns={self.nameSpaceIndex};{nodeId}"
+        return nodeId
+
+    async def get_node_id(self, nodeId=""):
+        """
+        Returns parsed ua.NodeId from nodeId or identifier, see
+        map_node_id. Connects first if needed, as namespace and root node
+        are known only after connecting.
+        """
+
+        await self.ensure_connection()
+        return self.parse_node_id(self.map_node_id(nodeId))
+
+    async def get_children(
+        self, nodeId,
+        referenceTypeId=ua.ObjectIds.HierarchicalReferences,
+        browseDirection=ua.BrowseDirection.Forward,
+        nodeClassMask=0, browseName=None,
+        resultMask=ua.BrowseResultMask.All
+    ):
+        """
+        Browses references of a node, hierarchical forward references
+        by default. Returns ReferenceDescriptions of the found nodes.
+
+        Arguments                               Example
+        referenceTypeId:Type of references and
+                        its subtypes            ua.ObjectIds.HasComponent
+        browseDirection:ua.BrowseDirection      ua.BrowseDirection.Both
+        nodeClassMask:  ua.NodeClass values
+                        or'ed, 0 for all        3
+        browseName:     Pattern of browse names
+                        (fnmatch), all if None  "Temperature*"
+        resultMask:     ua.BrowseResultMask     ua.BrowseResultMask.All
+
+        Reference type, direction and node classes are filtered by the
+        server. Node classes are checked again here for servers that
+        ignore the mask, and browse names are only filtered here.
+
+        Hierarchical forward references are served from the browse cache
+        when it is enabled, and filtered here.
+        """
+
+        children = await self.browse_children(
+            [nodeId], referenceTypeId, browseDirection, nodeClassMask,
+            resultMask
+        )
+        references = children[0]
+        if nodeClassMask:
+            references = [
+                reference for reference in references
+                if reference.NodeClass & nodeClassMask
+            ]
+        if browseName is not None:
+            references = [
+                reference for reference in references
+                if fnmatchcase(reference.BrowseName.Name or "", browseName)
+            ]
+        return references
+
+    async def browse_children(
+        self, nodeIds,
+        referenceTypeId=ua.ObjectIds.HierarchicalReferences,
+        browseDirection=ua.BrowseDirection.Forward,
+        nodeClassMask=0, resultMask=ua.BrowseResultMask.All,
+        useCache=True
+    ):
+        """
+        Browses hierarchical (or referenceTypeId) forward (or
+        browseDirection) references of many nodes in one request.
+        Returns a list of ReferenceDescriptions for each node.
+
+        Hierarchical forward references are cached with all fields and
+        without node class filtering, so filtered results for cached nodes
+        may have nodes of other classes. useCache False always browses.
+        """
+
+        if not isinstance(referenceTypeId, ua.NodeId):
+            referenceTypeId = ua.NodeId(referenceTypeId)
+
+        cache = self.browseCache
+        if (
+            cache is not None and useCache
+            and referenceTypeId == HIERARCHICAL_REFERENCES
+            and browseDirection == ua.BrowseDirection.Forward
+        ):
+            cache.validate(self.modelVersion)
+            version = self.modelVersion
+            results = [cache.get(nodeId) for nodeId in nodeIds]
+            missing = [
+                i for i, references in enumerate(results)
+                if references is None
+            ]
+            if len(missing) > 0:
+                browsed = await self.browse_children(
+                    [nodeIds[i] for i in missing], useCache=False
+                )
+                for i, references in zip(missing, browsed):
+                    results[i] = references
+                    if version == self.modelVersion:
+                        cache.put(nodeIds[i], references)
+            return results
+
+        results, browseTime, queueTime = await self.browse(
+            self.create_browse_parameters(
+                nodeIds, referenceTypeId, browseDirection, nodeClassMask,
+                resultMask
+            )
+        )
+        return [result.References for result in results]
+
+    def create_browse_parameters(
+        self, nodeIds,
+        referenceTypeId=ua.ObjectIds.HierarchicalReferences,
+        browseDirection=ua.BrowseDirection.Forward,
+        nodeClassMask=0, resultMask=ua.BrowseResultMask.All
+    ):
+        """
+        Creates ua.BrowseParameters for browsing references of many nodes
+        with the same filter, see browse_children.
+        """
+
+        if not isinstance(referenceTypeId, ua.NodeId):
+            referenceTypeId = ua.NodeId(referenceTypeId)
+
+        params = ua.BrowseParameters()
+        params.View.Timestamp = ua.get_win_epoch()
+        params.RequestedMaxReferencesPerNode = 0
+        for nodeId in nodeIds:
+            description = ua.BrowseDescription()
+            description.NodeId = nodeId
+            description.BrowseDirection = browseDirection
+            description.ReferenceTypeId = referenceTypeId
+            description.IncludeSubtypes = True
+            description.NodeClassMask = nodeClassMask
+            description.ResultMask = resultMask
+            params.NodesToBrowse.append(description)
+        return params
+
+    async def get_namespace_array(self):
+        """
+        Reads namespace array of the OPC UA server.
+        Cached until the next connect.
+        """
+
+        if self.namespaceArray is None:
+            results, readTime, queueTime = await self.read_attributes(
+                [("i=2255", "Value", None)]
+            )
+            self.namespaceArray = results[0].Value.Value
+        return self.namespaceArray
+
+    def read_operation_limits(self):
+        """
+        Synchronously reads operation limits of the OPC UA server
+        into self.operationLimits. Called on connect.
+        """
+
+        params = ua.ReadParameters()
+        for name in OPERATION_LIMITS:
+            params.NodesToRead.append(self.create_read_value(
+                "i=" + str(getattr(
+                    ua.ObjectIds,
+                    "Server_ServerCapabilities_OperationLimits_" + name
+                )),
+                "Value"
+            ))
+        try:
+            results = self.client.uaclient.read(params)
+        except ua.UaError as e:
+            self.logger.info("Operation limits not read: " + str(e))
+            self.operationLimits = {name: None for name in OPERATION_LIMITS}
+            return
+        self.operationLimits = {
+            name: result.Value.Value or None
+            if result.StatusCode.is_good() else None
+            for name, result in zip(OPERATION_LIMITS, results)
+        }
+
+    def load_structures(self):
+        """
+        Synchronously loads data type dictionaries of the OPC UA server and
+        registers decoders for its structures, so read ExtensionObjects
+        are decoded into structures. Called on connect.
 
-        return self.client.get_node(nodeId)
+        Dictionaries are loaded from typeDictionaryPath instead while the
+        namespace array is unchanged, and decoders are only generated again
+        when the dictionaries have changed.
+        """
+
+        try:
+            if self.namespaceArray is None:
+                self.namespaceArray = self.client.get_namespace_array()
+            dictionaries = None
+            if self.typeDictionaryPath is not None:
+                dictionaries = load_type_dictionaries(
+                    self.typeDictionaryPath, self.namespaceArray
+                )
+            if dictionaries is None:
+                dictionaries = self.read_type_dictionaries()
+                if self.typeDictionaryPath is not None:
+                    save_type_dictionaries(
+                        self.typeDictionaryPath, self.namespaceArray,
+                        dictionaries
+                    )
+            if dictionaries != self.typeDictionaries:
+                self.structures = create_structures(
+                    self.name, dictionaries
+                )
+                self.typeDictionaries = dictionaries
+        except Exception as e:
+            self.logger.info("Structured data types not loaded: " + str(e))
+
+    def read_type_dictionaries(self):
+        """
+        Synchronously reads OPC Binary data type dictionaries of the
+        OPC UA server, other than the standard one.
+        Returns list of dicts with xml and encodings for
+        structures.create_structures.
+        """
+
+        uaclient = self.client.uaclient
+        results = self.browse_all(self.create_browse_parameters(
+            [ua.NodeId(ua.ObjectIds.OPCBinarySchema_TypeSystem)],
+            nodeClassMask=ua.NodeClass.Variable
+        ))
+        dictionaryIds = [
+            reference.NodeId for reference in results[0].References
+            if reference.BrowseName != ua.QualifiedName("Opc.Ua")
+        ]
+        if len(dictionaryIds) == 0:
+            return []
+
+        params = ua.ReadParameters()
+        for nodeId in dictionaryIds:
+            params.NodesToRead.append(
+                self.create_read_value(nodeId.to_string())
+            )
+        values = [result.Value.Value for result in uaclient.read(params)]
+
+        # Each structure has a description variable in its dictionary,
+        # referenced from its binary encoding with HasDescription
+        descriptions = [
+            [
+                reference for reference in result.References
+                if reference.NodeClass == ua.NodeClass.Variable
+            ]
+            for result in self.browse_all(
+                self.create_browse_parameters(dictionaryIds)
+            )
+        ]
+        descriptionIds = [
+            reference.NodeId
+            for references in descriptions for reference in references
+        ]
+        encodings = {}
+        if len(descriptionIds) > 0:
+            for nodeId, result in zip(descriptionIds, self.browse_all(
+                self.create_browse_parameters(
+                    descriptionIds, ua.ObjectIds.HasDescription,
+                    ua.BrowseDirection.Inverse
+                )
+            )):
+                if len(result.References) > 0:
+                    encodings[nodeId] = result.References[0].NodeId
+
+        dictionaries = []
+        for value, references in zip(values, descriptions):
+            if value is None:
+                continue
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            dictionaries.append({
+                "xml": value,
+                "encodings": [
+                    [
+                        reference.BrowseName.Name,
+                        encodings[reference.NodeId].to_string()
+                    ]
+                    for reference in references
+                    if reference.NodeId in encodings
+                ]
+            })
+        return dictionaries
+
+    async def get_operation_limits(self):
+        """
+        Returns operation limits of the OPC UA server, read on connect.
+        Dict of limit name: maximum number of operations in one request,
+        None if the server has no limit.
+        """
+
+        await self.ensure_connection()
+        return self.operationLimits
+
+    def operation_limit(self, name):
+        """
+        Returns operation limit from servers.json if set there,
+        else the limit read from the OPC UA server. None if no limit.
+        """
+
+        if name in self.operationLimitOverrides:
+            return self.operationLimitOverrides[name] or None
+        return (self.operationLimits or {}).get(name)
+
+    async def get_data_types(self):
+        """
+        Browses the data type hierarchy of the OPC UA server.
+        Cached until the next connect.
+
+        Returns dict of data type ua.NodeId: ua.NodeId of its supertype.
+        """
+
+        if self.dataTypes is None:
+            dataTypes = {}
+            nodeIds = [ua.NodeId(ua.ObjectIds.BaseDataType)]
+            while len(nodeIds) > 0:
+                subtypes = await self.browse_children(
+                    nodeIds, ua.ObjectIds.HasSubtype
+                )
+                children = []
+                for nodeId, references in zip(nodeIds, subtypes):
+                    for reference in references:
+                        if reference.NodeId not in dataTypes:
+                            dataTypes[reference.NodeId] = nodeId
+                            children.append(reference.NodeId)
+                nodeIds = children
+            self.dataTypes = dataTypes
+        return self.dataTypes
+
+    def data_type_to_variant_type(self, dataType):
+        """
+        Finds variant type of values of a data type from the cached
+        data type hierarchy. Returns None if the hierarchy isn't cached.
+        """
+
+        if self.dataTypes is None:
+            return None
+        nodeId = dataType
+        while nodeId is not None:
+            if (
+                nodeId.NamespaceIndex == 0
+                and isinstance(nodeId.Identifier, int)
+                and nodeId.Identifier <= 30
+            ):
+                if nodeId.Identifier == ua.ObjectIds.Enumeration:
+                    return ua.VariantType.Int32
+                return ua.VariantType(nodeId.Identifier)
+            nodeId = self.dataTypes.get(nodeId)
+        raise ValueError("Unknown data type " + dataType.to_string())
+
+    async def warm_up(self):
+        """
+        Connects to the OPC UA server and prefetches the namespace
+        array, operation limits and data type hierarchy.
+        Returns time taken (ns).
+        """
+
+        start = time.time_ns()
+        await self.ensure_connection()
+        if self.redundancy is not None and self.owner is None:
+            self.keep_backups()
+        await self.get_namespace_array()
+        await self.get_operation_limits()
+        await self.get_data_types()
+        warmUpTime = time.time_ns() - start
+        self.logger.info(
+            "Warmed up " + self.name + " in "
+            + str(warmUpTime // 1000000) + " ms."
+        )
+        return warmUpTime
 
     async def get_variable_nodes(
-        self, node,
+        self, nodeId,
         nodeClass=2, variableList=None, depth=0, maxDepth=10
     ):
         """
-        Eats a list of node object(s).
-        Recursively finds nodes under given nodes that have given nodeClass.
-        Returns node objects in a list.
+        Eats a node id (ua.NodeId).
+        Recursively finds nodes under given node that have given nodeClass.
+        Returns node ids in a list.
         """
 
         if variableList is None:
@@ -199,23 +1125,15 @@ class OPCUAServer(object):
         if depth >= maxDepth:
             return variableList
 
-        nodes = node.get_children()
-        params = ua.ReadParameters()
-        for node in nodes:
-            rv = ua.ReadValueId()
-            rv.NodeId = node.nodeid
-            rv.AttributeId = ua.AttributeIds.NodeClass
-            params.NodesToRead.append(rv)
-
-        results = []
-        if len(params.NodesToRead) > 0:
-            results, readTime = await self.read(params)
-
-        for i in range(len(results)):
-            if nodeClass == results[i].Value.Value:
-                variableList.append(nodes[i])
+        # Node classes come with the browse results, no reads needed
+        references = await self.get_children(
+            nodeId, resultMask=ua.BrowseResultMask.NodeClass
+        )
+        for reference in references:
+            if nodeClass == reference.NodeClass:
+                variableList.append(reference.NodeId)
             await self.get_variable_nodes(
-                node=nodes[i],
+                nodeId=reference.NodeId,
                 nodeClass=nodeClass,
                 variableList=variableList,
                 depth=depth
@@ -223,21 +1141,867 @@ class OPCUAServer(object):
 
         return variableList
 
+    async def crawl(self):
+        """
+        Crawls the address space below the browse root node with
+        batched Browse and Read requests at browse priority, and
+        replaces the search index. Descriptions of nodes already in
+        the index are not read again. Resolved browse paths are added
+        to the path index, and the index is saved as the snapshot of
+        the server if snapshots are enabled.
+        If only model change events of the server have changed the
+        address space since the index was built, only the subtrees
+        they affected are crawled again, see recrawl_roots.
+
+        Returns the new SearchIndex.
+        """
+
+        await self.ensure_connection()
+        version = self.modelVersion
+        changedNodeIds, self.changedNodeIds = self.changedNodeIds, set()
+        changeEvents, self.changeEvents = self.changeEvents, 0
+        start = time.time_ns()
+        if self.snapshotPath is not None:
+            namespaceArray, startTime = await self.read_server_identity()
+            await self.get_data_types()
+        oldIndex = self.searchIndex
+        descriptions = {}
+        if oldIndex is not None:
+            for entry in oldIndex.entries:
+                if entry.nodeId not in changedNodeIds:
+                    descriptions[entry.nodeId] = entry.description
+
+        rootNodeId = self.parse_node_id("")
+        roots = None
+        if (
+            oldIndex is not None and changeEvents > 0
+            and oldIndex.version + changeEvents == version
+        ):
+            roots = await self.recrawl_roots(
+                oldIndex, changedNodeIds, rootNodeId.to_string()
+            )
+        if roots is None:
+            seen = {rootNodeId.to_string()}
+            entries = []
+            childIds = {}
+            level = [(rootNodeId, "")]
+        else:
+            removed = set()
+            for root in roots:
+                removed.update(oldIndex.get_descendants(root))
+            entries = [
+                copy.copy(entry) for entry in oldIndex.entries
+                if entry.nodeId not in removed
+            ]
+            childIds = {
+                parent: children
+                for parent, children in oldIndex.children.items()
+                if parent not in removed and parent not in roots
+            }
+            seen = {entry.nodeId for entry in entries}
+            level = [
+                (ua.NodeId.from_string(root), oldIndex.get(root).path)
+                for root in sorted(roots)
+            ]
+        kept = len(entries)
+        resultMask = (
+            ua.BrowseResultMask.NodeClass
+            | ua.BrowseResultMask.BrowseName
+            | ua.BrowseResultMask.DisplayName
+        )
+        while len(level) > 0 and len(entries) < SEARCH_INDEX_MAX_NODES:
+            children = []
+            for batchStart in range(0, len(level), CRAWL_BATCH_SIZE):
+                batch = level[batchStart:batchStart + CRAWL_BATCH_SIZE]
+                results = await self.browse_children(
+                    [nodeId for nodeId, path in batch],
+                    resultMask=resultMask, useCache=False
+                )
+                for (nodeId, path), references in zip(batch, results):
+                    childIds[nodeId.to_string()] = [
+                        reference.NodeId.to_string()
+                        for reference in references
+                    ]
+                    for reference in references:
+                        childId = reference.NodeId.to_string()
+                        if childId in seen:
+                            continue
+                        seen.add(childId)
+                        browseName = reference.BrowseName
+                        childPath = "{}{}:{}".format(
+                            path + "/" if path else "",
+                            browseName.NamespaceIndex, browseName.Name or ""
+                        )
+                        entries.append(SearchEntry(
+                            childId,
+                            reference.DisplayName.Text,
+                            browseName.Name,
+                            None,
+                            childPath,
+                            reference.NodeClass
+                        ))
+                        children.append((reference.NodeId, childPath))
+            level = children
+        del entries[SEARCH_INDEX_MAX_NODES:]
+
+        unread = []
+        for entry in entries:
+            if entry.nodeId in descriptions:
+                entry.description = descriptions[entry.nodeId]
+            else:
+                unread.append(entry)
+        for batchStart in range(0, len(unread), CRAWL_BATCH_SIZE):
+            batch = unread[batchStart:batchStart + CRAWL_BATCH_SIZE]
+            params = ua.ReadParameters()
+            for entry in batch:
+                rv = ua.ReadValueId()
+                rv.NodeId = ua.NodeId.from_string(entry.nodeId)
+                rv.AttributeId = ua.AttributeIds.Description
+                params.NodesToRead.append(rv)
+            results, readTime, queueTime = await self.call_chunked(
+                BROWSE, "Read", self.client.uaclient.read, params
+            )
+            for entry, result in zip(batch, results):
+                if result.StatusCode.is_good() and result.Value.Value:
+                    entry.description = result.Value.Value.Text
+
+        index = SearchIndex(version)
+        for entry in entries:
+            index.add(entry)
+        index.children = childIds
+        index.createdAt = datetime.datetime.now(datetime.timezone.utc)
+        index.crawlTime = time.time_ns() - start
+        self.set_search_index(index)
+        self.logger.info(
+            "Crawled " + str(len(entries) - kept) + " nodes of " +
+            self.name + " in " + str(index.crawlTime // 1000000) + " ms."
+        )
+
+        if self.snapshotPath is not None:
+            snapshot = self.create_snapshot(index, namespaceArray, startTime)
+            await asyncio.get_event_loop().run_in_executor(
+                None, save_snapshot, self.snapshotPath, snapshot
+            )
+        return index
+
+    async def recrawl_roots(self, index, changedNodeIds, rootNodeId):
+        """
+        Returns node ids of the nodes whose subtrees are crawled again
+        after model change events affected changedNodeIds: the parents of
+        the affected nodes in the index, found by browsing inverse
+        references for nodes not in it. None if the whole address space
+        is crawled again, when an event didn't tell the affected nodes or
+        a parent is the browse root or not in the index.
+        """
+
+        if len(changedNodeIds) == 0 or None in changedNodeIds:
+            return None
+        parents = defaultdict(list)
+        for parent, children in index.children.items():
+            for child in children:
+                parents[child].append(parent)
+        unknown = [
+            nodeId for nodeId in sorted(changedNodeIds)
+            if nodeId not in parents
+        ]
+        if len(unknown) > 0:
+            results = await self.browse_children(
+                [ua.NodeId.from_string(nodeId) for nodeId in unknown],
+                browseDirection=ua.BrowseDirection.Inverse,
+                resultMask=ua.BrowseResultMask.None_, useCache=False
+            )
+            for nodeId, references in zip(unknown, results):
+                parents[nodeId] = [
+                    reference.NodeId.to_string() for reference in references
+                    if reference.NodeId.to_string() in index.children
+                ]
+
+        roots = set()
+        for nodeId in changedNodeIds:
+            if len(parents[nodeId]) == 0:
+                return None
+            roots.update(parents[nodeId])
+        if rootNodeId in roots or any(
+            index.get(root) is None for root in roots
+        ):
+            return None
+        # Subtrees below other changed subtrees are crawled with them
+        below = set()
+        for root in roots:
+            below.update(index.get_descendants(root))
+        return roots - below or None
+
+    def set_search_index(self, index):
+        """
+        Replaces the search index and adds the paths of its nodes to the
+        path index if the address space hasn't changed since.
+        """
+
+        self.searchIndex = index
+        if index.version == self.modelVersion:
+            self.pathIndex.validate(index.version)
+            for entry in index.entries:
+                elements = parse_crawled_path(entry.path)
+                if elements is not None:
+                    self.pathIndex.put(elements, entry.nodeId)
+
+    async def read_server_identity(self):
+        """
+        Reads namespace array and ServerStatus.StartTime of the server.
+        A snapshot is valid while both are the same as when it was saved.
+        """
+
+        results, readTime, queueTime = await self.read_attributes([
+            ("i=" + str(ua.ObjectIds.Server_NamespaceArray), "Value", None),
+            (
+                "i=" + str(ua.ObjectIds.Server_ServerStatus_StartTime),
+                "Value", None
+            ),
+        ])
+        return results[0].Value.Value, results[1].Value.Value
+
+    def create_snapshot(self, index, namespaceArray, startTime):
+        """
+        Creates snapshot dict of a search index for snapshot.save_snapshot.
+        """
+
+        return {
+            "namespaceArray": namespaceArray,
+            "startTime": startTime,
+            "createdAt": index.createdAt,
+            "crawlTime": index.crawlTime,
+            "nodes": [
+                (
+                    entry.nodeId, entry.displayName, entry.browseName,
+                    entry.description, entry.path, int(entry.nodeClass)
+                )
+                for entry in index.entries
+            ],
+            # Nodes without children have a row with null child
+            "children": [
+                (parent, child)
+                for parent, children in index.children.items()
+                for child in children or [None]
+            ],
+            "dataTypes": [
+                (dataType.to_string(), superType.to_string())
+                for dataType, superType in (self.dataTypes or {}).items()
+            ],
+        }
+
+    async def load_snapshot(self):
+        """
+        Loads search index and data types from the snapshot of the
+        server, if the server's namespace array and start time are the
+        same as when it was saved. Returns True if loaded.
+        """
+
+        self.snapshotChecked = True
+        loop = asyncio.get_event_loop()
+        meta = await loop.run_in_executor(
+            None, read_snapshot_meta, self.snapshotPath
+        )
+        if meta is None:
+            return False
+        namespaceArray, startTime = await self.read_server_identity()
+        version = self.modelVersion
+        if meta["namespaceArray"] != namespaceArray or \
+                meta["startTime"] != startTime:
+            self.logger.info("Snapshot of " + self.name + " is outdated.")
+            return False
+
+        start = time.time_ns()
+        snapshot = await loop.run_in_executor(
+            None, load_snapshot, self.snapshotPath
+        )
+        if snapshot is None:
+            return False
+        index = SearchIndex(version)
+        for node in snapshot["nodes"]:
+            index.add(SearchEntry(*node))
+        for parent, child in snapshot["children"]:
+            children = index.children.setdefault(parent, [])
+            if child is not None:
+                children.append(child)
+        index.createdAt = snapshot["createdAt"]
+        index.crawlTime = snapshot["crawlTime"]
+        if self.dataTypes is None and len(snapshot["dataTypes"]) > 0:
+            self.dataTypes = {
+                ua.NodeId.from_string(dataType):
+                ua.NodeId.from_string(superType)
+                for dataType, superType in snapshot["dataTypes"]
+            }
+        self.set_search_index(index)
+        self.logger.info(
+            "Loaded snapshot of " + str(len(index)) + " nodes of " +
+            self.name + " in " + str((time.time_ns() - start) // 1000000) +
+            " ms."
+        )
+        return True
+
+    def indexed_attribute(self, nodeId, attribute):
+        """
+        Returns DataValue of the DisplayName, Description or NodeClass
+        attribute of a node from the search index. None if the node is
+        not in the index or the index is out of date, see index_is_fresh.
+        """
+
+        index = self.searchIndex
+        if not self.index_is_fresh(index):
+            return None
+        entry = index.get(nodeId)
+        if entry is None:
+            return None
+        if attribute == "DisplayName":
+            variant = ua.Variant(ua.LocalizedText(entry.displayName))
+        elif attribute == "Description":
+            variant = ua.Variant(ua.LocalizedText(entry.description))
+        elif attribute == "NodeClass":
+            variant = ua.Variant(
+                ua.NodeClass(entry.nodeClass), ua.VariantType.Int32
+            )
+        else:
+            return None
+        return ua.DataValue(variant)
+
+    def indexed_children(self, nodeId):
+        """
+        Returns SearchEntries of the nodes hierarchically below a node
+        from the search index. None if not in the index or the index is
+        out of date, see index_is_fresh.
+        """
+
+        index = self.searchIndex
+        if not self.index_is_fresh(index):
+            return None
+        return index.get_children(nodeId)
+
+    def index_is_fresh(self, index):
+        """
+        True if node data can be served from a search index: the address
+        space hasn't been changed through the API since the index was
+        built, and the index is younger than indexTtl seconds or the
+        server has sent model change events since connecting. Changes
+        made by other clients are otherwise only seen by crawling again.
+        """
+
+        if index is None or index.version != self.modelVersion:
+            return False
+        if self.modelChangeEventsSeen:
+            return True
+        return (
+            datetime.datetime.now(datetime.timezone.utc) - index.createdAt
+        ).total_seconds() < self.indexTtl
+
+    async def update_search_index(self):
+        """
+        Crawls the server unless a crawl is already running.
+        Returns the search index when the crawl is done.
+        """
+
+        if self.crawlTask is None or self.crawlTask.done():
+            self.crawlTask = asyncio.ensure_future(self.crawl())
+        return await asyncio.shield(self.crawlTask)
+
+    async def get_search_index(self):
+        """
+        Returns the search index of the server. Loads it from the
+        snapshot of the server or crawls the server if it has no index
+        yet, and starts a crawl in the background if the address space
+        was changed through this API since the index was built.
+        """
+
+        if self.searchIndex is None and self.snapshotPath is not None \
+                and not self.snapshotChecked:
+            await self.load_snapshot()
+        if self.searchIndex is None:
+            return await self.update_search_index()
+        if self.searchIndex.version != self.modelVersion and (
+            self.crawlTask is None or self.crawlTask.done()
+        ):
+            self.crawlTask = asyncio.ensure_future(self.crawl())
+        return self.searchIndex
+
+    async def keep_search_index(self):
+        """
+        Keeps the search index fresh: crawls the server every
+        searchIndexInterval seconds and after changes to the address
+        space made through this API. Without searchIndexInterval only
+        loads the snapshot or crawls once.
+        """
+
+        while True:
+            delay = 1
+            index = self.searchIndex
+            try:
+                if index is None:
+                    await self.get_search_index()
+                elif index.version != self.modelVersion or (
+                    self.searchIndexInterval and (
+                        datetime.datetime.now(datetime.timezone.utc)
+                        - index.createdAt
+                    ).total_seconds() >= self.searchIndexInterval
+                ):
+                    await self.update_search_index()
+                elif (
+                    not self.searchIndexInterval
+                    and not self.modelChangeEvents
+                ):
+                    return
+            except Exception as e:
+                self.logger.info(
+                    "Crawling " + self.name + " failed: " + str(e)
+                )
+                delay = min(self.searchIndexInterval or 60, 60)
+            await asyncio.sleep(delay)
+
     def subscribe_variable(self, nodeId):
+        """
+        Subscribes to data changes of a variable node.
+        Nodes already subscribed are not subscribed again.
+        Returns monitored item handle, or None if node is not a variable.
+        """
+
+        if self.owner is not None:
+            # Subscriptions are kept by the owner
+            return None
+        node = self.get_node(nodeId)
+        key = node.nodeid.to_string()
+        if key in self.monitoredItems:
+            return self.monitoredItems[key]
 
         if self.sub is None:
             handler = self
             self.sub = self.client.create_subscription(100, handler)
 
-        node = self.get_node(nodeId)
         if 2 == node.get_attribute(ua.AttributeIds.NodeClass).Value.Value:
-            return self.sub.subscribe_data_change(node)
+            handle = self.sub.subscribe_data_change(node)
+            self.monitoredItems[key] = handle
+            return handle
         else:
             return None
 
+    def subscribe_model_changes(self):
+        """
+        Subscribes to model change events of the server, so cached browse
+        results are dropped as soon as the address space changes.
+        Servers that don't support the events rely on browse cache expiry.
+        """
+
+        self.modelChangeEvents = False
+        self.modelChangeEventsSeen = False
+        try:
+            if self.sub is None:
+                self.sub = self.client.create_subscription(100, self)
+            self.sub.subscribe_events(
+                self.client.get_server_node(), MODEL_CHANGE_EVENTS
+            )
+            self.modelChangeEvents = True
+        except Exception as e:
+            self.logger.info(
+                self.name + " model change events not available: " + str(e)
+            )
+
+    def event_notification(self, event):
+        # Called in the subscription thread. Nodes affected by the change
+        # are crawled again, all nodes if the event doesn't tell.
+        changes = getattr(event, "Changes", None)
+        if changes:
+            for change in changes:
+                affected = getattr(change, "Affected", None)
+                self.changedNodeIds.add(
+                    None if affected is None or affected.is_null()
+                    else affected.to_string()
+                )
+        else:
+            self.changedNodeIds.add(None)
+        self.changeEvents += 1
+        self.modelChangeEventsSeen = True
+        self.modelVersion += 1
+
+    def model_changed(self):
+        """
+        Invalidates cached node data of this server, and of other servers
+        in serverList with the same OPC UA server, after the wrapper has
+        changed the address space.
+        """
+
+        self.modelVersion += 1
+        address = serverAddress(self.endPointAddress)
+        for server in serverList:
+            if (
+                server is not self
+                and serverAddress(server.endPointAddress) == address
+            ):
+                server.modelVersion += 1
+
     def datachange_notification(self, node, value, data):
 
-        self.subscriptions[node.nodeid.to_string()] = data.monitored_item.Value
+        nodeId = node.nodeid.to_string()
+        dataValue = data.monitored_item.Value
+        self.subscriptions[nodeId] = dataValue
+        if self.timeSeries is not None:
+            self.timeSeries.append(nodeId, dataValue)
+        if self.sharedValues is not None:
+            self.sharedValues.put(nodeId, dataValue)
+
+    def shared_values(self):
+        """
+        Returns shared value table of a server owned by another worker,
+        None if not available. Attaches to the table of the owner, again
+        if the owner has replaced it.
+        """
+
+        table = self.sharedValues
+        if table is not None and not table.valid:
+            table.close()
+            table = self.sharedValues = None
+        if (
+            table is None and self.sharedValueSlots
+            and (
+                self.sharedValuesAttached is None
+                or time.monotonic() - self.sharedValuesAttached
+                > SHARED_VALUES_RETRY
+            )
+        ):
+            self.sharedValuesAttached = time.monotonic()
+            try:
+                table = self.sharedValues = SharedValueTable(
+                    sharedValuesName(self.name)
+                )
+            except (OSError, ValueError):
+                table = None
+        return table
+
+    def subscribed_value(self, nodeId):
+        """
+        Returns latest DataValue of a subscribed node, None if the node is
+        not subscribed. Values of servers owned by another worker are read
+        from the shared value table.
+        """
+
+        if self.owner is None:
+            return self.subscriptions.get(nodeId)
+        table = self.shared_values()
+        if table is None:
+            return None
+        return table.get(nodeId)
+
+    def recent_values(self, nodeId, window=None):
+        """
+        Returns buffered samples of a variable node from the last window
+        seconds as (timestamps, values) arrays without reading from the
+        OPC UA server. Subscribes to the node if it's not buffered yet.
+        """
+
+        if self.timeSeries is None:
+            raise ValueError("Value buffering not enabled for " + self.name)
+
+        nodeId = self.get_node(nodeId).nodeid.to_string()
+        if nodeId not in self.monitoredItems:
+            self.subscribe_variable(nodeId)
+        return self.timeSeries.recent(nodeId, window)
+
+    async def aggregate_values(self, nodeIds, function, window=None):
+        """
+        Computes an aggregate over values of variable nodes.
+        If window (seconds) is given, aggregates buffered values of the
+        nodes from that window. Otherwise reads current values of the
+        nodes in one request. Non-numeric and bad values are skipped.
+
+        Arguments                               Example
+        nodeIds:    Target nodeIds              ["ns=2;i=2", "ns=2;i=3"]
+        function:   min, max, mean, sum, count  "mean"
+        window:     Time window in seconds      60
+
+        Results
+        Tuple of aggregate, value count, and aggregates and value counts
+        of each node (see timeseries.aggregate).
+        """
+
+        if window is not None:
+            series = [
+                self.recent_values(nodeId, window)[1] for nodeId in nodeIds
+            ]
+            return aggregate(series, function)
+
+        results, readTime, queueTime = await self.read_values(nodeIds)
+        series = []
+        for result in results:
+            value = result.Value.Value
+            if result.StatusCode.is_good() and \
+                    isinstance(value, (bool, int, float)):
+                series.append(array("d", [value]))
+            else:
+                series.append(array("d"))
+        return aggregate(series, function)
+
+    def parse_node_id(self, nodeId):
+        """
+        Returns ua.NodeId of a node id string, cached for repeated nodes.
+        Empty nodeId refers to the browse root node of the server.
+        The returned object is shared and must not be modified.
+        """
+
+        parsed = self.nodeIdCache.get(nodeId)
+        if parsed is None:
+            if nodeId == "":
+                parsed = ua.NodeId.from_string(self.rootNodeId)
+            else:
+                parsed = ua.NodeId.from_string(nodeId)
+            self.nodeIdCache.put(nodeId, parsed)
+        return parsed
+
+    def create_read_value(self, nodeId, attribute="Value", indexRange=None):
+        """
+        Creates ReadValueId for reading an attribute of a node.
+        Empty nodeId refers to the browse root node of the server.
+        ReadValueIds are cached, the returned object is shared and
+        must not be modified.
+        """
+
+        key = (nodeId, attribute, indexRange)
+        rv = self.readValueCache.get(key)
+        if rv is None:
+            rv = ua.ReadValueId()
+            rv.NodeId = self.parse_node_id(nodeId)
+            rv.AttributeId = ua.AttributeIds[attribute]
+            rv.IndexRange = indexRange
+            self.readValueCache.put(key, rv)
+        return rv
+
+    def create_write_value(
+        self, nodeId, attribute, value, dataType=None, indexRange=None
+    ):
+        """
+        Creates WriteValue for writing an attribute of a node.
+        If dataType is not given, it is found with variant_type_finder.
+        """
+
+        attr = ua.WriteValue()
+        attr.NodeId = self.parse_node_id(nodeId)
+        attr.AttributeId = ua.AttributeIds[attribute]
+        attr.IndexRange = indexRange
+
+        if attribute == "Description":
+            dataValue = ua.LocalizedText(value)
+        else:
+            if dataType is None:
+                variantType = self.variant_type_finder(value, nodeId)
+            else:
+                variantType = ua.VariantType[dataType]
+            if variantType == ua.VariantType.DateTime and \
+                    isinstance(value, str):
+                value = datetime.datetime.fromisoformat(value)
+            dataValue = ua.Variant(value, variantType)
+        attr.Value = ua.DataValue(dataValue)
+        return attr
+
+    async def read_attributes(self, attributes):
+        """
+        Reads attributes of multiple nodes in one request.
+
+        Arguments
+        attributes: List of (nodeId, attribute, indexRange) tuples
+        Example:    [("ns=2;i=2", "Value", None)]
+
+        Results
+        results:    DataValues in the same order as attributes
+        readTime:   Time taken for read (ns)    12345678
+        queueTime:  Time waited for admission   123456
+        """
+
+        params = ua.ReadParameters()
+        for nodeId, attribute, indexRange in attributes:
+            params.NodesToRead.append(
+                self.create_read_value(nodeId, attribute, indexRange)
+            )
+        return await self.read(params)
+
+    def create_browse_path(self, elements, startNodeId):
+        """
+        Creates BrowsePath of hierarchical references from a start node
+        through browse name elements, see pathindex.parse_path.
+        """
+
+        browsePath = ua.BrowsePath()
+        browsePath.StartingNode = ua.NodeId.from_string(startNodeId)
+        for index, browseName in elements:
+            element = ua.RelativePathElement()
+            element.ReferenceTypeId = ua.NodeId(
+                ua.ObjectIds.HierarchicalReferences
+            )
+            element.IsInverse = False
+            element.IncludeSubtypes = True
+            element.TargetName = ua.QualifiedName(browseName, index)
+            browsePath.RelativePath.Elements.append(element)
+        return browsePath
+
+    async def resolve_paths(self, paths):
+        """
+        Resolves browse paths to node ids. Paths found in the path index
+        are resolved without requests, others with one
+        TranslateBrowsePathsToNodeIds request starting from their
+        longest resolved prefix.
+
+        Arguments
+        paths:      Browse paths from root node
+        Example:    ["0:Objects/2:Machine/2:Speed"]
+
+        Results
+        nodeIds:    Node ids in the order of paths, None if not found
+        statusCodes:Status of each path         ua.StatusCode()
+        """
+
+        await self.ensure_connection()
+        version = self.modelVersion
+        self.pathIndex.validate(version)
+        defaultIndex = self.nameSpaceIndex or 0
+
+        nodeIds = [None] * len(paths)
+        statusCodes = [ua.StatusCode()] * len(paths)
+        missing = defaultdict(list)
+        for i, path in enumerate(paths):
+            elements = parse_path(path, defaultIndex)
+            if len(elements) == 0:
+                nodeIds[i] = self.rootNodeId
+                continue
+            nodeId = self.pathIndex.get(elements)
+            if nodeId is None:
+                missing[elements].append(i)
+            else:
+                nodeIds[i] = nodeId
+                self.pathIndex.hits += 1
+        if len(missing) == 0:
+            return nodeIds, statusCodes
+
+        browsePaths = []
+        for elements in missing.keys():
+            length, startNodeId = self.pathIndex.longest_prefix(elements)
+            browsePaths.append(self.create_browse_path(
+                elements[length:], startNodeId or self.rootNodeId
+            ))
+        results, translateTime, queueTime = await self.call_chunked(
+            METADATA_READ, "TranslateBrowsePaths",
+            self.client.uaclient.translate_browsepaths_to_nodeids,
+            browsePaths
+        )
+
+        for (elements, indexes), result in zip(missing.items(), results):
+            self.pathIndex.misses += len(indexes)
+            nodeId = None
+            if result.StatusCode.is_good() and len(result.Targets) > 0:
+                nodeId = result.Targets[0].TargetId.to_string()
+                # Not cached if the model changed during the request
+                if self.modelVersion == version:
+                    self.pathIndex.put(elements, nodeId)
+            for i in indexes:
+                nodeIds[i] = nodeId
+                statusCodes[i] = result.StatusCode
+        return nodeIds, statusCodes
+
+    async def get_node_ids(self, paths):
+        """
+        Resolves browse paths to node ids.
+        Raises ValueError if a path is not found.
+        """
+
+        nodeIds, statusCodes = await self.resolve_paths(paths)
+        for path, nodeId, statusCode in zip(paths, nodeIds, statusCodes):
+            if nodeId is None:
+                raise ValueError(
+                    "Browse path not found: " + path +
+                    " (" + statusCode.name + ")"
+                )
+        return nodeIds
+
+    async def read_path(self, path):
+        """
+        Finds node at a browse path and reads its value.
+        Path is resolved from the path index, or with one
+        TranslateBrowsePaths request if not resolved before.
+
+        Arguments                               Example
+        path:       Browse path from root node  "0:Objects/2:Machine/2:Speed"
+
+        Results
+        nodeId:     Node id of the node         "ns=2;i=2"
+        result:     DataValue of the node       <object>
+        readTime:   Time taken for read (ns)    12345678
+        queueTime:  Time waited for admission   123456
+        """
+
+        nodeIds = await self.get_node_ids([path])
+        values, readTime, queueTime = await self.read_attributes(
+            [(nodeIds[0], "Value", None)]
+        )
+        return nodeIds[0], values[0], readTime, queueTime
+
+    async def read_values(self, nodeIds, useSubscriptions=False):
+        """
+        Reads values of multiple nodes in one request.
+        If useSubscriptions is True, values of subscribed nodes are taken
+        from the subscriptions and the other nodes are subscribed.
+        For servers owned by another worker, subscribed values are taken
+        from the shared value table and the other nodes are read and
+        subscribed by the owner.
+
+        Results
+        results:    DataValues in the same order as nodeIds
+        readTime:   Time taken for read (ns), 0 if nothing was read
+        queueTime:  Time waited for admission (ns)
+        """
+
+        results = [None] * len(nodeIds)
+        if useSubscriptions is True:
+            results = [self.subscribed_value(nodeId) for nodeId in nodeIds]
+        toRead = [i for i, result in enumerate(results) if result is None]
+
+        readTime = 0
+        queueTime = 0
+        if useSubscriptions is True and self.owner is not None:
+            if len(toRead) > 0:
+                values, readTime, queueTime = await self.call_owner(
+                    "read_values", [nodeIds[i] for i in toRead], True
+                )
+                for i, value in zip(toRead, values):
+                    results[i] = value
+            return results, readTime, queueTime
+        if useSubscriptions is True:
+            for i in toRead:
+                self.subscribe_variable(nodeIds[i])
+        if len(toRead) > 0:
+            values, readTime, queueTime = await self.read_attributes(
+                [(nodeIds[i], "Value", None) for i in toRead]
+            )
+            for i, value in zip(toRead, values):
+                results[i] = value
+        return results, readTime, queueTime
+
+    async def write_attributes(self, attributes):
+        """
+        Writes attributes of multiple nodes in one request.
+
+        Arguments
+        attributes: List of (nodeId, attribute, value, dataType, indexRange)
+                    tuples. dataType and indexRange can be None.
+        Example:    [("ns=2;i=2", "Value", 1234, "Int32", None)]
+
+        Results
+        results:    StatusCodes in the same order as attributes
+        writeTime:  Time taken for write (ns)   12345678
+        queueTime:  Time waited for admission   123456
+        """
+
+        if self.owner is not None:
+            # Data types of values without one are read by the owner
+            return await self.call_owner("write_attributes", attributes)
+        params = ua.WriteParameters()
+        for attribute in attributes:
+            params.NodesToWrite.append(self.create_write_value(*attribute))
+        if any(attribute[1] != "Value" for attribute in attributes):
+            self.model_changed()
+        return await self.write(params)
 
     async def read_node_attribute(self, nodeId, attribute):
         """
@@ -252,70 +2016,230 @@ class OPCUAServer(object):
         Results
         OPCUAVar:   OPC UA variable object      <object>
         readTime:   Time taken for read (ns)    12345678
+        queueTime:  Time waited for admission   123456
         """
 
-        rv = ua.ReadValueId()
-        if nodeId == "":
-            rv.NodeId = ua.NodeId.from_string(server.rootNodeId)
-        else:
-            rv.NodeId = ua.NodeId.from_string(nodeId)
-        rv.AttributeId = ua.AttributeIds[attribute]
-
-        params = ua.ReadParameters()
-        params.NodesToRead.append(rv)
-
-        result, readTime = await self.read(params)
+        result, readTime, queueTime = await self.read_attributes(
+            [(nodeId, attribute, None)]
+        )
         if attribute == "Value":
-            return result[0], readTime
+            return result[0], readTime, queueTime
         else:
             return result[0]
 
     async def set_node_attribute(
-        self, nodeId, attribute, value, dataType=None
+        self, nodeId, attribute, value, dataType=None, indexRange=None
     ):
         """
         Sets node attribute based on given arguments.
         Giving correct dataType for value and node speeds
         up the write operation.
+        Value writes are coalesced if write coalescing is set up
+        for the node.
 
         Arguments                               Example
         nodeId:     Target nodeId               "ns=2;i=2"
         attribute:  Target attribute of node    "Value"
         value:      Value for the attribute     1234
         dataType:   Data type of value          "Int32"
+        indexRange: Elements of array to write  "0:9"
 
         Results
         boolean:    Indicates success           True
         writeTime:  Time taken for write (ns)   12345678
+        queueTime:  Time waited for admission   123456
         """
 
-        attr = ua.WriteValue()
+        if self.owner is not None:
+            # Writes are coalesced and typed in the owner
+            return await self.call_owner(
+                "set_node_attribute", nodeId, attribute, value, dataType,
+                indexRange
+            )
+        if (
+            attribute == "Value" and self.writeCoalescer is not None
+            and self.writeCoalescer.applies(nodeId)
+        ):
+            statusCode, writeTime, queueTime = await self.writeCoalescer.write(
+                nodeId, value, dataType, indexRange
+            )
+            return statusCode.is_good(), writeTime, queueTime
 
-        if nodeId == "":
-            attr.NodeId = ua.NodeId.from_string(self.rootNodeId)
+        result, writeTime, queueTime = await self.write_attributes(
+            [(nodeId, attribute, value, dataType, indexRange)]
+        )
+        if attribute == "Value":
+            return result[0].is_good(), writeTime, queueTime
         else:
-            attr.NodeId = ua.NodeId.from_string(nodeId)
+            return result[0].is_good()
 
-        attr.AttributeId = ua.AttributeIds[attribute]
+    async def import_nodes(self, specs):
+        """
+        Adds nodes to OPC UA server with batched AddNodes and
+        AddReferences requests. Nodes are added level by level so
+        parents exist before their children. Progress is kept in
+        self.provisioning.
+        Requires server admin powers in server servers.json, for example
+        endPointAddress: "opc.tcp://admin@0.0.0.0:4840/freeopcua/server/".
 
-        if attribute == "Description":
-            dataValue = ua.LocalizedText(value)
-        else:
-            if dataType is None:
-                variantType = self.variant_type_finder(value, nodeId)
+        Arguments
+        specs:      Node specs, see provisioning.py
+
+        Results
+        results:    List of (nodeId, statusCode) in the order of specs.
+                    Status of the first failed AddReferences if the
+                    node was added but its references were not.
+        """
+
+        progress = ProvisioningProgress("import", len(specs))
+        self.provisioning = progress
+        self.model_changed()
+
+        levels = defaultdict(list)
+        depths = []
+        for i, spec in enumerate(specs):
+            if spec["parent"] is None:
+                depths.append(0)
             else:
-                variantType = ua.VariantType[dataType]
-            dataValue = ua.Variant(value, variantType)
-        attr.Value = ua.DataValue(dataValue)
+                depths.append(depths[spec["parent"]] + 1)
+            levels[depths[i]].append(i)
 
-        params = ua.WriteParameters()
-        params.NodesToWrite.append(attr)
+        addedIds = [None] * len(specs)
+        results = [None] * len(specs)
+        try:
+            for depth in sorted(levels.keys()):
+                items = []
+                indexes = []
+                for i in levels[depth]:
+                    spec = specs[i]
+                    if spec["parent"] is None:
+                        parentNodeId = spec["parentNodeId"]
+                    else:
+                        parentNodeId = addedIds[spec["parent"]]
+                    if parentNodeId is None:
+                        results[i] = ua.StatusCode(
+                            ua.StatusCodes.BadParentNodeIdInvalid
+                        )
+                        progress.failed += 1
+                        continue
+                    items.append(create_add_nodes_item(spec, parentNodeId))
+                    indexes.append(i)
+
+                for start in range(0, len(items), PROVISIONING_BATCH_SIZE):
+                    end = start + PROVISIONING_BATCH_SIZE
+                    addResults, addTime, queueTime = await self.call_chunked(
+                        WRITE, "AddNodes", self.client.uaclient.add_nodes,
+                        items[start:end]
+                    )
+                    for i, result in zip(indexes[start:end], addResults):
+                        results[i] = result.StatusCode
+                        if result.StatusCode.is_good():
+                            addedIds[i] = result.AddedNodeId
+                            progress.done += 1
+                        else:
+                            progress.failed += 1
+
+            items = []
+            indexes = []
+            for i, spec in enumerate(specs):
+                if addedIds[i] is None:
+                    continue
+                for reference in spec["references"]:
+                    items.append(
+                        create_add_references_item(addedIds[i], reference)
+                    )
+                    indexes.append(i)
+
+            for start in range(0, len(items), PROVISIONING_BATCH_SIZE):
+                end = start + PROVISIONING_BATCH_SIZE
+                referenceResults, addTime, queueTime = \
+                    await self.call_chunked(
+                        WRITE, "AddReferences",
+                        self.client.uaclient.add_references,
+                        items[start:end]
+                    )
+                for i, statusCode in zip(indexes[start:end], referenceResults):
+                    if not statusCode.is_good() and results[i].is_good():
+                        results[i] = statusCode
+        finally:
+            progress.finished = True
+            self.model_changed()
+
+        return [
+            (addedIds[i] or specs[i]["nodeId"], results[i])
+            for i in range(len(specs))
+        ]
+
+    async def delete_nodes(self, nodeIds, recursive=True):
+        """
+        Deletes nodes from OPC UA server with batched DeleteNodes
+        requests. If recursive, sub nodes found with batched Browse
+        requests are deleted first. Progress is kept in self.provisioning.
+        Requires admins.
 
-        result, writeTime = await self.write(params)
-        if attribute == "Value":
-            return result[0].is_good(), writeTime
-        else:
-            return result[0].is_good()
+        Arguments                               Example
+        nodeIds:    Node ids to delete          ["ns=2;i=2"]
+        recursive:  Delete sub nodes too        True
+
+        Results
+        results:    List of (nodeId, statusCode), sub nodes before
+                    their parents
+        """
+
+        nodes = []
+        seen = set()
+        for nodeId in nodeIds:
+            nodeId = await self.get_node_id(nodeId)
+            if nodeId not in seen:
+                seen.add(nodeId)
+                nodes.append(nodeId)
+
+        progress = ProvisioningProgress("delete", len(nodes))
+        self.provisioning = progress
+        self.model_changed()
+        results = []
+        try:
+            level = nodes
+            while recursive and len(level) > 0:
+                children = []
+                for start in range(0, len(level), PROVISIONING_BATCH_SIZE):
+                    end = start + PROVISIONING_BATCH_SIZE
+                    for references in await self.browse_children(
+                        level[start:end], useCache=False
+                    ):
+                        for reference in references:
+                            if reference.NodeId not in seen:
+                                seen.add(reference.NodeId)
+                                children.append(reference.NodeId)
+                nodes = nodes + children
+                progress.total = len(nodes)
+                level = children
+
+            nodes.reverse()
+            for start in range(0, len(nodes), PROVISIONING_BATCH_SIZE):
+                params = ua.DeleteNodesParameters()
+                for nodeId in nodes[start:start + PROVISIONING_BATCH_SIZE]:
+                    item = ua.DeleteNodesItem()
+                    item.NodeId = nodeId
+                    item.DeleteTargetReferences = True
+                    params.NodesToDelete.append(item)
+                deleteResults, deleteTime, queueTime = await self.call_chunked(
+                    WRITE, "DeleteNodes", self.client.uaclient.delete_nodes,
+                    params
+                )
+                for item, statusCode in zip(
+                    params.NodesToDelete, deleteResults
+                ):
+                    results.append((item.NodeId, statusCode))
+                    if statusCode.is_good():
+                        progress.done += 1
+                    else:
+                        progress.failed += 1
+        finally:
+            progress.finished = True
+            self.model_changed()
+
+        return results
 
     def add_node(self, name, nodeId, parentId, value=None, writable=True):
         """
@@ -326,6 +2250,7 @@ class OPCUAServer(object):
         """
 
         self.check_connection()
+        self.model_changed()
 
         if self.nameSpaceIndex is not None:
             index = self.nameSpaceIndex
@@ -367,38 +2292,386 @@ class OPCUAServer(object):
         """
 
         self.check_connection()
+        self.model_changed()
         node = self.get_node(nodeId)
         result = self.client.delete_nodes([node], recursive)
         result[1][0].check()
         return result[1][0].is_good()
 
+    async def call_service(self, priority, service, params):
+        """
+        Calls an OPC UA service in a worker thread (see run_io) once
+        admitted by the server's admission control.
+        service == function making the service call with params.
+
+        Returns result, time the service call took (ns) and
+        time waited for admission (ns).
+        Raises admission.OverloadError if the queue is full, and
+        deadline.DeadlineExceeded if the call is not done before the
+        deadline of the request.
+        """
+
+        return await within_deadline(
+            self.admitted_call(priority, service, params)
+        )
+
+    async def admitted_call(self, priority, service, params):
+        await self.ensure_connection()
+        queueTime = await self.admission.acquire(priority, currentClient.get())
+        start = time.time_ns()
+        call = asyncio.ensure_future(self.run_io(service, params))
+        # The thread can't be stopped, so a call cancelled at the deadline
+        # keeps its admission until it's done
+        call.add_done_callback(lambda call: self.admission.release())
+        result = await asyncio.shield(call)
+        return result, time.time_ns() - start, queueTime
+
+    async def run_io(self, function, *arguments):
+        """
+        Calls a blocking function in the I/O worker of the server,
+        or in the default executor if it has none.
+        """
+
+        if self.ioWorker is None:
+            return await asyncio.get_event_loop().run_in_executor(
+                None, function, *arguments
+            )
+        return await self.ioWorker.run(function, *arguments)
+
+    async def call_chunked(self, priority, serviceName, service, params):
+        """
+        Calls an OPC UA service like call_service, split into chunks
+        that are within the operation limit of the service.
+        serviceName == key of the service in CHUNKED_SERVICES.
+        Chunks are sent in parallel, at most as many at a time as the
+        server admits, and their results joined in order.
+
+        Returns results, longest service time of chunks (ns) and
+        longest time a chunk waited for admission (ns).
+        """
+
+        if self.owner is not None:
+            return await self.call_owner(
+                "call_named", priority, serviceName, params
+            )
+        await self.ensure_connection()
+        limitName, field = CHUNKED_SERVICES[serviceName]
+        limit = self.operation_limit(limitName)
+        operations = params if field is None else getattr(params, field)
+        statistics = self.chunking[serviceName]
+        statistics[0] += 1
+        if limit is None or len(operations) <= limit:
+            statistics[2] += 1
+            return await self.call_service(priority, service, params)
+
+        chunks = []
+        for start in range(0, len(operations), limit):
+            if field is None:
+                chunk = operations[start:start + limit]
+            else:
+                chunk = copy.copy(params)
+                setattr(chunk, field, operations[start:start + limit])
+            chunks.append(chunk)
+        statistics[1] += 1
+        statistics[2] += len(chunks)
+
+        # Chunks over the window wait here instead of in the admission
+        # queue, so a request with many chunks doesn't fill it by itself
+        window = asyncio.Semaphore(self.admission.maxConcurrency)
+
+        async def call_chunk(chunk):
+            async with window:
+                return await self.call_service(priority, service, chunk)
+
+        responses = await asyncio.gather(*[
+            call_chunk(chunk) for chunk in chunks
+        ])
+        results = []
+        for result, serviceTime, queueTime in responses:
+            results.extend(result)
+        return (
+            results,
+            max(response[1] for response in responses),
+            max(response[2] for response in responses)
+        )
+
+    async def call_owner(self, method, *arguments):
+        """
+        Calls a method of this server in the worker that owns the session
+        to the OPC UA server, see startSharding. Same as calling the method
+        here if the server is not owned by another worker.
+        Model version is changed here when it has changed in the owner.
+        """
+
+        if self.owner is None:
+            result = getattr(self, method)(*arguments)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+
+        result, version = await within_deadline(shardClient.call(
+            self.owner, (
+                self.name, method, arguments, currentClient.get(),
+                requestDeadline.get()
+            )
+        ))
+        if version != self.ownerVersion:
+            if self.ownerVersion is not None:
+                self.modelVersion += 1
+                # Session data may have changed when the owner reconnected
+                self.rootNodeId = None
+            self.ownerVersion = version
+        return result
+
+    async def call_named(self, priority, serviceName, params):
+        """
+        call_chunked by the name of the service, for calls forwarded
+        from other workers. Services that change the address space
+        change the model version.
+        """
+
+        if serviceName == "Read" and self.redundancy is not None:
+            return await self.redundant_read(priority, params)
+        service = {
+            "Read": self.client.uaclient.read,
+            "Write": self.client.uaclient.write,
+            "Browse": self.browse_all,
+            "TranslateBrowsePaths":
+                self.client.uaclient.translate_browsepaths_to_nodeids,
+            "AddNodes": self.client.uaclient.add_nodes,
+            "AddReferences": self.client.uaclient.add_references,
+            "DeleteNodes": self.client.uaclient.delete_nodes,
+        }[serviceName]
+        result = await self.call_chunked(
+            priority, serviceName, service, params
+        )
+        if serviceName in MODEL_SERVICES or (
+            serviceName == "Write" and any(
+                value.AttributeId != ua.AttributeIds.Value
+                for value in params.NodesToWrite
+            )
+        ):
+            self.model_changed()
+        return result
+
+    async def session_state(self):
+        """
+        Returns session data that workers forwarding calls to this
+        server need, see attach.
+        """
+
+        await self.ensure_connection()
+        return {
+            "rootNodeId": self.rootNodeId,
+            "nameSpaceIndex": self.nameSpaceIndex,
+            "namespaceArray": await self.get_namespace_array(),
+            "operationLimits": await self.get_operation_limits(),
+            "typeDictionaries": self.typeDictionaries,
+        }
+
+    async def attach(self):
+        """
+        Gets session data of a server owned by another worker, and
+        creates decoders for its structures so forwarded values can be
+        unpickled. Done again when the owner's model version changes.
+        """
+
+        state = await self.call_owner("session_state")
+        self.nameSpaceIndex = state["nameSpaceIndex"]
+        self.namespaceArray = state["namespaceArray"]
+        self.operationLimits = state["operationLimits"]
+        dictionaries = state["typeDictionaries"]
+        if dictionaries is not None and dictionaries != self.typeDictionaries:
+            self.structures = create_structures(self.name, dictionaries)
+            self.typeDictionaries = dictionaries
+        self.rootNodeId = state["rootNodeId"]
+        self.nodeIdCache.clear()
+        self.readValueCache.clear()
+
     async def read(self, params):
         """
         Reads from OPC UA server
         params == ua.ReadParameters() that are properly set up.
+        Reads of only values have priority over other attributes.
+        Split into chunks by MaxNodesPerRead.
 
-        Returns result object and time it took to read from OPC UA server.
+        Returns result object, time it took to read from OPC UA server
+        and time waited for admission.
+        """
+
+        priority = VALUE_READ
+        for rv in params.NodesToRead:
+            if rv.AttributeId != ua.AttributeIds.Value:
+                priority = METADATA_READ
+                break
+        if self.redundancy is not None and self.owner is None:
+            return await self.redundant_read(priority, params)
+        return await self.call_chunked(
+            priority, "Read", self.client.uaclient.read, params
+        )
+
+    def keep_backups(self):
+        """
+        Starts connecting the sessions to backups that are not connected,
+        each at most every BACKUP_RETRY seconds.
+        """
+
+        now = time.monotonic()
+        for backup in self.redundancy.backups:
+            if (
+                backup.is_connected()
+                or backup.connectTask is not None
+                and not backup.connectTask.done()
+                or backup.connectAttempt is not None
+                and now - backup.connectAttempt < BACKUP_RETRY
+            ):
+                continue
+            backup.connectAttempt = now
+            backup.connectTask = asyncio.ensure_future(
+                self.run_io(backup.connect)
+            )
+            # Error is kept in backup.lastError
+            backup.connectTask.add_done_callback(
+                lambda task: task.cancelled() or task.exception()
+            )
+
+    async def read_backup(self, backup, params):
+        """
+        Reads from a backup server in an I/O thread of this server.
+        Returns the same as call_chunked.
         """
 
-        self.check_connection()
         start = time.time_ns()
-        result = self.client.uaclient.read(params)
-        readTime = time.time_ns() - start
-        return result, readTime
+        call = asyncio.ensure_future(self.run_io(
+            backup.read, params, self.operation_limit("MaxNodesPerRead")
+        ))
+        # The thread can't be stopped, so a read that lost a hedge or
+        # passed the deadline is left to finish in the I/O worker
+        result = await within_deadline(asyncio.shield(call))
+        return result, time.time_ns() - start, 0
+
+    async def redundant_read(self, priority, params):
+        """
+        Reads like call_chunked from the primary server, or from a backup
+        if the primary fails or failed less than PRIMARY_RETRY seconds
+        ago. With hedgeReads, a read the primary hasn't answered within
+        the hedge delay is also sent to a backup and the first response
+        is used. The other read is cancelled.
+        """
+
+        redundancy = self.redundancy
+        self.keep_backups()
+        start = time.time_ns()
+        backup = redundancy.connected_backup(self.namespaceArray)
+        if backup is not None and redundancy.primary_down():
+            redundancy.backupReads += 1
+            try:
+                return await self.read_backup(backup, params)
+            except DeadlineExceeded:
+                raise
+            except FAILOVER_ERRORS:
+                # Backup failed too, the primary may be up again
+                backup = None
+
+        primary = asyncio.ensure_future(self.call_chunked(
+            priority, "Read", self.client.uaclient.read, params
+        ))
+        secondary = None
+        try:
+            if redundancy.hedgeReads and backup is not None:
+                await asyncio.wait([primary], timeout=redundancy.hedge_delay())
+                if not primary.done():
+                    redundancy.hedgedReads += 1
+                    secondary = asyncio.ensure_future(
+                        self.read_backup(backup, params)
+                    )
+                    done, pending = await asyncio.wait(
+                        [primary, secondary],
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if primary not in done and secondary.exception() is None:
+                        redundancy.hedgeWins += 1
+                        return secondary.result()
+            await asyncio.wait([primary])
+
+            error = primary.exception()
+            if error is None:
+                redundancy.primaryFailed = None
+                redundancy.add_latency(time.time_ns() - start)
+                return primary.result()
+            if (
+                not isinstance(error, FAILOVER_ERRORS)
+                or isinstance(error, DeadlineExceeded)
+            ):
+                raise error
+            if not isinstance(error, OverloadError):
+                redundancy.primaryFailed = time.monotonic()
+            if secondary is None:
+                backup = redundancy.connected_backup(self.namespaceArray)
+                if backup is None:
+                    raise error
+                secondary = asyncio.ensure_future(
+                    self.read_backup(backup, params)
+                )
+            try:
+                result = await secondary
+            except Exception:
+                raise error
+            redundancy.add_failover_time(time.time_ns() - start)
+            self.logger.info(
+                "Read failed over to a backup of " + self.name + ": "
+                + (str(error) or type(error).__name__)
+            )
+            return result
+        finally:
+            for call in (primary, secondary):
+                if call is not None and not call.done():
+                    call.cancel()
 
     async def write(self, params):
         """
         Writes to OPC UA server
         params == ua.WriteParameters() that are properly set up.
+        Split into chunks by MaxNodesPerWrite.
 
-        Returns result object and time it took to read from OPC UA server.
+        Returns result object, time it took to write to OPC UA server
+        and time waited for admission.
         """
 
-        self.check_connection()
-        start = time.time_ns()
-        result = self.client.uaclient.write(params)
-        writeTime = time.time_ns() - start
-        return result, writeTime
+        return await self.call_chunked(
+            WRITE, "Write", self.client.uaclient.write, params
+        )
+
+    async def browse(self, params):
+        """
+        Browses OPC UA server
+        params == ua.BrowseParameters() that are properly set up.
+        Continuation points are followed until all references are found.
+        Split into chunks by MaxNodesPerBrowse.
+
+        Returns BrowseResults, time it took to browse OPC UA server
+        and time waited for admission.
+        """
+
+        return await self.call_chunked(
+            BROWSE, "Browse", self.browse_all, params
+        )
+
+    def browse_all(self, params):
+        """
+        Synchronous browse that follows continuation points.
+        """
+
+        results = self.client.uaclient.browse(params)
+        for result in results:
+            while result.ContinuationPoint:
+                nextParams = ua.BrowseNextParameters()
+                nextParams.ContinuationPoints = [result.ContinuationPoint]
+                nextParams.ReleaseContinuationPoints = False
+                nextResult = self.client.uaclient.browse_next(nextParams)[0]
+                result.References.extend(nextResult.References)
+                result.ContinuationPoint = nextResult.ContinuationPoint
+        return results
 
     def variant_type_finder(self, value, nodeId):
         """
@@ -407,6 +2680,8 @@ class OPCUAServer(object):
         """
 
         valueType = type(value)
+        if valueType == list and len(value) > 0:
+            valueType = type(value[0])
         if isinstance(valueType, datetime.datetime):
             variantType = ua.uatypes.VariantType.DateTime
         elif valueType == bool:
@@ -415,8 +2690,12 @@ class OPCUAServer(object):
             variantType = ua.uatypes.VariantType.String
         elif valueType == int or valueType == float:
             node = self.get_node(nodeId)
-            self.check_connection()
-            variantType = node.get_data_type_as_variant_type()
+            if self.dataTypes is not None:
+                variantType = self.data_type_to_variant_type(
+                    node.get_data_type()
+                )
+            else:
+                variantType = node.get_data_type_as_variant_type()
         else:
             raise ValueError("Unsupported datatype")
         return variantType
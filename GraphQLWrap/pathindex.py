@@ -0,0 +1,120 @@
+"""
+Browse paths of OPC UA nodes:
+    - Parsing of browse paths into browse name elements.
+    - Per server trie of paths resolved to node ids.
+
+A browse path is browse names separated by "/" starting from the root
+node of a server, for example "0:Objects/2:Machine/2:Speed". Names
+without namespace index get the default namespace of the server.
+"""
+
+
+def parse_path(path, defaultIndex=0):
+    """
+    Parses a browse path into a tuple of (namespaceIndex, name).
+    Empty path is the root node.
+    """
+
+    path = path.strip("/")
+    if path == "":
+        return ()
+
+    elements = []
+    for name in path.split("/"):
+        index, _, browseName = name.partition(":")
+        if browseName != "" and index.isdigit():
+            elements.append((int(index), browseName))
+        else:
+            elements.append((defaultIndex, name))
+    return tuple(elements)
+
+
+def parse_crawled_path(path):
+    """
+    Parses a browse path made by crawling, where every browse name has
+    its namespace index. Returns None if a browse name has "/" so the
+    path can't be parsed back.
+    """
+
+    elements = []
+    for name in path.split("/"):
+        index, _, browseName = name.partition(":")
+        if browseName == "" or not index.isdigit():
+            return None
+        elements.append((int(index), browseName))
+    return tuple(elements)
+
+
+class PathNode(object):
+    __slots__ = ("nodeId", "children")
+
+    def __init__(self):
+        self.nodeId = None
+        self.children = {}
+
+
+class PathIndex(object):
+    """
+    Trie of browse path elements to resolved node ids.
+
+    The index is valid for one model version of the server. It is
+    cleared when validated with a different version, which happens
+    after changes to the address space made through this API and
+    after reconnects (when namespace indexes may have changed).
+    """
+
+    def __init__(self):
+        self.root = PathNode()
+        self.version = None
+        self.size = 0
+        # ---------- Statistics -----------
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, version):
+        if version != self.version:
+            self.root = PathNode()
+            self.version = version
+            self.size = 0
+
+    def get(self, elements):
+        """
+        Returns node id of path elements, None if not in index.
+        """
+
+        node = self.root
+        for element in elements:
+            node = node.children.get(element)
+            if node is None:
+                return None
+        return node.nodeId
+
+    def longest_prefix(self, elements):
+        """
+        Returns length and node id of the longest resolved prefix
+        of path elements. (0, None) if no prefix is in index.
+        """
+
+        length = 0
+        nodeId = None
+        node = self.root
+        for i, element in enumerate(elements):
+            node = node.children.get(element)
+            if node is None:
+                break
+            if node.nodeId is not None:
+                length = i + 1
+                nodeId = node.nodeId
+        return length, nodeId
+
+    def put(self, elements, nodeId):
+        node = self.root
+        for element in elements:
+            child = node.children.get(element)
+            if child is None:
+                child = PathNode()
+                node.children[element] = child
+            node = child
+        if node.nodeId is None:
+            self.size += 1
+        node.nodeId = nodeId
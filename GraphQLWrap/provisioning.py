@@ -0,0 +1,417 @@
+"""
+Provisioning of OPC UA address space in bulk:
+    - Node trees given as JSON and NodeSet2 XML parsed into node specs.
+    - AddNodes and AddReferences items created from node specs.
+    - Progress of a running import or delete.
+
+A node spec is a dict with keys:
+    nodeId:         Requested ua.NodeId, null NodeId lets server choose
+    browseName:     ua.QualifiedName
+    displayName:    Display name text
+    description:    Description text
+    nodeClass:      ua.NodeClass.Object or ua.NodeClass.Variable
+    parent:         Index of the parent spec in the list, or None
+    parentNodeId:   ua.NodeId of an existing parent if parent is None
+    referenceType:  ua.NodeId of the reference from the parent
+    typeDefinition: ua.NodeId of the type definition
+    value:          ua.Variant of a variable, or None
+    dataType:       ua.NodeId of the data type of a variable, or None
+    accessLevel:    Access level mask of a variable
+    references:     List of (referenceType, targetNodeId, isForward)
+Specs are listed parents before children.
+"""
+
+from opcua import ua
+import datetime
+import xml.etree.ElementTree as ET
+
+NODESET_NS = "{http://opcfoundation.org/UA/2011/03/UANodeSet.xsd}"
+
+READ_ACCESS = ua.AccessLevel.CurrentRead.mask
+WRITE_ACCESS = READ_ACCESS | ua.AccessLevel.CurrentWrite.mask
+
+INTEGER_TYPES = (
+    "SByte", "Byte", "Int16", "UInt16", "Int32", "UInt32", "Int64", "UInt64"
+)
+
+
+class ProvisioningProgress(object):
+    """
+    Progress of a running importNodes or deleteNodes operation.
+    """
+
+    def __init__(self, operation, total):
+        self.operation = operation
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.finished = False
+
+
+def standard_node_id(name):
+    """
+    Returns NodeId of a standard node by its name, such as "Organizes".
+    """
+
+    try:
+        return ua.NodeId(getattr(ua.ObjectIds, name))
+    except AttributeError:
+        raise ValueError("Unknown standard node: " + name)
+
+
+def create_variant(value, dataType=None):
+    """
+    Creates variant from a JSON value. If dataType (variant type name)
+    is not given, it is guessed from the value.
+    """
+
+    if dataType is None:
+        return ua.Variant(value)
+    variantType = ua.VariantType[dataType]
+    if variantType == ua.VariantType.DateTime and isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    return ua.Variant(value, variantType)
+
+
+def nodes_from_tree(tree, parentNodeId, namespaceIndex):
+    """
+    Creates node specs from a JSON node tree.
+
+    Arguments
+    tree:           List of nodes, each a dict with name and optional
+                    nodeId, description, value, dataType, writable
+                    and children. Nodes with value are variables,
+                    other nodes folders.
+    Example:        [{"name": "Line", "nodeId": "ns=2;s=Line",
+                      "children": [{"name": "Speed", "value": 1.5}]}]
+    parentNodeId:   ua.NodeId of the node the tree is added under
+    namespaceIndex: Namespace of browse names
+
+    Results
+    specs:          List of node specs
+    """
+
+    if not isinstance(tree, list):
+        tree = [tree]
+
+    specs = []
+    stack = [(node, None) for node in reversed(tree)]
+    while len(stack) > 0:
+        node, parent = stack.pop()
+        name = node["name"]
+        nodeId = node.get("nodeId")
+        nodeId = ua.NodeId.from_string(nodeId) if nodeId else ua.NodeId()
+        spec = {
+            "nodeId": nodeId,
+            "browseName": ua.QualifiedName(name, namespaceIndex),
+            "displayName": name,
+            "description": node.get("description", name),
+            "parent": parent,
+            "parentNodeId": parentNodeId,
+            "references": [],
+        }
+        if node.get("value") is None:
+            spec["nodeClass"] = ua.NodeClass.Object
+            spec["referenceType"] = standard_node_id("Organizes")
+            spec["typeDefinition"] = standard_node_id("FolderType")
+            spec["value"] = None
+            spec["dataType"] = None
+        else:
+            variant = create_variant(node["value"], node.get("dataType"))
+            spec["nodeClass"] = ua.NodeClass.Variable
+            spec["referenceType"] = standard_node_id("HasComponent")
+            spec["typeDefinition"] = standard_node_id("BaseDataVariableType")
+            spec["value"] = variant
+            spec["dataType"] = standard_node_id(variant.VariantType.name)
+            spec["accessLevel"] = (
+                WRITE_ACCESS if node.get("writable", True) else READ_ACCESS
+            )
+        specs.append(spec)
+        index = len(specs) - 1
+        for child in reversed(node.get("children", [])):
+            stack.append((child, index))
+
+    return specs
+
+
+def parse_nodeset_value(element):
+    """
+    Parses the value of a UAVariable in a NodeSet2 file.
+    Returns ua.Variant, or None if the value type is not supported.
+    """
+
+    tag = element.tag.split("}")[-1]
+    if tag.startswith("ListOf"):
+        variants = [parse_nodeset_value(child) for child in element]
+        variants = [variant for variant in variants if variant is not None]
+        if len(variants) == 0:
+            return None
+        return ua.Variant(
+            [variant.Value for variant in variants],
+            variants[0].VariantType
+        )
+
+    text = (element.text or "").strip()
+    if tag == "Boolean":
+        value = text.lower() == "true"
+    elif tag in INTEGER_TYPES:
+        value = int(text)
+    elif tag in ("Float", "Double"):
+        value = float(text)
+    elif tag == "String":
+        value = text
+    elif tag == "DateTime":
+        value = datetime.datetime.fromisoformat(text.replace("Z", ""))
+    else:
+        return None
+    return ua.Variant(value, ua.VariantType[tag])
+
+
+def nodes_from_nodeset(xml, namespaceArray, parentNodeId=None):
+    """
+    Creates node specs from the objects and variables of a NodeSet2 file.
+
+    Arguments
+    xml:            Content of the NodeSet2 file
+    namespaceArray: Namespace array of the OPC UA server, used to map
+                    namespace indexes of the file to the server
+    parentNodeId:   ua.NodeId replacing parents that are not
+                    in the file, None keeps the parents of the file
+
+    Results
+    specs:          List of node specs
+    skipped:        Node ids of nodes of other node classes
+    """
+
+    root = ET.fromstring(xml)
+
+    # Namespace index in file -> namespace index on server
+    namespaces = {0: 0}
+    uris = root.find(NODESET_NS + "NamespaceUris")
+    if uris is not None:
+        for i, uri in enumerate(uris):
+            if uri.text not in namespaceArray:
+                raise ValueError("Namespace not found on server: " + uri.text)
+            namespaces[i + 1] = namespaceArray.index(uri.text)
+
+    aliases = {}
+    aliasElements = root.find(NODESET_NS + "Aliases")
+    if aliasElements is not None:
+        for alias in aliasElements:
+            aliases[alias.get("Alias")] = alias.text.strip()
+
+    def node_id(text):
+        text = text.strip()
+        text = aliases.get(text, text)
+        if "=" not in text:
+            return standard_node_id(text)
+        nodeId = ua.NodeId.from_string(text)
+        nodeId.NamespaceIndex = namespaces.get(
+            nodeId.NamespaceIndex, nodeId.NamespaceIndex
+        )
+        return nodeId
+
+    def qualified_name(text):
+        index, _, name = text.partition(":")
+        if name == "" or not index.isdigit():
+            return ua.QualifiedName(text, 0)
+        return ua.QualifiedName(name, namespaces.get(int(index), int(index)))
+
+    nodeClasses = {
+        "UAObject": ua.NodeClass.Object,
+        "UAVariable": ua.NodeClass.Variable,
+    }
+    elements = []
+    skipped = []
+    for element in root:
+        tag = element.tag[len(NODESET_NS):]
+        if tag in nodeClasses:
+            elements.append((element, nodeClasses[tag]))
+        elif tag.startswith("UA"):
+            skipped.append(node_id(element.get("NodeId")).to_string())
+
+    specs = []
+    defaultReferenceTypes = set()
+    for element, nodeClass in elements:
+        nodeId = node_id(element.get("NodeId"))
+        browseName = qualified_name(element.get("BrowseName"))
+        displayName = element.findtext(NODESET_NS + "DisplayName")
+        description = element.findtext(NODESET_NS + "Description")
+        parentId = element.get("ParentNodeId")
+        parentId = node_id(parentId) if parentId else None
+
+        referenceType = None
+        typeDefinition = None
+        references = []
+        referenceElements = element.find(NODESET_NS + "References")
+        for reference in (
+            referenceElements if referenceElements is not None else []
+        ):
+            refType = node_id(reference.get("ReferenceType"))
+            target = node_id(reference.text)
+            isForward = reference.get("IsForward", "true").lower() != "false"
+            if refType == standard_node_id("HasTypeDefinition"):
+                typeDefinition = target
+            elif not isForward and (parentId is None or parentId == target):
+                # First inverse reference is the one from the parent
+                if referenceType is None:
+                    parentId = target
+                    referenceType = refType
+                else:
+                    references.append((refType, target, isForward))
+            else:
+                references.append((refType, target, isForward))
+
+        if parentId is None:
+            raise ValueError("No parent for node " + nodeId.to_string())
+        if referenceType is None:
+            defaultReferenceTypes.add(nodeId)
+
+        spec = {
+            "nodeId": nodeId,
+            "browseName": browseName,
+            "displayName": displayName or browseName.Name,
+            "description": description or "",
+            "nodeClass": nodeClass,
+            "parent": parentId,
+            "parentNodeId": parentId,
+            "referenceType": referenceType or standard_node_id(
+                "HasComponent" if nodeClass == ua.NodeClass.Variable
+                else "Organizes"
+            ),
+            "typeDefinition": typeDefinition or standard_node_id(
+                "BaseDataVariableType" if nodeClass == ua.NodeClass.Variable
+                else "BaseObjectType"
+            ),
+            "value": None,
+            "dataType": None,
+            "references": references,
+        }
+        if nodeClass == ua.NodeClass.Variable:
+            valueElement = element.find(NODESET_NS + "Value")
+            if valueElement is not None and len(valueElement) > 0:
+                spec["value"] = parse_nodeset_value(valueElement[0])
+            dataType = element.get("DataType")
+            if dataType:
+                spec["dataType"] = node_id(dataType)
+            elif spec["value"] is not None:
+                spec["dataType"] = standard_node_id(
+                    spec["value"].VariantType.name
+                )
+            else:
+                spec["dataType"] = standard_node_id("BaseDataType")
+            spec["accessLevel"] = int(element.get("AccessLevel", READ_ACCESS))
+        specs.append(spec)
+
+    # Forward references of parents to their children are the same
+    # references the children are added with
+    byNodeId = {spec["nodeId"]: spec for spec in specs}
+    for spec in specs:
+        references = []
+        for reference in spec["references"]:
+            refType, target, isForward = reference
+            child = byNodeId.get(target)
+            if (
+                isForward and child is not None
+                and child["parent"] == spec["nodeId"]
+            ):
+                if child["nodeId"] in defaultReferenceTypes:
+                    child["referenceType"] = refType
+                    defaultReferenceTypes.discard(child["nodeId"])
+                    continue
+                if child["referenceType"] == refType:
+                    continue
+            references.append(reference)
+        spec["references"] = references
+
+    return order_specs(specs, parentNodeId), skipped
+
+
+def order_specs(specs, parentNodeId=None):
+    """
+    Orders specs with parents in the file before their children and
+    replaces parent node ids of specs with parents in the list by
+    indexes. Parents not in the list are replaced by parentNodeId
+    if it is given.
+    """
+
+    byNodeId = {spec["nodeId"]: spec for spec in specs}
+    ordered = []
+    indexes = {}
+
+    def visit(spec, path):
+        if spec["nodeId"] in indexes:
+            return indexes[spec["nodeId"]]
+        parent = byNodeId.get(spec["parent"])
+        if parent is not None:
+            if spec["nodeId"] in path:
+                raise ValueError(
+                    "Cyclic parents for node " + spec["nodeId"].to_string()
+                )
+            path.add(spec["nodeId"])
+            spec["parent"] = visit(parent, path)
+        else:
+            spec["parent"] = None
+            if parentNodeId is not None:
+                spec["parentNodeId"] = parentNodeId
+        ordered.append(spec)
+        indexes[spec["nodeId"]] = len(ordered) - 1
+        return indexes[spec["nodeId"]]
+
+    for spec in specs:
+        visit(spec, set())
+    return ordered
+
+
+def create_add_nodes_item(spec, parentNodeId):
+    """
+    Creates AddNodesItem of a node spec under given parent.
+    """
+
+    item = ua.AddNodesItem()
+    item.RequestedNewNodeId = spec["nodeId"]
+    item.BrowseName = spec["browseName"]
+    item.NodeClass = spec["nodeClass"]
+    item.ParentNodeId = parentNodeId
+    item.ReferenceTypeId = spec["referenceType"]
+    item.TypeDefinition = spec["typeDefinition"]
+
+    if spec["nodeClass"] == ua.NodeClass.Variable:
+        attrs = ua.VariableAttributes()
+        value = spec["value"]
+        if value is not None:
+            attrs.Value = value
+            if isinstance(value.Value, (list, tuple)):
+                attrs.ValueRank = ua.ValueRank.OneDimension
+                attrs.ArrayDimensions = [len(value.Value)]
+            else:
+                attrs.ValueRank = ua.ValueRank.Scalar
+        attrs.DataType = spec["dataType"]
+        attrs.Historizing = 0
+        attrs.AccessLevel = spec["accessLevel"]
+        attrs.UserAccessLevel = spec["accessLevel"]
+    else:
+        attrs = ua.ObjectAttributes()
+        attrs.EventNotifier = 0
+    attrs.DisplayName = ua.LocalizedText(spec["displayName"])
+    attrs.Description = ua.LocalizedText(spec["description"])
+    attrs.WriteMask = 0
+    attrs.UserWriteMask = 0
+    item.NodeAttributes = attrs
+    return item
+
+
+def create_add_references_item(sourceNodeId, reference):
+    """
+    Creates AddReferencesItem of a (referenceType, target, isForward)
+    reference of a node spec.
+    """
+
+    referenceType, target, isForward = reference
+    item = ua.AddReferencesItem()
+    item.SourceNodeId = sourceNodeId
+    item.ReferenceTypeId = referenceType
+    item.IsForward = isForward
+    item.TargetNodeId = target
+    item.TargetNodeClass = ua.NodeClass.Unspecified
+    return item
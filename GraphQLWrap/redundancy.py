@@ -0,0 +1,190 @@
+"""
+Redundant OPC UA servers:
+    - Sessions to backup servers of a redundancy set, kept connected so
+      reads move to a backup without connecting first when the primary
+      server is down.
+    - Latency of recent reads of the primary server. With hedged reads,
+      a read is also sent to a backup if the primary hasn't answered
+      within the 95th percentile of its recent reads.
+"""
+
+import time
+import logging
+from collections import deque
+from opcua import Client, ua
+
+# Number of recent primary reads the hedge delay is computed from
+HEDGE_SAMPLES = 100
+HEDGE_PERCENTILE = 0.95
+# Hedge delay (s) used until MIN_SAMPLES reads have been made
+HEDGE_DELAY = 0.05
+MIN_SAMPLES = 20
+# Seconds between attempts to connect a backup
+BACKUP_RETRY = 10
+# Seconds reads go straight to a backup after the primary failed
+PRIMARY_RETRY = 5
+
+
+def sessionConnected(client):
+    """
+    Checks if the connection thread of a python-opcua Client is running.
+    """
+
+    uasocket = client.uaclient._uasocket
+    return (
+        uasocket is not None and uasocket._thread is not None
+        and uasocket._thread.is_alive()
+    )
+
+
+class BackupSession(object):
+    """
+    Session to a backup server. Calls are blocking and made in
+    the I/O threads of the server it backs up.
+    """
+
+    def __init__(self, endPointAddress):
+        self.endPointAddress = endPointAddress
+        self.logger = logging.getLogger(endPointAddress)
+        self.client = Client(endPointAddress, timeout=2)
+        self.namespaceArray = None
+        # Task connecting the session, and when it was last started
+        self.connectTask = None
+        self.connectAttempt = None
+        self.lastError = None
+
+    def is_connected(self):
+        return sessionConnected(self.client)
+
+    def connect(self):
+        try:
+            self.client.connect()
+            self.namespaceArray = self.client.get_namespace_array()
+            self.lastError = None
+            self.logger.info("Connected backup " + self.endPointAddress)
+        except Exception as e:
+            self.lastError = str(e) or type(e).__name__
+            try:
+                self.client.uaclient.disconnect()
+            except Exception:
+                pass
+            raise
+
+    def read(self, params, limit=None):
+        """
+        Reads from the backup, in chunks of at most limit nodes.
+        """
+
+        if limit is None or len(params.NodesToRead) <= limit:
+            return self.client.uaclient.read(params)
+        results = []
+        for start in range(0, len(params.NodesToRead), limit):
+            chunk = ua.ReadParameters()
+            chunk.MaxAge = params.MaxAge
+            chunk.TimestampsToReturn = params.TimestampsToReturn
+            chunk.NodesToRead = params.NodesToRead[start:start + limit]
+            results.extend(self.client.uaclient.read(chunk))
+        return results
+
+    def disconnect(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+class Redundancy(object):
+    """
+    Backup sessions of a server and statistics of reads made with them.
+
+    Arguments                                   Example
+    endPointAddresses:  Backup servers          ["opc.tcp://plc-b:4840/"]
+    hedgeReads:         True to send slow
+                        reads also to a backup  True
+    hedgeDelay:         Fixed hedge delay (s),
+                        None for the 95th
+                        percentile of reads     None
+    """
+
+    def __init__(self, endPointAddresses, hedgeReads=False, hedgeDelay=None):
+        self.backups = []
+        for endPointAddress in endPointAddresses:
+            self.add_backup(endPointAddress)
+        self.hedgeReads = hedgeReads
+        self.fixedHedgeDelay = hedgeDelay
+        # Durations (ns) of recent reads of the primary
+        self.latencies = deque(maxlen=HEDGE_SAMPLES)
+        # time.monotonic() of the latest failure of the primary, None
+        # after it has answered again
+        self.primaryFailed = None
+        # ---------- Statistics -----------
+        self.hedgedReads = 0
+        self.hedgeWins = 0
+        self.failovers = 0
+        # Reads sent straight to a backup while the primary was down
+        self.backupReads = 0
+        # Durations (ns) of reads from the start of the read that failed
+        # on the primary until the backup answered
+        self.lastFailoverTime = None
+        self.maxFailoverTime = None
+
+    def add_backup(self, endPointAddress):
+        """
+        Adds a backup server unless it's already added.
+        """
+
+        if any(
+            backup.endPointAddress == endPointAddress
+            for backup in self.backups
+        ):
+            return None
+        backup = BackupSession(endPointAddress)
+        self.backups.append(backup)
+        return backup
+
+    def add_latency(self, latency):
+        self.latencies.append(latency)
+
+    def hedge_delay(self):
+        """
+        Returns seconds to wait for the primary before hedging a read.
+        """
+
+        if self.fixedHedgeDelay is not None:
+            return self.fixedHedgeDelay
+        if len(self.latencies) < MIN_SAMPLES:
+            return HEDGE_DELAY
+        latencies = sorted(self.latencies)
+        index = min(
+            int(len(latencies) * HEDGE_PERCENTILE), len(latencies) - 1
+        )
+        return latencies[index] / 1e9
+
+    def primary_down(self):
+        """
+        True if the primary failed less than PRIMARY_RETRY seconds ago.
+        """
+
+        return (
+            self.primaryFailed is not None
+            and time.monotonic() - self.primaryFailed < PRIMARY_RETRY
+        )
+
+    def connected_backup(self, namespaceArray=None):
+        """
+        Returns the first connected backup with the same namespace array
+        as the primary, None if there is none.
+        """
+
+        for backup in self.backups:
+            if backup.is_connected() and (
+                namespaceArray is None
+                or backup.namespaceArray == namespaceArray
+            ):
+                return backup
+        return None
+
+    def add_failover_time(self, failoverTime):
+        self.failovers += 1
+        self.lastFailoverTime = failoverTime
+        self.maxFailoverTime = max(self.maxFailoverTime or 0, failoverTime)
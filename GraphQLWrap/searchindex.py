@@ -0,0 +1,192 @@
+"""
+Search index of the address space of an OPC UA server:
+    - Inverted index of words in names, descriptions and paths of nodes.
+    - Prefix and substring search of the words.
+
+The index is built by crawling the server (OPCUAServer.crawl) and
+replaced as a whole when the server is crawled again, so searches
+never read from the server.
+"""
+
+import re
+from bisect import bisect_left
+from heapq import nsmallest
+
+WORD = re.compile(r"[0-9a-z]+")
+
+# Order of results: exact name, name prefix, other matches
+EXACT, PREFIX, OTHER = 0, 1, 2
+
+
+class SearchEntry(object):
+    __slots__ = (
+        "nodeId", "displayName", "browseName", "description", "path",
+        "nodeClass"
+    )
+
+    def __init__(
+        self, nodeId, displayName, browseName, description, path, nodeClass
+    ):
+        self.nodeId = nodeId
+        self.displayName = displayName
+        self.browseName = browseName
+        self.description = description
+        self.path = path
+        self.nodeClass = nodeClass
+
+    def rank(self, text):
+        displayName = (self.displayName or "").lower()
+        browseName = (self.browseName or "").lower()
+        if text == displayName or text == browseName:
+            return EXACT
+        if displayName.startswith(text) or browseName.startswith(text):
+            return PREFIX
+        return OTHER
+
+
+class SearchIndex(object):
+    """
+    Inverted index of lower case words in DisplayName, BrowseName,
+    Description and browse path of nodes to the nodes.
+
+    version is the model version of the server the index was built at.
+    children has node ids of the nodes below each crawled node.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.entries = []
+        self.nodes = {}
+        self.children = {}
+        self.words = {}
+        self.sortedWords = None
+        # ---------- Statistics -----------
+        self.createdAt = None
+        self.crawlTime = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        index = len(self.entries)
+        self.entries.append(entry)
+        self.nodes.setdefault(entry.nodeId, index)
+        words = set()
+        for text in (
+            entry.displayName, entry.browseName, entry.description,
+            entry.path
+        ):
+            if text:
+                words.update(WORD.findall(text.lower()))
+        for word in words:
+            nodes = self.words.get(word)
+            if nodes is None:
+                self.words[word] = [index]
+            else:
+                nodes.append(index)
+        self.sortedWords = None
+
+    def get(self, nodeId):
+        """
+        Returns SearchEntry of a node, None if not in index.
+        """
+
+        index = self.nodes.get(nodeId)
+        if index is None:
+            return None
+        return self.entries[index]
+
+    def get_children(self, nodeId):
+        """
+        Returns SearchEntries of the nodes below a node,
+        None if the node or some of its children are not in index.
+        """
+
+        children = self.children.get(nodeId)
+        if children is None:
+            return None
+        entries = [self.get(child) for child in children]
+        if None in entries:
+            return None
+        return entries
+
+    def get_descendants(self, nodeId):
+        """
+        Returns set of node ids of the crawled nodes below a node,
+        without the node itself.
+        """
+
+        descendants = set()
+        level = [nodeId]
+        while len(level) > 0:
+            below = []
+            for parent in level:
+                for child in self.children.get(parent) or []:
+                    if child not in descendants and child != nodeId:
+                        descendants.add(child)
+                        below.append(child)
+            level = below
+        return descendants
+
+    def matching_words(self, term, substring=False):
+        """
+        Returns words of the index that start with term,
+        or contain it if substring.
+        """
+
+        if self.sortedWords is None:
+            self.sortedWords = sorted(self.words)
+        if substring:
+            return [word for word in self.sortedWords if term in word]
+
+        words = []
+        for i in range(
+            bisect_left(self.sortedWords, term), len(self.sortedWords)
+        ):
+            word = self.sortedWords[i]
+            if not word.startswith(term):
+                break
+            words.append(word)
+        return words
+
+    def search(self, text, nodeClassMask=0, limit=50, substring=False):
+        """
+        Finds nodes that have all words of text as word prefixes
+        (or substrings) in their names, description or path.
+
+        Arguments                               Example
+        text:           Words to search         "line speed"
+        nodeClassMask:  ua.NodeClass values
+                        or'ed, 0 for all        2
+        limit:          Maximum number of nodes 50
+        substring:      Match anywhere in words False
+
+        Results
+        entries:        SearchEntries, exact name matches first,
+                        then name prefixes, then shortest paths
+        """
+
+        terms = WORD.findall(text.lower())
+        if len(terms) == 0:
+            return []
+
+        matches = None
+        for term in terms:
+            indexes = set()
+            for word in self.matching_words(term, substring):
+                indexes.update(self.words[word])
+            matches = indexes if matches is None else matches & indexes
+            if len(matches) == 0:
+                return []
+
+        text = text.lower()
+        entries = self.entries
+        if nodeClassMask:
+            matches = [
+                i for i in matches if entries[i].nodeClass & nodeClassMask
+            ]
+        return [
+            entries[i] for i in nsmallest(limit, matches, key=lambda i: (
+                entries[i].rank(text), len(entries[i].path), entries[i].path
+            ))
+        ]
@@ -0,0 +1,222 @@
+"""
+Sharding of OPC UA servers between worker processes of the API:
+    - Each server is owned by one worker slot, chosen by rendezvous
+      (highest random weight) hashing of the server name. Changing the
+      number of workers only moves servers of the added or removed slots.
+    - Workers claim slots with lock files, which are released when a
+      worker exits, so a restarted worker takes over the slot it left.
+    - Other workers forward calls for a server to its owner over a Unix
+      socket. Messages are pickled and length prefixed, so workers
+      refuse socket directories that other users could write to or read:
+      the directory must be owned by the user running the API, not be a
+      symlink and have no group or other permissions.
+"""
+
+import os
+import fcntl
+import pickle
+import struct
+import hashlib
+import asyncio
+import stat
+
+HEADER = struct.Struct("<I")
+
+
+def defaultSocketDirectory():
+    """
+    Returns the default socket directory, under the private
+    $XDG_RUNTIME_DIR if set, otherwise a directory of the user in /tmp.
+    """
+
+    runtimeDirectory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDirectory:
+        return os.path.join(runtimeDirectory, "opcua-graphql")
+    return "/tmp/opcua-graphql-" + str(os.getuid())
+
+
+def checkPrivate(directory):
+    """
+    Raises PermissionError unless the directory is owned by the user
+    running the API, is not a symlink and has no group or other
+    permissions. Pickled messages from anyone else could run code.
+    """
+
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode):
+        raise PermissionError(
+            "Socket directory " + directory + " is not a directory"
+        )
+    if status.st_uid != os.getuid():
+        raise PermissionError(
+            "Socket directory " + directory + " is owned by another user"
+        )
+    if status.st_mode & 0o077:
+        raise PermissionError(
+            "Socket directory " + directory
+            + " is accessible to other users, chmod 700 it"
+        )
+
+
+def ownerOf(serverName, workers):
+    """
+    Returns slot of the worker that owns a server, 0 to workers - 1.
+    Same for all workers, unlike hash() of strings.
+    """
+
+    return max(range(workers), key=lambda slot: hashlib.sha1(
+        (serverName + "/" + str(slot)).encode("utf-8")
+    ).digest())
+
+
+def socketPath(directory, slot):
+    return os.path.join(directory, "worker-" + str(slot) + ".sock")
+
+
+def claimSlot(directory, workers):
+    """
+    Claims the first free worker slot.
+    Raises PermissionError if the directory is not private.
+
+    Results
+    slot:       Claimed slot, None if all slots are taken
+    lockFile:   Open lock file of the slot, to be kept open while
+                the worker runs
+    """
+
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    checkPrivate(directory)
+    for slot in range(workers):
+        lockFile = open(
+            os.path.join(directory, "worker-" + str(slot) + ".lock"), "w"
+        )
+        try:
+            fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lockFile.close()
+            continue
+        return slot, lockFile
+    return None, None
+
+
+async def read_message(reader):
+    header = await reader.readexactly(HEADER.size)
+    return pickle.loads(await reader.readexactly(HEADER.unpack(header)[0]))
+
+
+def write_message(writer, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    writer.write(HEADER.pack(len(data)) + data)
+
+
+async def serve(directory, slot, handler):
+    """
+    Serves calls forwarded to the worker in a slot.
+    Calls of one connection are handled in order.
+
+    Arguments                                   Example
+    directory:  Directory of the sockets        "/tmp/opcua-graphql"
+    slot:       Slot claimed by this worker     0
+    handler:    Coroutine function called with
+                each message, returns result
+                and extra data for the caller   handle(message)
+
+    Results
+    server:     asyncio Server of the socket
+    """
+
+    path = socketPath(directory, slot)
+    if os.path.exists(path):
+        os.remove(path)
+
+    async def connection(reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    result, extra = await handler(message)
+                    response = (None, result, extra)
+                    write_message(writer, response)
+                except Exception as e:
+                    try:
+                        write_message(writer, (e, None, None))
+                    except Exception:
+                        # Errors that can't be pickled
+                        write_message(writer, (
+                            RuntimeError(type(e).__name__ + ": " + str(e)),
+                            None, None
+                        ))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_unix_server(connection, path)
+
+
+class ShardClient(object):
+    """
+    Forwards calls to the workers that own servers.
+    Connections to each worker are kept open and reused.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.idle = {}
+        # ---------- Statistics -----------
+        self.calls = 0
+        self.failures = 0
+
+    async def call(self, slot, message):
+        """
+        Sends a message to the worker in a slot.
+        Returns result and extra data from its handler,
+        raises the error of the handler if it failed.
+        Raises ConnectionError if the worker is not available.
+        """
+
+        connections = self.idle.setdefault(slot, [])
+        connection = None
+        while len(connections) > 0:
+            connection = connections.pop()
+            if not connection[0].at_eof():
+                break
+            connection[1].close()
+            connection = None
+
+        self.calls += 1
+        try:
+            if connection is None:
+                connection = await asyncio.open_unix_connection(
+                    socketPath(self.directory, slot)
+                )
+            reader, writer = connection
+            write_message(writer, message)
+            await writer.drain()
+            error, result, extra = await read_message(reader)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.failures += 1
+            if connection is not None:
+                connection[1].close()
+            raise ConnectionError(
+                "Worker " + str(slot) + " not available: " + str(e)
+            )
+        except asyncio.CancelledError:
+            # Response of the cancelled call would be read by the next one
+            if connection is not None:
+                connection[1].close()
+            raise
+        connections.append(connection)
+        if error is not None:
+            raise error
+        return result, extra
+
+    def close(self):
+        for connections in self.idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self.idle.clear()
@@ -0,0 +1,351 @@
+"""
+Latest values of subscribed nodes shared between worker processes:
+    - A shared memory table of fixed-size slots, one per node, with the
+      value, status code and timestamps of its latest data change.
+    - Slots are found by open addressing on a CRC-32 of the node id, which
+      is the same in every process. Nodes are never removed, so a slot
+      found once stays the slot of the node.
+    - One writer (the worker owning the subscriptions) updates slots with a
+      sequence number that is odd while a slot is written. Readers copy a
+      slot and retry if the sequence was odd or changed meanwhile, so they
+      never see a partially written value and never block the writer.
+"""
+
+import time
+import zlib
+import struct
+import datetime
+from multiprocessing import shared_memory, resource_tracker
+from opcua import ua
+from opcua.common.utils import Buffer
+from opcua.ua.ua_binary import variant_to_binary, variant_from_binary
+from encoding import EPOCH, epoch_microseconds
+
+MAGIC = b"OPCUAVAL"
+# Changed when the layout changes, tables of older layouts are recreated
+TABLE_FORMAT = 1
+# Magic, format, slots, value size, valid (0 after table was replaced)
+TABLE_HEADER = struct.Struct("<8sIIII")
+# Sequence, key length, status code, source and server timestamps
+# (microseconds since POSIX epoch) and value length
+SLOT_HEADER = struct.Struct("<IHIqqI")
+SEQUENCE = struct.Struct("<I")
+VALID = struct.Struct("<I")
+VALID_OFFSET = 20
+
+KEY_SIZE = 128
+VALUE_SIZE = 256
+# Timestamp of values without one
+NO_TIMESTAMP = -2 ** 63
+# Value length of values larger than the slot, read from the owner
+OVERFLOW = 0xFFFFFFFF
+# Attempts to read a consistent slot before giving up
+MAX_RETRIES = 100
+
+
+def tableSize(slots, valueSize):
+    return TABLE_HEADER.size + slots * slotSize(valueSize)
+
+
+def slotSize(valueSize):
+    # Multiple of 8, so sequence numbers are aligned
+    return (SLOT_HEADER.size + KEY_SIZE + valueSize + 7) // 8 * 8
+
+
+def untrack(memory):
+    # Otherwise the resource tracker of Python 3.8 unlinks the memory
+    # when any process using it exits
+    resource_tracker.unregister(memory._name, "shared_memory")
+
+
+def timestampMicroseconds(timestamp):
+    if timestamp is None:
+        return NO_TIMESTAMP
+    return epoch_microseconds(timestamp)
+
+
+def microsecondsTimestamp(microseconds):
+    if microseconds == NO_TIMESTAMP:
+        return None
+    return EPOCH + datetime.timedelta(microseconds=microseconds)
+
+
+class SharedValueTable(object):
+    """
+    Table of latest node values in named shared memory.
+    The writer creates the table with create=True, other processes attach
+    to it by name. The memory is kept after all processes exit, so
+    a restarted writer continues with the table readers already use.
+
+    Arguments                                   Example
+    name:       Name of the shared memory       "opcua-graphql-1a2b3c"
+    slots:      Number of nodes, needed
+                with create=True                10000
+    valueSize:  Bytes of encoded value per
+                slot, needed with create=True   256
+    create:     True for the writer             True
+    """
+
+    def __init__(self, name, slots=None, valueSize=VALUE_SIZE, create=False):
+        self.name = name
+        self.memory = None
+        if create is True:
+            self.memory = self.create_memory(name, slots, valueSize)
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            untrack(self.memory)
+        self.buffer = self.memory.buf
+        magic, tableFormat, self.slots, self.valueSize, valid = \
+            TABLE_HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or tableFormat != TABLE_FORMAT:
+            self.close()
+            raise ValueError(name + " is not a shared value table")
+        self.slotSize = slotSize(self.valueSize)
+        # Slots of node ids found in the table
+        self.index = {}
+        # Sequence and DataValue of slots last decoded by this reader,
+        # returned again while the sequence is unchanged
+        self.decoded = {}
+        if create is True:
+            self.clear()
+        # ---------- Statistics -----------
+        self.hits = 0
+        self.misses = 0
+        self.retries = 0
+        self.overflows = 0
+
+    def create_memory(self, name, slots, valueSize):
+        """
+        Opens the table if it exists with the same layout, otherwise
+        marks the existing one replaced and creates a new one.
+        """
+
+        size = tableSize(slots, valueSize)
+        try:
+            memory = shared_memory.SharedMemory(name)
+        except FileNotFoundError:
+            memory = None
+        if memory is not None:
+            if (
+                memory.size >= size
+                and TABLE_HEADER.unpack_from(memory.buf) == (
+                    MAGIC, TABLE_FORMAT, slots, valueSize, 1
+                )
+            ):
+                untrack(memory)
+                return memory
+            if memory.size >= TABLE_HEADER.size:
+                VALID.pack_into(memory.buf, VALID_OFFSET, 0)
+            memory.close()
+            memory.unlink()
+
+        memory = shared_memory.SharedMemory(name, create=True, size=size)
+        untrack(memory)
+        TABLE_HEADER.pack_into(
+            memory.buf, 0, MAGIC, TABLE_FORMAT, slots, valueSize, 1
+        )
+        return memory
+
+    @property
+    def valid(self):
+        """
+        False after the writer has replaced the table with a new one.
+        """
+
+        return VALID.unpack_from(self.buffer, VALID_OFFSET)[0] == 1
+
+    def slot_offset(self, slot):
+        return TABLE_HEADER.size + slot * self.slotSize
+
+    def read_slot(self, slot):
+        """
+        Returns consistent copy of a slot, None if it's being written for
+        longer than MAX_RETRIES attempts.
+        """
+
+        offset = self.slot_offset(slot)
+        end = offset + self.slotSize
+        buffer = self.buffer
+        for attempt in range(MAX_RETRIES):
+            sequence = SEQUENCE.unpack_from(buffer, offset)[0]
+            if sequence & 1 == 0:
+                data = bytes(buffer[offset:end])
+                if SEQUENCE.unpack_from(buffer, offset)[0] == sequence:
+                    return data
+            self.retries += 1
+            time.sleep(0)
+        return None
+
+    def slot_key(self, data):
+        keyLength = SLOT_HEADER.unpack_from(data)[1]
+        return data[SLOT_HEADER.size:SLOT_HEADER.size + keyLength]
+
+    def find_slot(self, key, insert=False):
+        """
+        Returns slot of a node id key, or the empty slot for it if insert
+        is True. None if not found or the table is full.
+        """
+
+        start = zlib.crc32(key) % self.slots
+        for probe in range(self.slots):
+            slot = (start + probe) % self.slots
+            data = self.read_slot(slot)
+            if data is None:
+                return None
+            slotKey = self.slot_key(data)
+            if slotKey == key:
+                return slot
+            if len(slotKey) == 0:
+                return slot if insert is True else None
+        return None
+
+    def write_slot(self, slot, key, dataValue):
+        buffer = self.buffer
+        offset = self.slot_offset(slot)
+        value = b""
+        valueLength = 0
+        statusCode = 0
+        sourceTimestamp = NO_TIMESTAMP
+        serverTimestamp = NO_TIMESTAMP
+        if dataValue is not None:
+            value = variant_to_binary(dataValue.Value)
+            valueLength = len(value)
+            if valueLength > self.valueSize:
+                value = b""
+                valueLength = OVERFLOW
+            statusCode = dataValue.StatusCode.value
+            sourceTimestamp = timestampMicroseconds(
+                dataValue.SourceTimestamp
+            )
+            serverTimestamp = timestampMicroseconds(
+                dataValue.ServerTimestamp
+            )
+
+        sequence = SEQUENCE.unpack_from(buffer, offset)[0]
+        SEQUENCE.pack_into(buffer, offset, (sequence + 1) & 0xFFFFFFFF)
+        SLOT_HEADER.pack_into(
+            buffer, offset, (sequence + 1) & 0xFFFFFFFF, len(key),
+            statusCode, sourceTimestamp, serverTimestamp, valueLength
+        )
+        keyOffset = offset + SLOT_HEADER.size
+        buffer[keyOffset:keyOffset + len(key)] = key
+        valueOffset = keyOffset + KEY_SIZE
+        buffer[valueOffset:valueOffset + len(value)] = value
+        SEQUENCE.pack_into(buffer, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def put(self, nodeId, dataValue):
+        """
+        Writes the latest DataValue of a node.
+        Only one process and thread may write to a table.
+        Returns False if the node id is too long or the table is full.
+        """
+
+        key = nodeId.encode("utf-8")
+        slot = self.index.get(key)
+        if slot is None:
+            if len(key) == 0 or len(key) > KEY_SIZE:
+                return False
+            slot = self.find_slot(key, insert=True)
+            if slot is None:
+                return False
+            self.index[key] = slot
+        self.write_slot(slot, key, dataValue)
+        return True
+
+    def get(self, nodeId):
+        """
+        Returns the latest DataValue of a node, None if the node is not in
+        the table or its value didn't fit in the slot.
+        """
+
+        key = nodeId.encode("utf-8")
+        slot = self.index.get(key)
+        data = None
+        if slot is not None:
+            decoded = self.decoded.get(slot)
+            if decoded is not None and decoded[0] == SEQUENCE.unpack_from(
+                self.buffer, self.slot_offset(slot)
+            )[0]:
+                self.hits += 1
+                return decoded[1]
+            data = self.read_slot(slot)
+            if data is not None and self.slot_key(data) != key:
+                # Table was cleared by a restarted writer
+                del self.index[key]
+                slot = None
+        if slot is None:
+            slot = self.find_slot(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.index[key] = slot
+            data = self.read_slot(slot)
+        if data is None:
+            self.misses += 1
+            return None
+
+        (
+            sequence, keyLength, statusCode, sourceTimestamp,
+            serverTimestamp, valueLength
+        ) = SLOT_HEADER.unpack_from(data)
+        if valueLength == OVERFLOW:
+            self.overflows += 1
+            self.misses += 1
+            return None
+        valueOffset = SLOT_HEADER.size + KEY_SIZE
+        dataValue = ua.DataValue(
+            variant_from_binary(
+                Buffer(data[valueOffset:valueOffset + valueLength])
+            ),
+            ua.StatusCode(statusCode)
+        )
+        dataValue.SourceTimestamp = microsecondsTimestamp(sourceTimestamp)
+        dataValue.ServerTimestamp = microsecondsTimestamp(serverTimestamp)
+        self.decoded[slot] = (sequence, dataValue)
+        self.hits += 1
+        return dataValue
+
+    def clear(self):
+        """
+        Empties all slots. Used by the writer when it reopens a table,
+        as it has no subscriptions for the values left in it.
+        """
+
+        empty = bytes(self.slotSize - SEQUENCE.size)
+        buffer = self.buffer
+        for slot in range(self.slots):
+            offset = self.slot_offset(slot)
+            sequence = SEQUENCE.unpack_from(buffer, offset)[0]
+            SEQUENCE.pack_into(buffer, offset, (sequence + 1) & 0xFFFFFFFF)
+            buffer[offset + SEQUENCE.size:offset + self.slotSize] = empty
+            SEQUENCE.pack_into(buffer, offset, (sequence + 2) & 0xFFFFFFFF)
+        self.index.clear()
+
+    def __len__(self):
+        """
+        Number of nodes in the table.
+        """
+
+        return sum(
+            1 for slot in range(self.slots)
+            if SLOT_HEADER.unpack_from(
+                self.buffer, self.slot_offset(slot)
+            )[1] > 0
+        )
+
+    def close(self):
+        if self.memory is not None:
+            self.buffer = None
+            self.memory.close()
+            self.memory = None
+
+    def unlink(self):
+        """
+        Removes the shared memory, processes attached to it keep using it
+        until they close it.
+        """
+
+        memory = shared_memory.SharedMemory(self.name)
+        VALID.pack_into(memory.buf, VALID_OFFSET, 0)
+        memory.close()
+        memory.unlink()
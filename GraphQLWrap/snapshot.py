@@ -0,0 +1,128 @@
+"""
+Snapshots of crawled address spaces on disk:
+    - One SQLite file per server with the nodes, hierarchical references
+      and data types found by crawling the server.
+    - Validation of a snapshot against the namespace array and start time
+      of the server, so it is only used while the address space is the
+      same as when it was saved.
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+
+# Changed when the tables change, older snapshots are not loaded
+SNAPSHOT_FORMAT = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE nodes (
+    nodeId TEXT, displayName TEXT, browseName TEXT, description TEXT,
+    path TEXT, nodeClass INTEGER
+);
+CREATE TABLE children (parent TEXT, child TEXT);
+CREATE TABLE dataTypes (nodeId TEXT, superType TEXT);
+"""
+
+
+def save_snapshot(path, snapshot):
+    """
+    Saves a snapshot dict to a SQLite file. The file is written next to
+    path and moved in place, so readers never see a partial snapshot.
+
+    Arguments                                   Example
+    path:       File to save to                 "snapshots/Test.sqlite"
+    snapshot:   Dict with
+        namespaceArray: Namespace array         ["http://opcfoundation..."]
+        startTime:      ServerStatus.StartTime  datetime.datetime()
+        createdAt:      Time of crawl           datetime.datetime()
+        crawlTime:      Crawl duration (ns)     123456789
+        nodes:          (nodeId, displayName, browseName, description,
+                        path, nodeClass) tuples
+        children:       (parent, child) node id tuples in browse order,
+                        child None for nodes without children
+        dataTypes:      (nodeId, superType) node id tuples
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporaryPath = path + ".tmp"
+    if os.path.exists(temporaryPath):
+        os.remove(temporaryPath)
+
+    connection = sqlite3.connect(temporaryPath)
+    try:
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format", str(SNAPSHOT_FORMAT)),
+            ("namespaceArray", json.dumps(snapshot["namespaceArray"])),
+            ("startTime", snapshot["startTime"].isoformat()),
+            ("createdAt", snapshot["createdAt"].isoformat()),
+            ("crawlTime", str(snapshot["crawlTime"])),
+        ])
+        connection.executemany(
+            "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)", snapshot["nodes"]
+        )
+        connection.executemany(
+            "INSERT INTO children VALUES (?, ?)", snapshot["children"]
+        )
+        connection.executemany(
+            "INSERT INTO dataTypes VALUES (?, ?)", snapshot["dataTypes"]
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporaryPath, path)
+
+
+def read_snapshot_meta(path):
+    """
+    Reads the meta table of a snapshot.
+    Returns dict of the meta values, None if there is no valid snapshot.
+    """
+
+    if not os.path.exists(path):
+        return None
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    if meta.get("format") != str(SNAPSHOT_FORMAT):
+        return None
+    return {
+        "namespaceArray": json.loads(meta["namespaceArray"]),
+        "startTime": datetime.datetime.fromisoformat(meta["startTime"]),
+        "createdAt": datetime.datetime.fromisoformat(meta["createdAt"]),
+        "crawlTime": int(meta["crawlTime"]),
+    }
+
+
+def load_snapshot(path):
+    """
+    Loads a snapshot saved with save_snapshot.
+    Returns the snapshot dict, None if there is no valid snapshot.
+    """
+
+    snapshot = read_snapshot_meta(path)
+    if snapshot is None:
+        return None
+    connection = sqlite3.connect(path)
+    try:
+        snapshot["nodes"] = connection.execute(
+            "SELECT * FROM nodes ORDER BY rowid"
+        ).fetchall()
+        snapshot["children"] = connection.execute(
+            "SELECT * FROM children ORDER BY rowid"
+        ).fetchall()
+        snapshot["dataTypes"] = connection.execute(
+            "SELECT * FROM dataTypes"
+        ).fetchall()
+    finally:
+        connection.close()
+    return snapshot
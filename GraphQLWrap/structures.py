@@ -0,0 +1,143 @@
+"""
+Structured data types of OPC UA servers:
+    - Decoders generated from the data type dictionaries of a server and
+      registered so read ExtensionObjects are decoded into structures.
+      Classes are registered in opcua.ua by names prefixed with the server
+      name, so servers with the same structure names don't replace each
+      other's classes or built-in types.
+    - Saving and loading the dictionaries, so decoders are created without
+      reading them from the server while its namespace array is unchanged.
+"""
+
+import os
+import re
+import json
+from enum import IntEnum
+from opcua import ua
+from opcua.common.structures import StructGenerator, Struct
+
+# Server of each name registered in opcua.ua by create_structures
+registeredNames = {}
+
+
+def clean_name(name):
+    """
+    Returns structure name as the Python class name made for it.
+    """
+
+    name = re.sub(r"\W+", "_", name)
+    return re.sub(r"^[0-9]+", r"_\g<0>", name)
+
+
+def register(serverName, name, value):
+    """
+    Registers a class of a server in opcua.ua, where values are pickled by
+    reference. Returns False without registering if the name is already
+    used by another server or by python-opcua.
+    """
+
+    if hasattr(ua, name) and registeredNames.get(name) != serverName:
+        return False
+    value.__module__ = "opcua.ua"
+    setattr(ua, name, value)
+    registeredNames[name] = serverName
+    return True
+
+
+def create_structures(serverName, dictionaries):
+    """
+    Generates classes of the structures in data type dictionaries and
+    registers them for decoding by their binary encoding node ids.
+    Classes are named <server name>__<structure name>, structures whose
+    names are taken in opcua.ua are not registered.
+
+    Arguments                                   Example
+    serverName:     Name of the server          "TestServer"
+    dictionaries:   List of dicts with
+        xml:        Dictionary (OPC Binary)     "<opc:TypeDictionary ..."
+        encodings:  [name, encoding node id]
+                    of each structure           [["Status", "ns=2;i=5"]]
+
+    Results
+    structures:     Registered classes by name  {"Status": <class>}
+    """
+
+    prefix = clean_name(serverName) + "__"
+    structures = {}
+    for dictionary in dictionaries:
+        generator = StructGenerator()
+        generator.make_model_from_string(dictionary["xml"])
+        # Types of fields and their default values refer to the
+        # classes by name, so they are renamed before generating them
+        names = {}
+        for element in generator.model:
+            name = clean_name(element.name)
+            names[name] = prefix + name
+            element.name = names[name]
+        for element in generator.model:
+            if not isinstance(element, Struct):
+                continue
+            for field in element.fields:
+                if field.uatype not in names:
+                    continue
+                default = "ua." + field.uatype
+                if isinstance(field.value, str) and \
+                        field.value.startswith(default):
+                    field.value = "ua." + names[field.uatype] + \
+                        field.value[len(default):]
+                field.uatype = names[field.uatype]
+
+        classes = {}
+        generator.get_python_classes(classes)
+        for name, value in classes.items():
+            if (
+                isinstance(value, type) and issubclass(value, IntEnum)
+                and value is not IntEnum
+            ):
+                register(serverName, name, value)
+        for name, nodeId in dictionary["encodings"]:
+            name = clean_name(name)
+            className = names.get(name)
+            if className in classes and \
+                    register(serverName, className, classes[className]):
+                ua.register_extension_object(
+                    className, ua.NodeId.from_string(nodeId),
+                    classes[className]
+                )
+                structures[name] = classes[className]
+    return structures
+
+
+def save_type_dictionaries(path, namespaceArray, dictionaries):
+    """
+    Saves data type dictionaries of a server to a JSON file, written
+    next to path and moved in place.
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "w") as dictionaryFile:
+        json.dump({
+            "namespaceArray": namespaceArray,
+            "dictionaries": dictionaries
+        }, dictionaryFile)
+    os.replace(temporaryPath, path)
+
+
+def load_type_dictionaries(path, namespaceArray):
+    """
+    Loads data type dictionaries saved with save_type_dictionaries.
+    Returns None if there are none or they were saved with another
+    namespace array.
+    """
+
+    try:
+        with open(path) as dictionaryFile:
+            saved = json.load(dictionaryFile)
+    except (OSError, ValueError):
+        return None
+    if saved.get("namespaceArray") != namespaceArray:
+        return None
+    return saved.get("dictionaries")
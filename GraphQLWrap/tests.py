@@ -1,12 +1,46 @@
 import unittest
 import datetime
+import json
 import time
 import logging
 import os
+import base64
+import struct
+import msgpack
 from starlette.testclient import TestClient
 from string import Template
 from main import app
-from opcua import Server
+from opcua import Server, ua
+from opcua.common.type_dictionary_buider import DataTypeDictionaryBuilder
+from opcua.ua.ua_binary import Primitives
+from opcuautils import getServer, getServers, OPCUAServer, \
+    warmUpServers, OPERATION_LIMITS, handleForwarded
+from sharding import ownerOf, claimSlot, serve, ShardClient
+from sharedvalues import SharedValueTable
+from ioworkers import IOWorker
+from deadline import requestDeadline, within_deadline, latest_deadline, \
+    DeadlineExceeded
+from redundancy import Redundancy, HEDGE_DELAY
+from encoding import encode_value
+import opcuautils
+import graphene_schema.query as querySchema
+from timeseries import RingBuffer, TimeSeriesStore, aggregate
+from admission import AdmissionController, OverloadError, \
+    WRITE, VALUE_READ, BROWSE
+from coalescing import WriteCoalescer
+from provisioning import ProvisioningProgress
+from searchindex import SearchIndex, SearchEntry
+from structures import create_structures
+from cache import BrowseCache
+from array import array
+import asyncio
+import multiprocessing
+import threading
+import tempfile
+import shutil
+import copy
+import sqlite3
+import pickle
 
 testServerName = "Terver"
 testServerEndpoint = "opc.tcp://localhost:4840/freeopcua/server/"
@@ -110,6 +144,378 @@ class TestGetServers(unittest.TestCase):
             assert isinstance(server.get("endPointAddress"), str)
 
 
+def indexRangeSlice(indexRange):
+    bounds = [int(bound) for bound in indexRange.split(":")]
+    return slice(bounds[0], bounds[-1] + 1)
+
+
+def supportIndexRanges(attributeService):
+    """
+    Makes the attribute service of the python-opcua test server apply
+    one dimensional IndexRanges of reads and writes like a compliant
+    server. It ignores them otherwise.
+    """
+
+    read = attributeService.read
+    write = attributeService.write
+
+    def readRanges(params):
+        results = read(params)
+        for i, readValue in enumerate(params.NodesToRead):
+            value = results[i].Value
+            if readValue.IndexRange and isinstance(value.Value, list):
+                # Stored DataValues are returned, so they're not changed
+                results[i] = copy.copy(results[i])
+                results[i].Value = ua.Variant(
+                    value.Value[indexRangeSlice(readValue.IndexRange)],
+                    value.VariantType
+                )
+        return results
+
+    def writeRanges(params, *arguments):
+        for writeValue in params.NodesToWrite:
+            if writeValue.IndexRange:
+                readValue = ua.ReadValueId()
+                readValue.NodeId = writeValue.NodeId
+                readValue.AttributeId = writeValue.AttributeId
+                readParams = ua.ReadParameters()
+                readParams.NodesToRead = [readValue]
+                current = list(read(readParams)[0].Value.Value)
+                variant = writeValue.Value.Value
+                current[indexRangeSlice(writeValue.IndexRange)] = \
+                    variant.Value
+                writeValue.Value = ua.DataValue(
+                    ua.Variant(current, variant.VariantType)
+                )
+                writeValue.IndexRange = None
+        return write(params, *arguments)
+
+    attributeService.read = readRanges
+    attributeService.write = writeRanges
+
+
+class TestArrayVariable(unittest.TestCase):
+
+    def setUp(self):
+        self.queryArray = Template("""
+            query {
+                node(server: "$server", nodeId: "ns=2;i=11") {
+                    variable(indexRange: "$indexRange", packed: $packed) {
+                        value
+                        dataType
+                        packedType
+                        dimensions
+                    }
+                }
+            }
+        """)
+        self.querySetArray = Template("""
+            mutation {
+                setValue(
+                    server: "$server",
+                    nodeId: "ns=2;i=11",
+                    value: $value,
+                    dataType: "Double"
+                ) { ok }
+            }
+        """)
+
+    def test_packed_array(self):
+        query = self.queryArray.substitute({
+            "server": testServerName,
+            "indexRange": "0:9",
+            "packed": "true"
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        variable = response.json()["data"]["node"]["variable"]
+        assert variable.get("dataType") == "Double"
+        assert variable.get("packedType") == "<f8"
+        assert variable.get("dimensions") == [10]
+        values = struct.unpack("<10d", base64.b64decode(variable["value"]))
+        assert list(values) == [float(i) for i in range(10)]
+
+    def test_set_array(self):
+        value = [float(i) * 2 for i in range(10)]
+        query = self.querySetArray.substitute({
+            "server": testServerName,
+            "value": value
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        assert response.json()["data"]["setValue"]["ok"] is True
+
+        query = self.queryArray.substitute({
+            "server": testServerName,
+            "indexRange": "0:9",
+            "packed": "false"
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        variable = response.json()["data"]["node"]["variable"]
+        assert variable.get("value") == value
+        assert variable.get("packedType") is None
+
+    def test_index_range(self):
+        value = [float(i) for i in range(10)]
+        client.post("/graphql/", json={"query": self.querySetArray.substitute({
+            "server": testServerName,
+            "value": value
+        })})
+        response = client.post("/graphql/", json={"query": """
+            mutation {
+                setValue(
+                    server: "%s",
+                    nodeId: "ns=2;i=11",
+                    value: [20.0, 30.0, 40.0],
+                    dataType: "Double",
+                    indexRange: "2:4"
+                ) { ok }
+            }
+        """ % testServerName})
+        assert response.json()["data"]["setValue"]["ok"] is True
+
+        response = client.post("/graphql/", json={
+            "query": self.queryArray.substitute({
+                "server": testServerName,
+                "indexRange": "2:4",
+                "packed": "false"
+            })
+        })
+        variable = response.json()["data"]["node"]["variable"]
+        assert variable["value"] == [20.0, 30.0, 40.0]
+
+        response = client.post("/graphql/", json={
+            "query": self.queryArray.substitute({
+                "server": testServerName,
+                "indexRange": "0:9",
+                "packed": "false"
+            })
+        })
+        variable = response.json()["data"]["node"]["variable"]
+        value[2:5] = [20.0, 30.0, 40.0]
+        assert variable["value"] == value
+
+        client.post("/graphql/", json={"query": self.querySetArray.substitute({
+            "server": testServerName,
+            "value": [float(i) for i in range(10)]
+        })})
+
+
+class TestResponseFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.queryNode = """
+            query {
+                node(server: "%s", nodeId: "ns=2;i=2") {
+                    name
+                    variable { value sourceTimestamp }
+                }
+            }
+        """ % testServerName
+
+    def test_msgpack_response(self):
+        response = client.post(
+            "/graphql/",
+            json={"query": self.queryNode},
+            headers={"Accept": "application/msgpack"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        node = msgpack.unpackb(response.content)["data"]["node"]
+        assert node["name"] == "VariableNode"
+        timestamp = node["variable"]["sourceTimestamp"]
+        assert isinstance(timestamp, int)
+        assert abs(timestamp / 1e6 - time.time()) < 24 * 3600
+
+    def test_msgpack_request(self):
+        response = client.post(
+            "/graphql/",
+            data=msgpack.packb({"query": self.queryNode}),
+            headers={"Content-Type": "application/msgpack"}
+        )
+        assert response.status_code == 200
+        node = response.json()["data"]["node"]
+        assert node["name"] == "VariableNode"
+        assert isinstance(node["variable"]["sourceTimestamp"], str)
+
+
+class TestValuesEndpoint(unittest.TestCase):
+
+    def test_write_and_read_values(self):
+        response = client.post("/values", json={
+            "server": testServerName,
+            "nodeIds": ["ns=2;i=2"],
+            "values": [42],
+            "dataTypes": ["Int32"]
+        })
+        assert response.status_code == 200
+        result = response.json()
+        assert result["statusCodes"] == ["Good"]
+        assert isinstance(result["writeTime"], int)
+
+        response = client.get("/values", params={
+            "server": testServerName,
+            "nodeId": ["ns=2;i=2", "ns=2;i=3"]
+        })
+        assert response.status_code == 200
+        result = response.json()
+        assert result["nodeIds"] == ["ns=2;i=2", "ns=2;i=3"]
+        assert result["values"] == [42, 0]
+        assert result["dataTypes"] == ["Int32", "Int64"]
+        assert result["statusCodes"] == ["Good", "Good"]
+        assert isinstance(result["sourceTimestamps"][1], str)
+        assert isinstance(result["readTime"], int)
+
+    def test_read_values_msgpack(self):
+        response = client.get(
+            "/values",
+            params={"server": testServerName, "nodeId": "ns=2;i=3"},
+            headers={"Accept": "application/msgpack"}
+        )
+        assert response.status_code == 200
+        result = msgpack.unpackb(response.content)
+        assert result["values"] == [0]
+        assert isinstance(result["sourceTimestamps"][0], int)
+
+    def test_unknown_server(self):
+        response = client.get("/values", params={
+            "server": "Nonexistent",
+            "nodeId": "ns=2;i=2"
+        })
+        assert response.status_code == 400
+        assert response.json()["error"] == "Server not found in server list"
+
+    def test_malformed_node_id(self):
+        response = client.get("/values", params={
+            "server": testServerName, "nodeId": "ns=2;x=Bad"
+        })
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    def test_unreachable_server(self):
+        unreachable = OPCUAServer("Unreachable", "opc.tcp://localhost:4999/")
+        getServers().append(unreachable)
+        try:
+            response = client.get("/values", params={
+                "server": "Unreachable", "nodeId": "ns=2;i=2"
+            })
+        finally:
+            getServers().remove(unreachable)
+        assert response.status_code == 504
+        assert response.json()["error"]
+
+    def test_subscribe_variables_at_call_time(self):
+        server = getServer(testServerName)
+        querySchema.subscribeVariables = True
+        try:
+            response = client.get("/values", params={
+                "server": testServerName, "nodeId": "ns=2;s=Line/1/Speed"
+            })
+        finally:
+            querySchema.subscribeVariables = False
+        assert response.status_code == 200
+        assert "ns=2;s=Line/1/Speed" in server.monitoredItems
+
+
+class TestConditionalResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.queryNode = """
+            query {
+                node(server: "%s", nodeId: "ns=2;i=12") {
+                    name
+                    variable { value }
+                }
+            }
+        """ % testServerName
+        self.querySetValue = Template("""
+            mutation {
+                setValue(
+                    server: "%s",
+                    nodeId: "ns=2;i=12",
+                    value: $value,
+                    dataType: "Int32"
+                ) { ok }
+            }
+        """ % testServerName)
+
+    def test_graphql_not_modified(self):
+        query = self.querySetValue.substitute({"value": 10})
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+
+        response = client.post("/graphql/", json={"query": self.queryNode})
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = client.post(
+            "/graphql/",
+            json={"query": self.queryNode},
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        query = self.querySetValue.substitute({"value": 11})
+        client.post("/graphql/", json={"query": query})
+        response = client.post(
+            "/graphql/",
+            json={"query": self.queryNode},
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["data"]["node"]["variable"]["value"] == 11
+
+    def test_server_statistics_modified(self):
+        query = """
+            query {
+                servers {
+                    name activeRequests queuedRequests
+                    admission { priority admitted }
+                }
+            }
+        """
+        response = client.post("/graphql/", json={"query": query})
+        etag = response.headers["etag"]
+        response = client.post(
+            "/graphql/", json={"query": query},
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        admission = getServer(testServerName).admission
+        admission.active += 3
+        try:
+            response = client.post(
+                "/graphql/", json={"query": query},
+                headers={"If-None-Match": etag}
+            )
+        finally:
+            admission.active -= 3
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_values_not_modified(self):
+        params = {"server": testServerName, "nodeId": "ns=2;i=3"}
+        response = client.get("/values", params=params)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = client.get(
+            "/values", params=params, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        response = client.get(
+            "/values", params=params,
+            headers={"If-None-Match": etag, "Accept": "application/msgpack"}
+        )
+        assert response.status_code == 200
+
+
 class TestServerConfig(unittest.TestCase):
 
     def setUp(self):
@@ -753,6 +1159,1772 @@ class TestNodeManagement(unittest.TestCase):
         assert subNodes == []
 
 
+class TestTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.queryRecent = Template("""
+            query {
+                recent(server: "$server", nodeId: "$nodeId") {
+                    nodeId
+                    timestamps
+                    values
+                }
+                servers {
+                    name
+                    bufferedNodes
+                    bufferMemory
+                }
+            }
+        """)
+        self.querySetValue = Template("""
+            mutation {
+                setValue(
+                    server: "$server",
+                    nodeId: "$nodeId",
+                    value: $value,
+                    dataType: "Double"
+                ) { ok }
+            }
+        """)
+        self.queryClearSubscriptions = Template("""
+            mutation {
+                clearServerSubcriptions(name: "$server") { ok }
+            }
+        """)
+        self.queryAggregate = Template("""
+            query {
+                aggregate(
+                    server: "$server",
+                    nodeIds: ["ns=2;i=2", "ns=2;i=3"],
+                    function: "$function"
+                ) {
+                    value
+                    count
+                    nodes { nodeId value count }
+                }
+            }
+        """)
+        getServer(testServerName).timeSeries = TimeSeriesStore(100)
+
+    def tearDown(self):
+        query = self.queryClearSubscriptions.substitute({
+            "server": testServerName
+        })
+        client.post("/graphql/", json={"query": query})
+        getServer(testServerName).timeSeries = None
+
+    def test_ring_buffer_wraps(self):
+        buffer = RingBuffer(3)
+        for i in range(5):
+            buffer.append(float(i), i * 10)
+        timestamps, values = buffer.window()
+        assert list(timestamps) == [2.0, 3.0, 4.0]
+        assert list(values) == [20.0, 30.0, 40.0]
+        timestamps, values = buffer.window(since=3.0)
+        assert list(values) == [30.0, 40.0]
+
+    def test_aggregate_series(self):
+        series = [array("d", [1, 2, 3]), array("d"), array("d", [10])]
+        value, count, nodeValues, nodeCounts = aggregate(series, "max")
+        assert value == 10.0
+        assert count == 4
+        assert nodeValues == [3.0, None, 10.0]
+        assert nodeCounts == [3, 0, 1]
+        value, count, nodeValues, nodeCounts = aggregate(series, "mean")
+        assert value == 4.0
+        assert nodeValues == [2.0, None, 10.0]
+        with self.assertRaises(ValueError):
+            aggregate(series, "median")
+
+    def test_aggregate_current_values(self):
+        query = self.querySetValue.substitute({
+            "nodeId": "ns=2;i=2",
+            "server": testServerName,
+            "value": 4.0
+        })
+        client.post("/graphql/", json={"query": query})
+
+        query = self.queryAggregate.substitute({
+            "server": testServerName,
+            "function": "sum"
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        result = response.json()["data"]["aggregate"]
+        assert result["value"] == 4.0
+        assert result["count"] == 2
+        assert result["nodes"][0] == {
+            "nodeId": "ns=2;i=2", "value": 4.0, "count": 1
+        }
+
+    def test_recent_values(self):
+        query = self.queryRecent.substitute({
+            "nodeId": "ns=2;i=2",
+            "server": testServerName
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+
+        for value in [1.5, 2.5, 3.5]:
+            setQuery = self.querySetValue.substitute({
+                "nodeId": "ns=2;i=2",
+                "server": testServerName,
+                "value": value
+            })
+            response = client.post("/graphql/", json={"query": setQuery})
+            assert response.json()["data"]["setValue"]["ok"] is True
+            time.sleep(0.3)
+
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        recent = data["recent"]
+        assert recent["values"][-3:] == [1.5, 2.5, 3.5]
+        assert len(recent["timestamps"]) == len(recent["values"])
+        for server in data["servers"]:
+            if server["name"] == testServerName:
+                assert server["bufferedNodes"] == 1
+                assert server["bufferMemory"] == 100 * RingBuffer.itemSize
+
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        self.queryServers = """
+            query {
+                servers {
+                    name
+                    activeRequests
+                    queuedRequests
+                    admission { priority admitted rejected maxQueueTime }
+                }
+            }
+        """
+
+    def test_priority_order(self):
+        async def run():
+            controller = AdmissionController("Test", maxConcurrency=1)
+            await controller.acquire(BROWSE, "a")
+            order = []
+
+            async def call(priority, client):
+                await controller.acquire(priority, client)
+                order.append((priority, client))
+                controller.release()
+
+            tasks = [
+                asyncio.ensure_future(call(BROWSE, "a")),
+                asyncio.ensure_future(call(VALUE_READ, "a")),
+                asyncio.ensure_future(call(VALUE_READ, "a")),
+                asyncio.ensure_future(call(VALUE_READ, "b")),
+                asyncio.ensure_future(call(WRITE, "b")),
+            ]
+            await asyncio.sleep(0)
+            assert controller.queueLength == 5
+            controller.release()
+            await asyncio.gather(*tasks)
+            assert controller.active == 0
+            return order
+
+        order = asyncio.new_event_loop().run_until_complete(run())
+        assert order == [
+            (WRITE, "b"),
+            (VALUE_READ, "a"),
+            (VALUE_READ, "b"),
+            (VALUE_READ, "a"),
+            (BROWSE, "a"),
+        ]
+
+    def test_queue_full(self):
+        async def run():
+            controller = AdmissionController(
+                "Test", maxConcurrency=1, maxQueueDepth=1
+            )
+            await controller.acquire(WRITE)
+            waiting = asyncio.ensure_future(controller.acquire(WRITE))
+            await asyncio.sleep(0)
+            with self.assertRaises(OverloadError):
+                await controller.acquire(VALUE_READ)
+            controller.release()
+            assert await waiting > 0
+            controller.release()
+            return controller.statistics()
+
+        statistics = asyncio.new_event_loop().run_until_complete(run())
+        assert statistics[WRITE]["admitted"] == 2
+        assert statistics[VALUE_READ]["rejected"] == 1
+
+    def test_admission_statistics(self):
+        query = """
+            query {
+                node(server: "%s", nodeId: "ns=2;i=10") {
+                    subNodes { variable { value queueTime } }
+                }
+            }
+        """ % testServerName
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        subNodes = response.json()["data"]["node"]["subNodes"]
+        assert len(subNodes) == 2
+        assert isinstance(subNodes[0]["variable"]["queueTime"], int)
+
+        response = client.post("/graphql/", json={"query": self.queryServers})
+        assert response.status_code == 200
+        for server in response.json()["data"]["servers"]:
+            if server["name"] == testServerName:
+                assert server["activeRequests"] == 0
+                assert server["queuedRequests"] == 0
+                admission = {a["priority"]: a for a in server["admission"]}
+                assert admission["browse"]["admitted"] > 0
+                assert admission["valueRead"]["admitted"] > 0
+                assert admission["write"]["rejected"] == 0
+
+
+class TestWriteCoalescing(unittest.TestCase):
+
+    def test_coalesce_writes(self):
+        server = getServer(testServerName)
+        coalescer = WriteCoalescer(server, 0.05)
+
+        async def run():
+            results = await asyncio.gather(*[
+                coalescer.write("ns=2;i=12", value, "Int64")
+                for value in range(1, 6)
+            ] + [coalescer.write("ns=2;i=11", [1.5], "Double", "0")])
+            values, readTime, queueTime = await server.read_values(
+                ["ns=2;i=12", "ns=2;i=11"]
+            )
+            return results, values
+
+        results, values = asyncio.get_event_loop().run_until_complete(run())
+        assert coalescer.writes == 1
+        assert coalescer.merged == 4
+        for statusCode, writeTime, queueTime in results:
+            assert statusCode.is_good()
+            assert queueTime >= 0.05 * 1e9
+        assert values[0].Value.Value == 5
+        assert values[1].Value.Value[0] == 1.5
+
+    def test_short_deadline_fails_alone(self):
+        server = getServer(testServerName)
+        coalescer = WriteCoalescer(server, 0.05)
+
+        async def write(value, timeout):
+            if timeout is not None:
+                requestDeadline.set(time.monotonic() + timeout)
+            return await coalescer.write("ns=2;i=12", value, "Int64")
+
+        async def run():
+            return await asyncio.gather(
+                write(21, 0.01), write(22, None), return_exceptions=True
+            )
+
+        results = asyncio.get_event_loop().run_until_complete(run())
+        assert isinstance(results[0], DeadlineExceeded)
+        assert results[1][0].is_good()
+        assert coalescer.writes == 1
+
+    def test_invalid_write_fails_alone(self):
+        server = getServer(testServerName)
+        coalescer = WriteCoalescer(server, 0.05)
+
+        async def run():
+            results = await asyncio.gather(
+                coalescer.write("ns=2;i=12", 8, "NoSuchType"),
+                coalescer.write("ns=2;i=11", [2.5], "Double", "0"),
+                return_exceptions=True
+            )
+            values, readTime, queueTime = await server.read_values(
+                ["ns=2;i=11"]
+            )
+            return results, values
+
+        results, values = asyncio.get_event_loop().run_until_complete(run())
+        assert isinstance(results[0], KeyError)
+        assert results[1][0].is_good()
+        assert values[0].Value.Value[0] == 2.5
+        assert coalescer.writes == 1
+
+
+class TestProvisioning(unittest.TestCase):
+
+    def setUp(self):
+        self.queryImport = """
+            mutation ($server: String!, $parentId: String,
+                      $nodes: JSONString, $nodeSet: String) {
+                importNodes(
+                    server: $server, parentId: $parentId,
+                    nodes: $nodes, nodeSet: $nodeSet
+                ) {
+                    ok added failed
+                    results { nodeId ok statusCode }
+                }
+            }
+        """
+        self.queryDelete = """
+            mutation ($server: String!, $nodeIds: [String]!) {
+                deleteNodes(server: $server, nodeIds: $nodeIds) {
+                    ok deleted
+                    results { nodeId ok }
+                }
+            }
+        """
+        self.queryServers = """
+            query {
+                servers {
+                    name
+                    provisioning { operation total done failed finished }
+                }
+            }
+        """
+        self.nodeSet = """<?xml version="1.0" encoding="utf-8"?>
+<UANodeSet xmlns="http://opcfoundation.org/UA/2011/03/UANodeSet.xsd"
+           xmlns:uax="http://opcfoundation.org/UA/2008/02/Types.xsd">
+  <NamespaceUris>
+    <Uri>http://examples.freeopcua.github.io</Uri>
+  </NamespaceUris>
+  <Aliases>
+    <Alias Alias="Double">i=11</Alias>
+    <Alias Alias="HasComponent">i=47</Alias>
+    <Alias Alias="HasTypeDefinition">i=40</Alias>
+  </Aliases>
+  <UAObject NodeId="ns=1;s=Cell" BrowseName="1:Cell" ParentNodeId="i=85">
+    <DisplayName>Cell</DisplayName>
+    <References>
+      <Reference ReferenceType="HasTypeDefinition">i=61</Reference>
+      <Reference ReferenceType="Organizes" IsForward="false">i=85</Reference>
+      <Reference ReferenceType="HasComponent">ns=1;s=Cell.Speed</Reference>
+    </References>
+  </UAObject>
+  <UAVariable NodeId="ns=1;s=Cell.Speed" BrowseName="1:Speed"
+              DataType="Double" AccessLevel="3">
+    <DisplayName>Speed</DisplayName>
+    <References>
+      <Reference ReferenceType="HasComponent"
+                 IsForward="false">ns=1;s=Cell</Reference>
+    </References>
+    <Value><uax:Double>2.5</uax:Double></Value>
+  </UAVariable>
+  <UAMethod NodeId="ns=1;s=Cell.Start" BrowseName="1:Start"/>
+</UANodeSet>
+"""
+
+    def import_nodes(self, variables):
+        variables["server"] = testServerNameAdmin
+        response = client.post("/graphql/", json={
+            "query": self.queryImport, "variables": variables
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["data"]["importNodes"]
+
+    def delete_nodes(self, nodeIds):
+        response = client.post("/graphql/", json={
+            "query": self.queryDelete,
+            "variables": {"server": testServerNameAdmin, "nodeIds": nodeIds}
+        })
+        assert response.status_code == 200
+        return response.json()["data"]["deleteNodes"]
+
+    def test_import_and_delete_tree(self):
+        tree = [{
+            "name": "Line",
+            "nodeId": "ns=2;s=Line",
+            "children": [
+                {"name": "Station" + str(i), "children": [
+                    {"name": "Speed", "value": float(i), "dataType": "Double"},
+                    {"name": "Count", "value": i, "writable": False},
+                ]}
+                for i in range(20)
+            ]
+        }]
+        result = self.import_nodes({
+            "parentId": "i=85", "nodes": json.dumps(tree)
+        })
+        assert result["ok"] is True
+        assert result["added"] == 61
+        assert result["results"][0]["nodeId"] == "ns=2;s=Line"
+
+        server = getServer(testServerName)
+        nodeIds = [r["nodeId"] for r in result["results"][-2:]]
+        values, readTime, queueTime = asyncio.get_event_loop() \
+            .run_until_complete(server.read_values(nodeIds))
+        assert [value.Value.Value for value in values] == [19.0, 19]
+        assert values[0].Value.VariantType.name == "Double"
+
+        response = client.post("/graphql/", json={"query": self.queryServers})
+        for server in response.json()["data"]["servers"]:
+            if server["name"] == testServerNameAdmin:
+                assert server["provisioning"] == {
+                    "operation": "import", "total": 61, "done": 61,
+                    "failed": 0, "finished": True
+                }
+
+        result = self.delete_nodes(["ns=2;s=Line"])
+        assert result["ok"] is True
+        assert result["deleted"] == 61
+        assert result["results"][-1]["nodeId"] == "ns=2;s=Line"
+
+    def test_delete_mapped_node_ids(self):
+        # Node ids are mapped to the namespace of the server like in
+        # node and addNode
+        server.get_objects_node().add_variable(
+            "ns=2;s=MappedDelete", "2:MappedDelete", 1
+        )
+        mapped = OPCUAServer(
+            "Mapped", testServerEndpointAdmin,
+            nameSpaceUri="http://examples.freeopcua.github.io",
+            browseRootNodeIdentifier="i=10"
+        )
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(
+                mapped.delete_nodes(["ns=5;s=MappedDelete"])
+            )
+            assert results == [(
+                ua.NodeId("MappedDelete", 2), ua.StatusCode()
+            )]
+        finally:
+            mapped.client.disconnect()
+            loop.close()
+
+    def test_progress_modified(self):
+        server = getServer(testServerName)
+        previous = server.provisioning
+        server.provisioning = ProvisioningProgress("importNodes", 10)
+        try:
+            response = client.post(
+                "/graphql/", json={"query": self.queryServers}
+            )
+            etag = response.headers["etag"]
+            server.provisioning.done = 7
+            response = client.post(
+                "/graphql/", json={"query": self.queryServers},
+                headers={"If-None-Match": etag}
+            )
+            assert response.status_code == 200
+            progress = [
+                entry["provisioning"]
+                for entry in response.json()["data"]["servers"]
+                if entry["name"] == testServerName
+            ][0]
+            assert progress["done"] == 7
+        finally:
+            server.provisioning = previous
+
+    def test_import_nodeset(self):
+        result = self.import_nodes({"nodeSet": self.nodeSet})
+        assert result["ok"] is False
+        assert result["added"] == 2
+        assert result["results"][2] == {
+            "nodeId": "ns=2;s=Cell.Start",
+            "ok": False,
+            "statusCode": "BadNodeClassInvalid"
+        }
+
+        query = """
+            query {
+                node(server: "%s", nodeId: "ns=2;s=Cell") {
+                    name
+                    subNodes { name variable { value dataType } }
+                }
+            }
+        """ % testServerName
+        response = client.post("/graphql/", json={"query": query})
+        node = response.json()["data"]["node"]
+        assert node["name"] == "Cell"
+        assert node["subNodes"] == [{
+            "name": "Speed",
+            "variable": {"value": 2.5, "dataType": "Double"}
+        }]
+
+        result = self.delete_nodes(["ns=2;s=Cell"])
+        assert result["deleted"] == 2
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.queryFleet = Template("""
+            query {
+                fleet(path: "$path", servers: $servers, timeout: 3) {
+                    server
+                    nodeId
+                    variable { value dataType }
+                    node { name }
+                    error
+                }
+            }
+        """)
+
+    def test_fleet_path(self):
+        query = self.queryFleet.substitute({
+            "path": "0:Objects/2:ObjectNode/2:VariableNodeNonWritable",
+            "servers": json.dumps([testServerName, testServerNameAdmin])
+        })
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200
+        fleet = response.json()["data"]["fleet"]
+        assert [node["server"] for node in fleet] == [
+            testServerName, testServerNameAdmin
+        ]
+        for node in fleet:
+            assert node["nodeId"] == "ns=2;i=3"
+            assert node["variable"] == {"value": 0, "dataType": "Int64"}
+            assert node["node"]["name"] == "VariableNodeNonWritable"
+            assert node["error"] is None
+
+    def test_fleet_errors(self):
+        offline = OPCUAServer("Offline", "opc.tcp://localhost:4999/")
+        getServers().append(offline)
+        try:
+            query = self.queryFleet.substitute({
+                "path": "0:Objects/2:Nonexistent",
+                "servers": json.dumps([testServerName])
+            })
+            response = client.post("/graphql/", json={"query": query})
+            node = response.json()["data"]["fleet"][0]
+            assert node["nodeId"] is None
+            assert "BadNoMatch" in node["error"]
+
+            query = self.queryFleet.substitute({
+                "path": "0:Objects/2:ObjectNode/2:VariableNodeNonWritable",
+                "servers": json.dumps(["Offline", testServerName])
+            })
+            response = client.post("/graphql/", json={"query": query})
+            fleet = response.json()["data"]["fleet"]
+            assert fleet[0]["error"] is not None
+            assert fleet[0]["variable"] is None
+            assert fleet[1]["variable"]["value"] == 0
+        finally:
+            getServers().remove(offline)
+
+
+class TestPathIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.queryNodeByPath = """
+            query {
+                a: nodeByPath(
+                    server: "%s",
+                    path: "0:Objects/2:ObjectNode/2:VariableNodeNonWritable"
+                ) { nodeId variable { value } }
+                b: nodeByPath(
+                    server: "%s",
+                    path: "0:Objects/2:ObjectNode/2:VariableNodeNonWritable"
+                ) { nodeId }
+                c: nodeByPath(
+                    server: "%s",
+                    path: "0:Objects/2:TestObject/2:CounterNode"
+                ) { nodeId }
+            }
+        """ % ((testServerName,) * 3)
+
+    def test_node_by_path(self):
+        server = getServer(testServerName)
+        server.modelVersion += 1
+        misses = server.pathIndex.misses
+        response = client.post("/graphql/", json={
+            "query": self.queryNodeByPath
+        })
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["a"] == {"nodeId": "ns=2;i=3", "variable": {"value": 0}}
+        assert data["b"]["nodeId"] == "ns=2;i=3"
+        assert data["c"]["nodeId"] == "ns=2;i=12"
+        assert server.pathIndex.misses == misses + 3
+        assert server.pathIndex.size == 2
+
+        hits = server.pathIndex.hits
+        response = client.post("/graphql/", json={
+            "query": self.queryNodeByPath
+        })
+        assert response.json()["data"] == data
+        assert server.pathIndex.hits == hits + 3
+        assert server.pathIndex.misses == misses + 3
+
+        # Model changes clear the index
+        server.modelVersion += 1
+        response = client.get("/values", params={
+            "server": testServerName,
+            "path": "0:Objects/2:TestObject/2:ArrayNode"
+        })
+        assert response.status_code == 200
+        assert response.json()["nodeIds"] == ["ns=2;i=11"]
+        assert server.pathIndex.size == 1
+
+    def test_path_not_found(self):
+        response = client.post("/graphql/", json={"query": """
+            query {
+                nodeByPath(server: "%s", path: "0:Objects/2:Nonexistent") {
+                    nodeId
+                }
+            }
+        """ % testServerName})
+        result = response.json()
+        assert result["data"]["nodeByPath"] is None
+        assert "BadNoMatch" in result["errors"][0]["message"]
+
+
+class TestNodeIdCache(unittest.TestCase):
+
+    def test_string_node_id_with_slash(self):
+        query = """
+            query {
+                node(server: "%s", nodeId: "ns=2;s=Line/1/Speed") {
+                    name
+                    variable { value }
+                }
+            }
+        """ % testServerName
+        response = client.post("/graphql/", json={"query": query})
+        assert response.status_code == 200, response.text
+        node = response.json()["data"]["node"]
+        assert node == {"name": "SlashNode", "variable": {"value": 7}}
+
+    def test_read_value_cache(self):
+        server = getServer(testServerName)
+        first = server.create_read_value("ns=2;i=3", "Value")
+        hits = server.readValueCache.hits
+        second = server.create_read_value("ns=2;i=3", "Value")
+        assert second is first
+        assert server.readValueCache.hits == hits + 1
+        assert server.create_read_value("ns=2;i=3", "Value", "0") is not first
+        assert server.parse_node_id("ns=2;i=3") is first.NodeId
+
+
+class TestChunking(unittest.TestCase):
+
+    def setUp(self):
+        self.server = getServer(testServerName)
+        self.nodeIds = [
+            "ns=2;i=2", "ns=2;i=3", "ns=2;i=11", "ns=2;i=12",
+            "ns=2;s=Line/1/Speed"
+        ]
+
+    def tearDown(self):
+        self.server.operationLimitOverrides = {}
+
+    def test_read_chunks(self):
+        params = {"server": testServerName, "nodeId": self.nodeIds}
+        unchunked = client.get("/values", params=params).json()
+
+        self.server.operationLimitOverrides = {"MaxNodesPerRead": 2}
+        requests, chunked, chunks = self.server.chunking["Read"]
+        response = client.get("/values", params=params)
+        assert response.status_code == 200
+        assert response.json()["values"] == unchunked["values"]
+        assert self.server.chunking["Read"] == [
+            requests + 1, chunked + 1, chunks + 3
+        ]
+
+        response = client.post("/graphql/", json={"query": """
+            query {
+                servers {
+                    name
+                    chunking { service operationLimit chunkedRequests }
+                }
+            }
+        """})
+        servers = response.json()["data"]["servers"]
+        chunking = [
+            server["chunking"] for server in servers
+            if server["name"] == testServerName
+        ][0]
+        assert chunking[0]["service"] == "Read"
+        assert chunking[0]["operationLimit"] == 2
+        assert chunking[0]["chunkedRequests"] >= 1
+
+    def test_chunks_over_queue_depth(self):
+        self.server.operationLimitOverrides = {"MaxNodesPerRead": 1}
+        nodeIds = self.nodeIds * (
+            self.server.admission.maxQueueDepth // len(self.nodeIds) + 2
+        )
+        assert len(nodeIds) > self.server.admission.maxQueueDepth + 4
+        results, readTime, queueTime = asyncio.new_event_loop(
+        ).run_until_complete(self.server.read_values(nodeIds))
+        assert len(results) == len(nodeIds)
+        assert all(result.StatusCode.is_good() for result in results)
+        assert self.server.admission.active == 0
+
+    def test_browse_chunks(self):
+        nodeIds = [
+            self.server.parse_node_id(nodeId)
+            for nodeId in ["i=85", "ns=2;i=1", "ns=2;i=10"]
+        ]
+        loop = asyncio.new_event_loop()
+        unchunked = loop.run_until_complete(
+            self.server.browse_children(nodeIds, useCache=False)
+        )
+        self.server.operationLimitOverrides = {"MaxNodesPerBrowse": 1}
+        chunks = self.server.chunking["Browse"][2]
+        references = loop.run_until_complete(
+            self.server.browse_children(nodeIds, useCache=False)
+        )
+        assert self.server.chunking["Browse"][2] == chunks + 3
+        assert [
+            [reference.NodeId for reference in nodeReferences]
+            for nodeReferences in references
+        ] == [
+            [reference.NodeId for reference in nodeReferences]
+            for nodeReferences in unchunked
+        ]
+        assert len(references[2]) == 2
+
+    def test_limits_read_on_connect(self):
+        assert list(self.server.operationLimits) == OPERATION_LIMITS
+        self.server.operationLimitOverrides = {"MaxNodesPerWrite": 0}
+        assert self.server.operation_limit("MaxNodesPerWrite") is None
+
+
+class TestSubNodeFilters(unittest.TestCase):
+
+    def query_sub_nodes(self, nodeId, arguments):
+        response = client.post("/graphql/", json={"query": """
+            query {
+                node(server: "%s", nodeId: "%s") {
+                    subNodes(%s) { name nodeClass }
+                }
+            }
+        """ % (testServerName, nodeId, arguments)})
+        return response.json()
+
+    def test_node_class(self):
+        server = getServer(testServerName)
+        reads = server.chunking["Read"][0]
+        result = self.query_sub_nodes("i=85", 'nodeClass: ["Variable"]')
+        subNodes = result["data"]["node"]["subNodes"]
+        assert {"name": "SlashNode", "nodeClass": "Variable"} in subNodes
+        assert all(node["nodeClass"] == "Variable" for node in subNodes)
+        # Names and node classes come from the browse results
+        assert server.chunking["Read"][0] == reads
+
+    def test_browse_name(self):
+        result = self.query_sub_nodes("i=85", 'browseName: "Test*"')
+        assert result["data"]["node"]["subNodes"] == [
+            {"name": "TestObject", "nodeClass": "Object"}
+        ]
+
+    def test_reference_type_and_direction(self):
+        result = self.query_sub_nodes(
+            "ns=2;i=10", 'referenceType: "HasComponent"'
+        )
+        names = [node["name"] for node in result["data"]["node"]["subNodes"]]
+        assert sorted(names) == ["ArrayNode", "CounterNode"]
+
+        result = self.query_sub_nodes(
+            "ns=2;i=11", 'browseDirection: "Inverse"'
+        )
+        assert result["data"]["node"]["subNodes"] == [
+            {"name": "TestObject", "nodeClass": "Object"}
+        ]
+
+    def test_unknown_node_class(self):
+        result = self.query_sub_nodes("i=85", 'nodeClass: ["Nothing"]')
+        assert "Unknown node class Nothing" in result["errors"][0]["message"]
+
+
+class TestBrowseCache(unittest.TestCase):
+
+    def sub_node_names(self, serverName, nodeId):
+        response = client.post("/graphql/", json={"query": """
+            query {
+                node(server: "%s", nodeId: "%s") {
+                    subNodes(browseName: "*") { name }
+                }
+            }
+        """ % (serverName, nodeId)})
+        subNodes = response.json()["data"]["node"]["subNodes"]
+        return [node["name"] for node in subNodes]
+
+    def test_repeated_browse(self):
+        server = getServer(testServerName)
+        self.sub_node_names(testServerName, "ns=2;i=10")
+        browses = server.chunking["Browse"][0]
+        hits = server.browseCache.hits
+        names = self.sub_node_names(testServerName, "ns=2;i=10")
+        assert sorted(names) == ["ArrayNode", "CounterNode"]
+        assert server.chunking["Browse"][0] == browses
+        assert server.browseCache.hits == hits + 1
+
+    def test_add_and_delete_node(self):
+        parentId = "ns=2;i=10"
+        assert "CacheNode" not in self.sub_node_names(
+            testServerNameAdmin, parentId
+        )
+        response = client.post("/graphql/", json={"query": """
+            mutation {
+                addNode(
+                    server: "%s", name: "CacheNode", nodeId: "ns=2;i=440",
+                    parentId: "%s"
+                ) { ok }
+            }
+        """ % (testServerNameAdmin, parentId)})
+        assert response.json()["data"]["addNode"]["ok"] is True
+        assert "CacheNode" in self.sub_node_names(
+            testServerNameAdmin, parentId
+        )
+        response = client.post("/graphql/", json={"query": """
+            mutation {
+                deleteNode(server: "%s", nodeId: "ns=2;i=440") { ok }
+            }
+        """ % testServerNameAdmin})
+        assert response.json()["data"]["deleteNode"]["ok"] is True
+        assert "CacheNode" not in self.sub_node_names(
+            testServerNameAdmin, parentId
+        )
+
+    def test_expiry(self):
+        server = getServer(testServerName)
+        ttl = server.browseCache.ttl
+        server.browseCache.ttl = 0
+        try:
+            self.sub_node_names(testServerName, "ns=2;i=10")
+            browses = server.chunking["Browse"][0]
+            self.sub_node_names(testServerName, "ns=2;i=10")
+            assert server.chunking["Browse"][0] == browses + 1
+        finally:
+            server.browseCache.ttl = ttl
+
+    def test_model_change_event(self):
+        opcuaServer = getServer(testServerName)
+        self.sub_node_names(testServerName, "ns=2;i=10")
+        assert opcuaServer.modelChangeEvents is True
+        version = opcuaServer.modelVersion
+        generator = server.get_event_generator(
+            ua.ObjectIds.GeneralModelChangeEventType
+        )
+        # Test server can't encode Changes with its data type
+        generator.event.Changes = []
+        generator.event.data_types["Changes"] = ua.VariantType.ExtensionObject
+        generator.trigger()
+        for i in range(50):
+            if opcuaServer.modelVersion != version:
+                break
+            time.sleep(0.02)
+        assert opcuaServer.modelVersion != version
+        browses = opcuaServer.chunking["Browse"][0]
+        self.sub_node_names(testServerName, "ns=2;i=10")
+        assert opcuaServer.chunking["Browse"][0] == browses + 1
+
+    def test_size_limit(self):
+        cache = BrowseCache(maxReferences=3)
+        cache.put("a", [1, 2])
+        cache.put("b", [3])
+        assert cache.get("a") == [1, 2]
+        cache.put("c", [4])
+        # b was least recently used
+        assert cache.get("b") is None
+        assert cache.references == 3
+        assert cache.evictions == 1
+        cache.put("d", [5, 6, 7, 8])
+        assert cache.get("d") is None
+
+
+class TestStructures(unittest.TestCase):
+
+    def test_structure_value(self):
+        response = client.post("/graphql/", json={"query": """
+            query {
+                node(server: "%s", nodeId: "ns=2;i=13") {
+                    variable { value dataType }
+                }
+            }
+        """ % testServerName})
+        variable = response.json()["data"]["node"]["variable"]
+        assert variable["dataType"] == "ExtensionObject"
+        assert variable["value"] == {
+            "Name": "Line 1", "Speed": 1.5, "Alarms": [3, 4]
+        }
+        assert "MachineStatus" in getServer(testServerName).structures
+
+    def test_values_endpoint(self):
+        response = client.get(
+            "/values?server=%s&nodeId=ns=2;i=13" % testServerName
+        )
+        assert response.json()["values"] == [
+            {"Name": "Line 1", "Speed": 1.5, "Alarms": [3, 4]}
+        ]
+
+    def test_same_names_on_servers(self):
+        def dictionaries(serverName):
+            dictionaries = copy.deepcopy(
+                getServer(testServerName).typeDictionaries
+            )
+            for dictionary in dictionaries:
+                dictionary["encodings"] = [
+                    [name, "ns=9;s=" + serverName + name]
+                    for name, nodeId in dictionary["encodings"]
+                ]
+            return dictionaries
+
+        first = create_structures("First", dictionaries("First"))
+        second = create_structures("Second", dictionaries("Second"))
+        assert first["MachineStatus"] is not second["MachineStatus"]
+        assert ua.First__MachineStatus is first["MachineStatus"]
+        assert ua.Second__MachineStatus is second["MachineStatus"]
+        value = first["MachineStatus"]()
+        value.Name = "Line 2"
+        assert type(pickle.loads(pickle.dumps(value))) is \
+            first["MachineStatus"]
+
+        # Names in opcua.ua not registered by the server are kept
+        ua.Clash__MachineStatus = ua.Argument
+        try:
+            assert create_structures("Clash", dictionaries("Clash")) == {}
+            assert ua.Clash__MachineStatus is ua.Argument
+        finally:
+            del ua.Clash__MachineStatus
+
+    def test_saved_dictionaries(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "Test.types.json")
+        try:
+            server = OPCUAServer(
+                "Structures", testServerEndpoint, typeDictionaryPath=path
+            )
+            server.connect()
+            server.client.disconnect()
+            assert os.path.exists(path)
+            assert "MachineStatus" in server.structures
+
+            def fail():
+                raise RuntimeError("Dictionaries read from server")
+
+            server = OPCUAServer(
+                "Structures", testServerEndpoint, typeDictionaryPath=path
+            )
+            server.read_type_dictionaries = fail
+            server.connect()
+            server.client.disconnect()
+            assert "MachineStatus" in server.structures
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestSearch(unittest.TestCase):
+
+    def search(self, arguments):
+        response = client.post("/graphql/", json={"query": """
+            query {
+                search(server: "%s", %s) {
+                    name
+                    nodeClass
+                    path
+                    node { nodeId }
+                }
+            }
+        """ % (testServerName, arguments)})
+        assert response.status_code == 200, response.text
+        return response.json()["data"]["search"]
+
+    def test_search(self):
+        results = self.search('text: "counternode"')
+        assert results[0] == {
+            "name": "CounterNode",
+            "nodeClass": "Variable",
+            "path": "0:Objects/2:TestObject/2:CounterNode",
+            "node": {"nodeId": "ns=2;i=12"}
+        }
+
+        server = getServer(testServerName)
+        assert server.pathIndex.get(
+            ((0, "Objects"), (2, "TestObject"), (2, "ArrayNode"))
+        ) == "ns=2;i=11"
+
+    def test_prefix_and_substring(self):
+        assert self.search('text: "ounternode"') == []
+        results = self.search('text: "ounternode", substring: true')
+        assert [result["name"] for result in results] == ["CounterNode"]
+
+    def test_node_class_and_limit(self):
+        results = self.search(
+            'text: "objects testobject", nodeClass: ["Variable"]'
+        )
+        assert sorted(result["name"] for result in results) == [
+            "ArrayNode", "CounterNode"
+        ]
+        assert len(self.search('text: "server", limit: 3')) == 3
+
+    def test_index_status(self):
+        self.search('text: "counter"')
+        response = client.post("/graphql/", json={"query": """
+            query {
+                servers { name searchIndex { nodes words crawling } }
+            }
+        """})
+        status = [
+            server["searchIndex"]
+            for server in response.json()["data"]["servers"]
+            if server["name"] == testServerName
+        ][0]
+        assert status["nodes"] > 100
+        assert status["words"] > 100
+
+    def test_ranking(self):
+        index = SearchIndex()
+        index.add(SearchEntry("a", "Speed Limit", "SpeedLimit", None,
+                              "1:Line/1:SpeedLimit", 2))
+        index.add(SearchEntry("b", "Speed", "Speed", "Line speed",
+                              "1:Line/1:Motor/1:Speed", 2))
+        index.add(SearchEntry("c", "Motor", "Motor", None,
+                              "1:Line/1:Motor", 1))
+        assert [e.nodeId for e in index.search("speed")] == ["b", "a"]
+        assert [e.nodeId for e in index.search("motor")] == ["c", "b"]
+        assert [e.nodeId for e in index.search("motor", 1)] == ["c"]
+        assert [e.nodeId for e in index.search("line sp")] == ["a", "b"]
+
+
+class ModelChangeEvent(object):
+
+    def __init__(self, changes):
+        self.Changes = changes
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "Snapshot.sqlite")
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.client.disconnect()
+        shutil.rmtree(self.directory)
+
+    def create_server(self):
+        server = OPCUAServer(
+            "Snapshot", testServerEndpoint, snapshotPath=self.path
+        )
+        self.servers.append(server)
+        return server
+
+    def test_save_and_load(self):
+        loop = asyncio.new_event_loop()
+        crawled = loop.run_until_complete(self.create_server().crawl())
+        assert os.path.exists(self.path)
+
+        server = self.create_server()
+        index = loop.run_until_complete(server.get_search_index())
+        assert server.snapshotChecked is True
+        assert server.crawlTask is None
+        assert len(index) == len(crawled)
+        assert index.children == crawled.children
+        assert [e.nodeId for e in index.search("counternode")] == [
+            "ns=2;i=12"
+        ]
+        assert server.indexed_attribute(
+            "ns=2;i=12", "DisplayName"
+        ).Value.Value.Text == "CounterNode"
+        assert server.data_type_to_variant_type(
+            ua.NodeId(ua.ObjectIds.Duration)
+        ) == ua.VariantType.Double
+        assert server.pathIndex.get(
+            ((0, "Objects"), (2, "TestObject"), (2, "CounterNode"))
+        ) == "ns=2;i=12"
+        assert sorted(
+            entry.displayName
+            for entry in server.indexed_children("ns=2;i=10")
+        ) == ["ArrayNode", "CounterNode"]
+        assert server.indexed_children("ns=2;i=12") == []
+
+    def test_outdated_index(self):
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self.create_server().crawl())
+        wrapper = self.create_server()
+        loop.run_until_complete(wrapper.get_search_index())
+
+        # Added by another client, not seen by the wrapper
+        node = server.get_node("ns=2;i=10").add_variable(
+            "ns=2;s=OutsideNode", "2:OutsideNode", 1
+        )
+        try:
+            assert "ns=2;s=OutsideNode" not in [
+                entry.nodeId
+                for entry in wrapper.indexed_children("ns=2;i=10")
+            ]
+            # Too old to be served from the index
+            wrapper.searchIndex.createdAt -= datetime.timedelta(
+                seconds=wrapper.indexTtl
+            )
+            assert wrapper.indexed_children("ns=2;i=10") is None
+            assert wrapper.indexed_attribute(
+                "ns=2;i=12", "DisplayName"
+            ) is None
+            nodeId = loop.run_until_complete(
+                wrapper.get_node_id("ns=2;i=10")
+            )
+            assert "ns=2;s=OutsideNode" in [
+                reference.NodeId.to_string()
+                for reference in loop.run_until_complete(
+                    wrapper.get_children(nodeId)
+                )
+            ]
+            # Unless the server has sent model change events
+            wrapper.modelChangeEventsSeen = True
+            assert wrapper.indexed_children("ns=2;i=10") is not None
+        finally:
+            server.delete_nodes([node])
+
+    def test_model_change_recrawl(self):
+        loop = asyncio.new_event_loop()
+        wrapper = self.create_server()
+        index = loop.run_until_complete(wrapper.crawl())
+        browsed = []
+        browse = wrapper.browse_children
+
+        async def record_browse(nodeIds, **kwargs):
+            browsed.extend(nodeId.to_string() for nodeId in nodeIds)
+            return await browse(nodeIds, **kwargs)
+
+        wrapper.browse_children = record_browse
+        node = server.get_node("ns=2;i=10").add_variable(
+            "ns=2;s=EventNode", "2:EventNode", 1
+        )
+        try:
+            change = ua.ModelChangeStructureDataType()
+            change.Affected = node.nodeid
+            wrapper.event_notification(ModelChangeEvent([change]))
+            recrawled = loop.run_until_complete(wrapper.crawl())
+            # Only the subtree of the parent of the added node
+            assert set(browsed) == {
+                "ns=2;s=EventNode", "ns=2;i=10", "ns=2;i=11", "ns=2;i=12"
+            }
+            assert len(recrawled) == len(index) + 1
+            assert recrawled.get("ns=2;s=EventNode").path == \
+                index.get("ns=2;i=12").path.replace("Counter", "Event")
+            assert "ns=2;s=EventNode" in [
+                entry.nodeId for entry in recrawled.get_children("ns=2;i=10")
+            ]
+            assert recrawled.children["i=85"] == index.children["i=85"]
+            loaded = loop.run_until_complete(
+                self.create_server().get_search_index()
+            )
+            assert loaded.get("ns=2;s=EventNode") is not None
+
+            # Events without affected nodes crawl everything again
+            browsed.clear()
+            wrapper.event_notification(ModelChangeEvent(None))
+            loop.run_until_complete(wrapper.crawl())
+            assert "i=85" in browsed
+        finally:
+            server.delete_nodes([node])
+
+    def test_outdated_snapshot(self):
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(self.create_server().crawl())
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "UPDATE meta SET value = '2000-01-01T00:00:00' "
+            "WHERE key = 'startTime'"
+        )
+        connection.commit()
+        connection.close()
+
+        server = self.create_server()
+        assert loop.run_until_complete(server.load_snapshot()) is False
+        assert server.searchIndex is None
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def test_warm_up(self):
+        server = getServer(testServerName)
+        server.namespaceArray = None
+        server.dataTypes = None
+        results = asyncio.new_event_loop().run_until_complete(
+            warmUpServers(5, [server])
+        )
+        assert results == {testServerName: None}
+        assert "http://examples.freeopcua.github.io" in server.namespaceArray
+        assert list(server.operationLimits) == OPERATION_LIMITS
+        duration = ua.NodeId(ua.ObjectIds.Duration)
+        assert duration in server.dataTypes
+        assert server.data_type_to_variant_type(duration) == \
+            ua.VariantType.Double
+        assert server.data_type_to_variant_type(
+            ua.NodeId(ua.ObjectIds.ServerState)
+        ) == ua.VariantType.Int32
+
+    def test_warm_up_unreachable(self):
+        server = OPCUAServer("Unreachable", "opc.tcp://localhost:4999/")
+        results = asyncio.new_event_loop().run_until_complete(
+            warmUpServers(0.5, [server])
+        )
+        assert results["Unreachable"] is not None
+
+    def test_cancelled_warm_up(self):
+        class SlowServer(object):
+            name = "Slow"
+
+            async def warm_up(self):
+                await asyncio.sleep(10)
+
+        errors = []
+        loop = asyncio.new_event_loop()
+        loop.set_exception_handler(lambda loop, context: errors.append(
+            context
+        ))
+        try:
+            results = loop.run_until_complete(
+                warmUpServers(0.01, [SlowServer()])
+            )
+            assert results == {"Slow": "Warm-up timed out"}
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.sleep(0.01))
+            assert errors == []
+        finally:
+            loop.close()
+
+    def test_ready(self):
+        with TestClient(app) as startedClient:
+            response = startedClient.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
+
+
+class TestSharding(unittest.TestCase):
+
+    def test_owner_of(self):
+        names = ["Server" + str(i) for i in range(100)]
+        owners = [ownerOf(name, 4) for name in names]
+        assert owners == [ownerOf(name, 4) for name in names]
+        assert set(owners) == {0, 1, 2, 3}
+        # Only servers moving to the added worker change owner
+        for name, owner in zip(names, owners):
+            assert ownerOf(name, 5) in (owner, 4)
+
+    def test_claim_slot(self):
+        directory = tempfile.mkdtemp()
+        try:
+            first, firstLock = claimSlot(directory, 2)
+            second, secondLock = claimSlot(directory, 2)
+            assert (first, second) == (0, 1)
+            assert claimSlot(directory, 2) == (None, None)
+            firstLock.close()
+            slot, lock = claimSlot(directory, 2)
+            assert slot == 0
+            lock.close()
+            secondLock.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_claim_slot_private_directory(self):
+        directory = tempfile.mkdtemp()
+        link = directory + "-link"
+        try:
+            os.chmod(directory, 0o755)
+            with self.assertRaises(PermissionError):
+                claimSlot(directory, 1)
+            os.chmod(directory, 0o700)
+            os.symlink(directory, link)
+            with self.assertRaises(PermissionError):
+                claimSlot(link, 1)
+            slot, lock = claimSlot(directory, 1)
+            assert slot == 0
+            lock.close()
+        finally:
+            os.remove(link)
+            shutil.rmtree(directory)
+
+    def test_forwarded_calls(self):
+        directory = tempfile.mkdtemp()
+        loop = asyncio.new_event_loop()
+        shardClient = opcuautils.shardClient
+        opcuautils.shardClient = ShardClient(directory)
+        try:
+            socketServer = loop.run_until_complete(
+                serve(directory, 0, handleForwarded)
+            )
+            proxy = OPCUAServer(testServerName, testServerEndpoint)
+            proxy.owner = 0
+
+            results, readTime, queueTime = loop.run_until_complete(
+                proxy.read_values(["ns=2;i=12", "ns=2;i=13"])
+            )
+            assert isinstance(results[0].Value.Value, int)
+            assert encode_value(results[1].Value)["Name"] == "Line 1"
+            nodeId = loop.run_until_complete(proxy.get_node_id("ns=2;i=10"))
+            children = loop.run_until_complete(proxy.get_children(nodeId))
+            assert sorted(
+                child.BrowseName.Name for child in children
+            ) == ["ArrayNode", "CounterNode"]
+            # No session of its own
+            assert not proxy.is_connected()
+
+            # Data type of a value without one is found by the owner
+            ok, writeTime, queueTime = loop.run_until_complete(
+                proxy.set_node_attribute("ns=2;i=2", "Value", 5)
+            )
+            assert ok
+            results, writeTime, queueTime = loop.run_until_complete(
+                proxy.write_attributes([("ns=2;i=2", "Value", 0, None, None)])
+            )
+            assert results[0].is_good()
+            assert server.get_node("ns=2;i=2").get_value() == 0
+
+            version = proxy.modelVersion
+            getServer(testServerName).model_changed()
+            loop.run_until_complete(proxy.read_values(["ns=2;i=12"]))
+            assert proxy.modelVersion != version
+
+            with self.assertRaises(ValueError):
+                loop.run_until_complete(proxy.call_owner("connect"))
+            opcuautils.shardClient.close()
+            socketServer.close()
+            loop.run_until_complete(socketServer.wait_closed())
+            loop.run_until_complete(asyncio.sleep(0.05))
+        finally:
+            opcuautils.shardClient = shardClient
+            loop.close()
+            shutil.rmtree(directory)
+
+
+def readSharedValues(name, reads, results):
+    table = SharedValueTable(name)
+    torn = 0
+    for i in range(reads):
+        dataValue = table.get("ns=2;i=11")
+        if dataValue is not None and len(set(dataValue.Value.Value)) != 1:
+            torn += 1
+    results.put((torn, table.hits))
+    table.close()
+
+
+class TestSharedValues(unittest.TestCase):
+
+    def test_table(self):
+        name = "opcua-graphql-test-" + str(os.getpid())
+        writer = SharedValueTable(name, 16, create=True)
+        try:
+            reader = SharedValueTable(name)
+            dataValue = ua.DataValue(ua.Variant(1.5, ua.VariantType.Double))
+            dataValue.SourceTimestamp = datetime.datetime(2020, 1, 2, 3, 4)
+            assert writer.put("ns=2;i=12", dataValue)
+            value = reader.get("ns=2;i=12")
+            assert value.Value == dataValue.Value
+            assert value.SourceTimestamp == dataValue.SourceTimestamp
+            assert value.StatusCode.is_good()
+            assert reader.get("ns=2;i=99") is None
+            # Too large for a slot, read from the owner instead
+            assert writer.put("ns=2;s=Large", ua.DataValue(
+                ua.Variant([0.0] * 100, ua.VariantType.Double)
+            ))
+            assert reader.get("ns=2;s=Large") is None
+            assert reader.overflows == 1
+            assert len(reader) == 2
+
+            # Same layout is reused but cleared, another layout replaces it
+            writer.close()
+            writer = SharedValueTable(name, 16, create=True)
+            assert reader.valid and reader.get("ns=2;i=12") is None
+            writer.close()
+            writer = SharedValueTable(name, 32, create=True)
+            assert not reader.valid
+            reader.close()
+
+            # Readers in other processes never see partial writes
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=readSharedValues, args=(name, 20000, results)
+            )
+            process.start()
+            i = 0
+            while process.is_alive() and i < 1000000:
+                writer.put("ns=2;i=11", ua.DataValue(
+                    ua.Variant([float(i)] * 16, ua.VariantType.Double)
+                ))
+                i += 1
+            torn, hits = results.get(timeout=10)
+            process.join()
+            assert torn == 0
+            assert hits > 0
+        finally:
+            writer.unlink()
+            writer.close()
+
+    def test_owner_values(self):
+        directory = tempfile.mkdtemp()
+        socketDirectory = opcuautils.shardSocketDirectory
+        shardClient = opcuautils.shardClient
+        opcuautils.shardSocketDirectory = directory
+        opcuautils.shardClient = ShardClient(directory)
+        loop = asyncio.new_event_loop()
+        owner = getServer(testServerName)
+        owner.sharedValues = SharedValueTable(
+            opcuautils.sharedValuesName(owner.name), 100, create=True
+        )
+        try:
+            proxy = OPCUAServer(
+                testServerName, testServerEndpoint, sharedValueSlots=100
+            )
+            proxy.owner = 0
+            server.get_node("ns=2;i=12").set_value(41)
+            loop.run_until_complete(owner.read_values(["ns=2;i=12"], True))
+            for i in range(50):
+                if proxy.subscribed_value("ns=2;i=12") is not None:
+                    break
+                time.sleep(0.1)
+
+            # Read from the table of the owner, not forwarded
+            results, readTime, queueTime = loop.run_until_complete(
+                proxy.read_values(["ns=2;i=12"], True)
+            )
+            assert results[0].Value.Value == 41
+            assert readTime == 0
+            assert opcuautils.shardClient.calls == 0
+
+            server.get_node("ns=2;i=12").set_value(42)
+            for i in range(50):
+                value = proxy.subscribed_value("ns=2;i=12")
+                if value.Value.Value == 42:
+                    break
+                time.sleep(0.1)
+            assert value.Value.Value == 42
+            proxy.sharedValues.close()
+        finally:
+            owner.sharedValues.unlink()
+            owner.sharedValues.close()
+            owner.sharedValues = None
+            opcuautils.shardSocketDirectory = socketDirectory
+            opcuautils.shardClient = shardClient
+            loop.close()
+            shutil.rmtree(directory)
+
+
+class TestIOWorkers(unittest.TestCase):
+
+    def test_worker(self):
+        worker = IOWorker("Test", 1)
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(worker.run(sum, [1, 2])) == 3
+            assert worker.calls == 1 and worker.latency >= 0
+            assert worker.healthy
+
+            def fail():
+                raise ValueError("Unreachable")
+
+            for i in range(3):
+                with self.assertRaises(ValueError):
+                    loop.run_until_complete(worker.run(fail))
+            assert worker.failures == 3
+            assert worker.lastError == "Unreachable"
+            assert not worker.healthy
+            loop.run_until_complete(worker.run(time.sleep, 0.01))
+            assert worker.healthy
+            assert worker.maxLatency >= 10
+
+            # Calls over the number of threads wait in the queue
+            release = threading.Event()
+            blocked = [
+                asyncio.ensure_future(worker.run(release.wait), loop=loop)
+                for i in range(3)
+            ]
+            loop.run_until_complete(asyncio.sleep(0.05))
+            assert worker.active == 1 and worker.queued == 2
+            release.set()
+            loop.run_until_complete(asyncio.gather(*blocked))
+            assert worker.active == 0 and worker.queued == 0
+        finally:
+            worker.shutdown()
+            loop.close()
+
+    def test_isolated_servers(self):
+        slowWorker = IOWorker("Slow", 2)
+        release = threading.Event()
+        loop = asyncio.new_event_loop()
+        server = getServer(testServerName)
+        server.ioWorker = IOWorker(testServerName, 2)
+        try:
+            # Busy threads of another server don't delay this server
+            blocked = [
+                asyncio.ensure_future(slowWorker.run(release.wait), loop=loop)
+                for i in range(8)
+            ]
+            results, readTime, queueTime = loop.run_until_complete(
+                asyncio.wait_for(server.read_values(["ns=2;i=12"]), 2)
+            )
+            assert results[0].StatusCode.is_good()
+            assert server.ioWorker.calls >= 1
+            assert slowWorker.queued == 6
+
+            response = client.post("/graphql/", json={"query": """
+                query {
+                    servers {
+                        name
+                        ioWorker { name threads calls healthy latency }
+                    }
+                }
+            """})
+            workers = {
+                server["name"]: server["ioWorker"]
+                for server in response.json()["data"]["servers"]
+            }
+            assert workers[testServerName]["name"] == testServerName
+            assert workers[testServerName]["threads"] == 2
+            assert workers[testServerName]["healthy"] is True
+            assert workers[testServerName]["calls"] >= 1
+            release.set()
+            loop.run_until_complete(asyncio.gather(*blocked))
+        finally:
+            release.set()
+            server.ioWorker.shutdown()
+            server.ioWorker = None
+            slowWorker.shutdown()
+            loop.close()
+
+
+class TestDeadlines(unittest.TestCase):
+
+    def setUp(self):
+        # Calls to the server wait behind a call that doesn't return
+        self.server = getServer(testServerName)
+        self.server.ioWorker = IOWorker("Blocked", 1)
+        self.release = threading.Event()
+        self.server.ioWorker.executor.submit(self.release.wait)
+
+    def tearDown(self):
+        self.release.set()
+        self.server.ioWorker.shutdown()
+        self.server.ioWorker = None
+
+    def test_within_deadline(self):
+        assert latest_deadline([1.0, 3.0, 2.0]) == 3.0
+        assert latest_deadline([1.0, None]) is None
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(within_deadline(
+                asyncio.sleep(0, "done")
+            )) == "done"
+            requestDeadline.set(time.monotonic() + 0.05)
+            sleep = asyncio.ensure_future(asyncio.sleep(5), loop=loop)
+            with self.assertRaises(DeadlineExceeded):
+                loop.run_until_complete(within_deadline(sleep))
+            assert sleep.cancelled()
+        finally:
+            requestDeadline.set(None)
+            loop.close()
+
+    def test_partial_results(self):
+        query = """
+            query {
+                blocked: node(server: "%s", nodeId: "ns=2;i=12") {
+                    variable { value }
+                }
+                other: node(server: "%s", nodeId: "ns=2;i=12") {
+                    variable { value }
+                }
+            }
+        """ % (testServerName, testServerNameAdmin)
+        # Connected before, so only the blocked server is slow
+        client.get("/values", params={
+            "server": testServerNameAdmin, "nodeId": "ns=2;i=12"
+        })
+        start = time.monotonic()
+        response = client.post(
+            "/graphql/", json={"query": query},
+            headers={"X-Timeout-Ms": "300"}
+        )
+        assert time.monotonic() - start < 1.5
+        assert response.status_code == 200
+        result = response.json()
+        assert result["data"]["blocked"]["variable"] is None
+        assert isinstance(result["data"]["other"]["variable"]["value"], int)
+        assert result["errors"][0]["path"] == ["blocked", "variable"]
+        assert "Deadline" in result["errors"][0]["message"]
+
+        response = client.post("/graphql/", json={
+            "query": query, "extensions": {"timeoutMs": 100}
+        })
+        assert response.status_code == 200
+        assert response.json()["data"]["blocked"]["variable"] is None
+
+        response = client.post(
+            "/graphql/", json={"query": query},
+            headers={"X-Timeout-Ms": "soon"}
+        )
+        assert response.status_code == 400
+
+    def test_values_deadline(self):
+        response = client.get(
+            "/values", params={"server": testServerName, "nodeId": "i=2255"},
+            headers={"X-Timeout-Ms": "100"}
+        )
+        assert response.status_code == 504
+        # Admission of cancelled calls is released once they're done
+        self.release.set()
+        response = client.get(
+            "/values", params={"server": testServerName, "nodeId": "i=2255"}
+        )
+        assert response.status_code == 200
+        assert self.server.admission.active <= 1
+
+
+class TestRedundancy(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Backup with the same namespaces and a different counter value
+        cls.backupEndpoint = "opc.tcp://localhost:4841/freeopcua/server/"
+        cls.backupServer = Server()
+        cls.backupServer.set_endpoint(cls.backupEndpoint)
+        idx = cls.backupServer.register_namespace(
+            "http://examples.freeopcua.github.io"
+        )
+        cls.backupServer.get_objects_node().add_variable(
+            ua.NodeId(12, idx), "2:CounterNode", -1
+        )
+        cls.backupServer.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backupServer.stop()
+
+    def connect_backups(self, server, loop):
+        async def connect():
+            server.keep_backups()
+            for backup in server.redundancy.backups:
+                if backup.connectTask is not None:
+                    await backup.connectTask
+
+        loop.run_until_complete(connect())
+
+    def disconnect(self, server):
+        if server.is_connected():
+            server.client.disconnect()
+        for backup in server.redundancy.backups:
+            backup.disconnect()
+
+    def test_failover(self):
+        server = OPCUAServer(
+            "Redundant", "opc.tcp://localhost:4849/",
+            backupEndPointAddresses=[self.backupEndpoint]
+        )
+        loop = asyncio.new_event_loop()
+        try:
+            self.connect_backups(server, loop)
+            assert server.redundancy.backups[0].is_connected()
+            results, readTime, queueTime = loop.run_until_complete(
+                server.read_values(["ns=2;i=12"])
+            )
+            assert results[0].Value.Value == -1
+            redundancy = server.redundancy
+            assert redundancy.failovers == 1
+            assert redundancy.lastFailoverTime > 0
+            assert redundancy.primary_down()
+
+            # Reads go straight to the backup while the primary is down
+            results, readTime, queueTime = loop.run_until_complete(
+                server.read_values(["ns=2;i=12"])
+            )
+            assert results[0].Value.Value == -1
+            assert redundancy.failovers == 1
+            assert redundancy.backupReads == 1
+        finally:
+            self.disconnect(server)
+            loop.close()
+
+    def test_hedged_read(self):
+        server = OPCUAServer(
+            "Hedged", testServerEndpoint, maxConcurrentRequests=1,
+            backupEndPointAddresses=[self.backupEndpoint],
+            discoverRedundantServers=True, hedgeReads=True, hedgeDelay=0.05
+        )
+        loop = asyncio.new_event_loop()
+        getServers().append(server)
+        try:
+            loop.run_until_complete(server.warm_up())
+            self.connect_backups(server, loop)
+            # The fixture server has no ServerUriArray to discover from
+            assert len(server.redundancy.backups) == 1
+            results, readTime, queueTime = loop.run_until_complete(
+                server.read_values(["ns=2;i=12"])
+            )
+            assert results[0].Value.Value >= 0
+            assert server.redundancy.hedgedReads == 0
+
+            # Reads of the primary wait behind a call that holds the
+            # only slot, so the backup answers first
+            loop.run_until_complete(server.admission.acquire(VALUE_READ))
+            results, readTime, queueTime = loop.run_until_complete(
+                server.read_values(["ns=2;i=12"])
+            )
+            assert results[0].Value.Value == -1
+            assert server.redundancy.hedgedReads == 1
+            assert server.redundancy.hedgeWins == 1
+            assert server.redundancy.failovers == 0
+            server.admission.release()
+
+            response = client.post("/graphql/", json={"query": """
+                query {
+                    servers {
+                        name
+                        redundancy {
+                            backups { endPointAddress connected }
+                            hedgeDelay hedgedReads hedgeWins primaryDown
+                        }
+                    }
+                }
+            """})
+            redundancy = {
+                server["name"]: server["redundancy"]
+                for server in response.json()["data"]["servers"]
+            }
+            assert redundancy[testServerName] is None
+            assert redundancy["Hedged"]["backups"] == [{
+                "endPointAddress": self.backupEndpoint, "connected": True
+            }]
+            assert redundancy["Hedged"]["hedgeDelay"] == 50
+            assert redundancy["Hedged"]["hedgeWins"] == 1
+            assert redundancy["Hedged"]["primaryDown"] is False
+        finally:
+            getServers().remove(server)
+            self.disconnect(server)
+            loop.close()
+
+    def test_cancelled_backup_read(self):
+        release = threading.Event()
+
+        class SlowBackup(object):
+            def read(self, params, limit=None):
+                release.wait()
+                return []
+
+        server = OPCUAServer("Slow", "opc.tcp://localhost:4849/")
+        server.ioWorker = IOWorker("Slow", 1)
+        loop = asyncio.new_event_loop()
+        try:
+            read = asyncio.ensure_future(
+                server.read_backup(SlowBackup(), ua.ReadParameters()),
+                loop=loop
+            )
+            loop.run_until_complete(asyncio.sleep(0.05))
+            read.cancel()
+            loop.run_until_complete(asyncio.sleep(0.01))
+            # The cancelled read still runs in the worker
+            assert server.ioWorker.pending == 1
+            release.set()
+            while server.ioWorker.pending > 0:
+                loop.run_until_complete(asyncio.sleep(0.01))
+            assert server.ioWorker.calls == 1
+            assert server.ioWorker.latency >= 50
+        finally:
+            release.set()
+            server.ioWorker.shutdown()
+            loop.close()
+
+    def test_hedge_delay(self):
+        redundancy = Redundancy([])
+        assert redundancy.hedge_delay() == HEDGE_DELAY
+        for latency in range(1, 101):
+            redundancy.add_latency(latency * 1000000)
+        assert redundancy.hedge_delay() == 0.096
+        assert redundancy.add_backup("opc.tcp://a/") is not None
+        assert redundancy.add_backup("opc.tcp://a/") is None
+
+
 if __name__ == "__main__":
     logging.disable(logging.CRITICAL)
 
@@ -772,6 +2944,37 @@ if __name__ == "__main__":
     var = obj.add_variable(idx, "VariableNode", 0)
     var.set_writable()
     obj.add_variable(idx, "VariableNodeNonWritable", 0)
+    objects.add_variable("ns=2;s=Line/1/Speed", "2:SlashNode", 7)
+
+    testObj = objects.add_object("ns=2;i=10", "2:TestObject")
+    arrayVar = testObj.add_variable(
+        "ns=2;i=11", "2:ArrayNode", [float(i) for i in range(10)]
+    )
+    arrayVar.set_writable()
+    counterVar = testObj.add_variable("ns=2;i=12", "2:CounterNode", 0)
+    counterVar.set_writable()
+
+    # Custom structure, value set encoded so the server needs no class
+    typeDictionary = DataTypeDictionaryBuilder(
+        server, idx, uri, "TestDictionary"
+    )
+    statusType = typeDictionary.create_data_type("MachineStatus")
+    statusType.add_field("Name", ua.VariantType.String)
+    statusType.add_field("Speed", ua.VariantType.Double)
+    statusType.add_field("Alarms", ua.VariantType.UInt32, True)
+    typeDictionary.set_dict_byte_string()
+    status = ua.ExtensionObject()
+    status.TypeId = statusType.node_ids[2]
+    status.Body = (
+        Primitives.String.pack("Line 1") + Primitives.Double.pack(1.5)
+        + Primitives.Int32.pack(2) + Primitives.UInt32.pack(3)
+        + Primitives.UInt32.pack(4)
+    )
+    objects.add_variable(
+        "ns=2;i=13", "2:StatusNode",
+        ua.Variant(status, ua.VariantType.ExtensionObject),
+        datatype=statusType.data_type
+    )
 
     queryAddServer = Template("""
         mutation {
@@ -790,6 +2993,7 @@ if __name__ == "__main__":
 
     try:
         print("Starting OPC UA server")
+        supportIndexRanges(server.iserver.attribute_service)
         server.start()
 
         print("Setting up test OPC UA servers")
@@ -0,0 +1,230 @@
+"""
+In-memory time series of subscribed OPC UA variables:
+    - Fixed capacity ring buffers backed by typed arrays.
+    - Per server store that caps and accounts buffer memory.
+    - Vectorized aggregates over buffered and current values.
+"""
+
+from array import array
+from bisect import bisect_left
+import datetime
+import threading
+import time
+import numpy
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Reductions of the supported aggregate functions
+REDUCERS = {
+    "min": numpy.minimum,
+    "max": numpy.maximum,
+    "sum": numpy.add,
+    "mean": numpy.add,
+    "count": None,
+}
+
+
+def to_epoch(timestamp):
+    """
+    Converts a naive UTC datetime (as returned by python-opcua)
+    into POSIX seconds.
+    """
+
+    return (timestamp - EPOCH).total_seconds()
+
+
+def from_epoch(seconds):
+    """
+    Converts POSIX seconds into a naive UTC datetime.
+    """
+
+    return EPOCH + datetime.timedelta(seconds=seconds)
+
+
+class RingBuffer(object):
+    """
+    Fixed capacity buffer of (timestamp, value) samples.
+
+    Timestamps (POSIX seconds) and values are stored in two preallocated
+    arrays of doubles, so the memory used by a buffer is fixed when it
+    is created. When full, the oldest sample is overwritten.
+    Samples are expected to arrive in timestamp order.
+    """
+
+    itemSize = 2 * array("d").itemsize
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array("d", [0.0]) * capacity
+        self.values = array("d", [0.0]) * capacity
+        self.start = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.capacity * self.itemSize
+
+    def append(self, timestamp, value):
+        with self.lock:
+            end = (self.start + self.count) % self.capacity
+            self.timestamps[end] = timestamp
+            self.values[end] = value
+            if self.count < self.capacity:
+                self.count += 1
+            else:
+                self.start = (self.start + 1) % self.capacity
+
+    def window(self, since=None):
+        """
+        Returns buffered samples in chronological order as two arrays
+        (timestamps, values). If since is given, only samples with
+        timestamp >= since are returned.
+        """
+
+        with self.lock:
+            end = self.start + self.count
+            if end <= self.capacity:
+                timestamps = self.timestamps[self.start:end]
+                values = self.values[self.start:end]
+            else:
+                end -= self.capacity
+                timestamps = self.timestamps[self.start:] + \
+                    self.timestamps[:end]
+                values = self.values[self.start:] + self.values[:end]
+
+        if since is not None:
+            first = bisect_left(timestamps, since)
+            timestamps = timestamps[first:]
+            values = values[first:]
+        return timestamps, values
+
+
+class TimeSeriesStore(object):
+    """
+    Ring buffers of one OPC UA server, keyed by node id string.
+
+    Every buffer has the same capacity. New buffers are refused once
+    their preallocated memory would exceed memoryLimit (bytes).
+    Only numeric and boolean values are buffered.
+    """
+
+    def __init__(self, capacity, memoryLimit=8 * 1024 * 1024):
+        self.capacity = capacity
+        self.memoryLimit = memoryLimit
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    @property
+    def memoryUsed(self):
+        return len(self.buffers) * self.capacity * RingBuffer.itemSize
+
+    def get_buffer(self, nodeId, create=False):
+        """
+        Returns buffer of the node. If create is True, a missing buffer
+        is created when the memory limit allows it, otherwise None is
+        returned.
+        """
+
+        buffer = self.buffers.get(nodeId)
+        if buffer is not None or not create:
+            return buffer
+
+        with self.lock:
+            buffer = self.buffers.get(nodeId)
+            if buffer is None:
+                size = self.capacity * RingBuffer.itemSize
+                if self.memoryUsed + size > self.memoryLimit:
+                    return None
+                buffer = RingBuffer(self.capacity)
+                self.buffers[nodeId] = buffer
+        return buffer
+
+    def append(self, nodeId, dataValue):
+        """
+        Appends the value of a DataValue to the node's buffer.
+        Uses the source timestamp of the value, or arrival time if the
+        server does not provide one.
+        """
+
+        value = dataValue.Value.Value
+        if not isinstance(value, (bool, int, float)):
+            return False
+
+        buffer = self.get_buffer(nodeId, create=True)
+        if buffer is None:
+            return False
+
+        if dataValue.SourceTimestamp is not None:
+            timestamp = to_epoch(dataValue.SourceTimestamp)
+        else:
+            timestamp = time.time()
+        buffer.append(timestamp, value)
+        return True
+
+    def recent(self, nodeId, window=None):
+        """
+        Returns samples of the node from the last window seconds
+        as (timestamps, values) arrays. Whole buffer if no window given.
+        """
+
+        buffer = self.get_buffer(nodeId)
+        if buffer is None:
+            return array("d"), array("d")
+
+        since = None if window is None else time.time() - window
+        return buffer.window(since)
+
+    def clear(self):
+        with self.lock:
+            self.buffers.clear()
+
+
+def aggregate(series, function):
+    """
+    Computes an aggregate over a list of value arrays (one per node).
+    Arrays are joined into one contiguous buffer and reduced with
+    numpy, both in total and per array.
+
+    Arguments                               Example
+    series:     Arrays of doubles           [array("d", [1.0, 2.0])]
+    function:   Aggregate function          "mean"
+
+    Results
+    value:      Aggregate of all values     1.5
+    count:      Number of values            2
+    nodeValues: Aggregate of each array     [1.5]
+    nodeCounts: Number of values per array  [2]
+    """
+
+    if function not in REDUCERS:
+        raise ValueError("Unsupported aggregate function " + str(function))
+
+    counts = numpy.fromiter(
+        (len(values) for values in series), numpy.int64, len(series)
+    )
+    nonEmpty = numpy.flatnonzero(counts)
+    count = int(counts.sum())
+    nodeValues = [None] * len(series)
+    nodeCounts = counts.tolist()
+
+    if count == 0:
+        return None, 0, nodeValues, nodeCounts
+    if function == "count":
+        nodeValues = [float(c) for c in nodeCounts]
+        return float(count), count, nodeValues, nodeCounts
+
+    values = numpy.concatenate([
+        numpy.frombuffer(series[i], dtype=numpy.float64) for i in nonEmpty
+    ])
+    offsets = numpy.concatenate(([0], numpy.cumsum(counts[nonEmpty])[:-1]))
+    reducer = REDUCERS[function]
+    total = reducer.reduce(values)
+    perNode = reducer.reduceat(values, offsets)
+    if function == "mean":
+        total = total / count
+        perNode = perNode / counts[nonEmpty]
+
+    for i, value in zip(nonEmpty.tolist(), perNode.tolist()):
+        nodeValues[i] = value
+    return float(total), count, nodeValues, nodeCounts